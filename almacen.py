@@ -0,0 +1,212 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class AlmacenRecetas:
+    """Almacén persistente de recetas en SQLite, indexado por ID de video"""
+
+    def __init__(self, db_path, wal=True):
+        # wal=False: journal clásico, que solo necesita bloqueos de fichero
+        # (WAL usa memoria compartida y no vale en un volumen de red)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        # La conexión se comparte entre los hilos de procesar_videos
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=5 if wal else 60)
+        # El modo se guarda en el fichero: hay que fijarlo también para volver del WAL
+        self._conn.execute(f"PRAGMA journal_mode={'WAL' if wal else 'DELETE'}")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS videos (
+                video_id TEXT PRIMARY KEY,
+                metadatos TEXT NOT NULL,
+                miniatura_local TEXT NOT NULL DEFAULT '',
+                actualizado REAL NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS miniaturas (
+                url TEXT PRIMARY KEY,
+                ruta TEXT NOT NULL,
+                etag TEXT NOT NULL DEFAULT '',
+                last_modified TEXT NOT NULL DEFAULT '',
+                sha256 TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS miniaturas_sha256 ON miniaturas (sha256)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS ingredientes (
+                huella TEXT PRIMARY KEY,
+                datos TEXT NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def obtener(self, video_id, max_edad=None):
+        """Devuelve la receta guardada, o None si no existe o tiene más de max_edad segundos"""
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT metadatos, miniatura_local, actualizado FROM videos WHERE video_id = ?",
+                (video_id,)
+            ).fetchone()
+        if fila is None:
+            return None
+        metadatos, miniatura_local, actualizado = fila
+        if max_edad is not None and time.time() - actualizado > max_edad:
+            return None
+        receta = json.loads(metadatos)
+        receta['miniatura_local'] = miniatura_local
+        return receta
+
+    def guardar(self, video_id, receta):
+        """Inserta o actualiza la receta de un video con la hora actual"""
+        metadatos = json.dumps(receta, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO videos (video_id, metadatos, miniatura_local, actualizado) "
+                "VALUES (?, ?, ?, ?)",
+                (video_id, metadatos, receta.get('miniatura_local', ''), time.time())
+            )
+            self._conn.commit()
+
+    def ids(self):
+        """Devuelve el conjunto de IDs de video guardados"""
+        with self._lock:
+            return {fila[0] for fila in self._conn.execute("SELECT video_id FROM videos")}
+
+    def obtener_miniatura(self, url):
+        """Devuelve ruta, etag, last_modified y sha256 de una miniatura descargada"""
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT ruta, etag, last_modified, sha256 FROM miniaturas WHERE url = ?",
+                (url,)
+            ).fetchone()
+        if fila is None:
+            return None
+        return dict(zip(('ruta', 'etag', 'last_modified', 'sha256'), fila))
+
+    def ruta_por_hash(self, sha256):
+        """Devuelve la ruta de una miniatura con ese contenido, si existe"""
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT ruta FROM miniaturas WHERE sha256 = ? LIMIT 1", (sha256,)
+            ).fetchone()
+        return fila[0] if fila else None
+
+    def guardar_miniatura(self, url, ruta, etag, last_modified, sha256):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO miniaturas (url, ruta, etag, last_modified, sha256) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (url, ruta, etag or '', last_modified or '', sha256)
+            )
+            self._conn.commit()
+
+    def obtener_ingredientes(self, huellas):
+        """Devuelve {huella: ingredientes} para las huellas de descripción ya analizadas"""
+        huellas = list(huellas)
+        resultado = {}
+        with self._lock:
+            # De 500 en 500 para no superar el límite de parámetros de SQLite
+            for i in range(0, len(huellas), 500):
+                bloque = huellas[i:i + 500]
+                filas = self._conn.execute(
+                    f"SELECT huella, datos FROM ingredientes WHERE huella IN ({','.join('?' * len(bloque))})",
+                    bloque
+                )
+                resultado.update((huella, json.loads(datos)) for huella, datos in filas)
+        return resultado
+
+    def guardar_ingredientes(self, por_huella):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO ingredientes (huella, datos) VALUES (?, ?)",
+                [(huella, json.dumps(datos, ensure_ascii=False)) for huella, datos in por_huella.items()]
+            )
+            self._conn.commit()
+
+    def cerrar(self):
+        with self._lock:
+            self._conn.close()
+
+
+def id_de_receta(receta):
+    """Extrae el ID de video de la URL de una receta"""
+    return receta.get('url', '').rsplit('v=', 1)[-1]
+
+
+class PuntoControl:
+    """Registro JSONL de recetas terminadas para reanudar una extracción interrumpida
+
+    Cada receta se añade como una línea en cuanto termina; fsync se hace cada
+    `lote_fsync` líneas para no pagar una escritura a disco por video.
+    """
+
+    def __init__(self, ruta, lote_fsync=20):
+        self.ruta = ruta
+        self.lote_fsync = lote_fsync
+        self._registradas = {}
+        self._archivo = None
+        self._sin_fsync = 0
+
+    def cargar(self):
+        """Devuelve {video_id: receta} con lo ya registrado por una ejecución anterior"""
+        recetas = {}
+        if not os.path.exists(self.ruta):
+            return recetas
+        with open(self.ruta, 'r', encoding='utf-8') as f:
+            for linea in f:
+                try:
+                    receta = json.loads(linea)
+                except ValueError:
+                    # Última línea a medio escribir si el proceso murió
+                    continue
+                recetas[id_de_receta(receta)] = receta
+        self._registradas = {video_id: r.get('numero') for video_id, r in recetas.items()}
+        return recetas
+
+    def agregar(self, receta, forzar=False):
+        """Añade una receta al registro si no estaba ya con el mismo número
+
+        Con forzar=True se añade siempre (p. ej. tras completar su miniatura).
+        """
+        video_id = id_de_receta(receta)
+        if not forzar and self._registradas.get(video_id) == receta.get('numero'):
+            return
+        if self._archivo is None:
+            self._archivo = open(self.ruta, 'a', encoding='utf-8')
+        self._archivo.write(json.dumps(receta, ensure_ascii=False) + "\n")
+        self._archivo.flush()
+        self._registradas[video_id] = receta.get('numero')
+        self._sin_fsync += 1
+        if self._sin_fsync >= self.lote_fsync:
+            self._sincronizar()
+
+    def _sincronizar(self):
+        os.fsync(self._archivo.fileno())
+        self._sin_fsync = 0
+
+    def compactar(self, json_path):
+        """Escribe json_path con la última versión de cada receta, ordenadas por número"""
+        recetas = sorted(self.cargar().values(), key=lambda r: r.get('numero', 0))
+        temporal = json_path + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(recetas, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, json_path)
+        return len(recetas)
+
+    def cerrar(self):
+        if self._archivo is not None:
+            self._sincronizar()
+            self._archivo.close()
+            self._archivo = None
+
+    def eliminar(self):
+        """Borra el registro una vez compactado (la ejecución terminó)"""
+        self.cerrar()
+        if os.path.exists(self.ruta):
+            os.remove(self.ruta)
+        self._registradas = {}
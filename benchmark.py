@@ -0,0 +1,1314 @@
+"""
+Benchmarks sin conexión para el extractor de recetas.
+
+Sustituye yt_dlp.YoutubeDL por un doble de pruebas que simula un canal con
+latencia y fallos configurables, y sirve las miniaturas desde un servidor
+HTTP local, de modo que se puede medir el rendimiento sin acceder a YouTube.
+
+Uso:
+    python benchmark.py [micro]                  # benchmarks puntuales
+    python benchmark.py suite [--tamanos 100 1000 10000] [--etapas ...] [--salida F]
+    python benchmark.py comparar BASE.json NUEVO.json [--umbral 0.1]
+    python benchmark.py arranque [--limite 0.25] # importaciones de cada subcomando de cli.py
+    python benchmark.py real URL [URL ...]       # extracción completa vs ligera contra YouTube
+
+`suite` ejecuta cada etapa en un proceso aparte (tiempo y pico de RSS) y
+guarda los resultados en bench_results/<commit>.json.
+"""
+import argparse
+import contextlib
+import hashlib
+import http.server
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import zlib
+from datetime import datetime
+
+import requests
+
+import main
+from planificador import Planificador
+
+
+class LimiteServidor:
+    """Token bucket del lado del servidor: por encima de `tasa` peticiones/s responde 429"""
+
+    def __init__(self, tasa, rafaga=5):
+        self.tasa = tasa
+        self.rafaga = rafaga
+        self.fichas = rafaga
+        self.ultimo = time.monotonic()
+        self.lock = threading.Lock()
+
+    def permitir(self):
+        with self.lock:
+            ahora = time.monotonic()
+            self.fichas = min(self.rafaga, self.fichas + (ahora - self.ultimo) * self.tasa)
+            self.ultimo = ahora
+            if self.fichas >= 1:
+                self.fichas -= 1
+                return True
+            return False
+
+
+class FakeYoutubeDL:
+    """Doble de yt_dlp.YoutubeDL cuyo extract_info tarda `latencia` segundos
+
+    Resolver formatos (JS del reproductor o process=True) cuesta además
+    `latencia_formatos`. `registro` guarda, por llamada, el trabajo que las
+    opciones pidieron omitir.
+    """
+    latencia = 0.05
+    latencia_formatos = 0.0
+    fallos = set()
+    limite = None
+    prob_fallo = 0.0
+    url_miniaturas = ''
+    videos_canal = 0
+    ausentes_ligero = set()
+    llamadas = 0
+    registro = []
+
+    def __init__(self, opts=None):
+        self.opts = opts or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        pass
+
+    def extract_info(self, url, download=False, process=True):
+        if 'watch?v=' not in url:
+            # URL del canal: lista plana de `videos_canal` videos en 3 tabs
+            # (o un dict {url: videos}, con IDs prefijados por el nombre del canal).
+            # Como yt-dlp: sin procesar, las tabs son URLs (url#tabN) y sus
+            # entradas un generador que pide una página cada 100; procesando,
+            # se piden todas las páginas de todas las tabs antes de volver.
+            time.sleep(self.latencia)
+            canal, _, tab = url.partition('#tab')
+            if isinstance(self.videos_canal, dict):
+                n, prefijo = self.videos_canal[canal], canal.rsplit('@', 1)[-1]
+            else:
+                n, prefijo = self.videos_canal, 'vid'
+            if tab:
+                return tab_sintetica(n, int(tab), prefijo=prefijo, latencia=self.latencia)
+            if not process:
+                return {'_type': 'playlist', 'entries': [
+                    {'_type': 'url', 'ie_key': 'YoutubeTab', 'url': f"{canal}#tab{t}"} for t in range(3)]}
+            info = info_sintetico(n, prefijo=prefijo, latencia=self.latencia)
+            for entry in info['entries']:
+                entry['entries'] = list(entry['entries'])
+            return info
+
+        FakeYoutubeDL.llamadas += 1
+        args = self.opts.get('extractor_args', {}).get('youtube', {})
+        omitido = set(args.get('player_skip', ())) | set(args.get('skip', ()))
+        if not process:
+            omitido.add('process')
+        FakeYoutubeDL.registro.append(sorted(omitido))
+
+        espera = self.latencia
+        if 'js' not in omitido or process:
+            espera += self.latencia_formatos
+        time.sleep(espera)
+
+        video_id = url.rsplit('=', 1)[-1]
+        if video_id in self.fallos or zlib.crc32(video_id.encode()) % 10000 < self.prob_fallo * 10000:
+            raise RuntimeError(f"Video no disponible: {video_id}")
+        if self.limite and not self.limite.permitir():
+            raise RuntimeError(f"ERROR: [youtube] {video_id}: HTTP Error 429: Too Many Requests")
+        info = {
+            'id': video_id,
+            'title': f"Receta {video_id}",
+            'description': "Descripción de prueba",
+            'duration': 60,
+            'timestamp': 1735689600,
+            'thumbnails': [],
+        }
+        if self.url_miniaturas:
+            info['thumbnails'] = [{'url': f"{self.url_miniaturas}/img/{video_id}.jpg", 'width': 640}]
+        # Como yt-dlp: upload_date y thumbnail se rellenan al procesar
+        if process:
+            info.update(upload_date='20250101', thumbnail='')
+        if args:
+            for campo in self.ausentes_ligero:
+                info.pop(campo, None)
+        return info
+
+
+@contextlib.contextmanager
+def youtube_falso(latencia, fallos=(), latencia_formatos=0.0, ausentes_ligero=(),
+                  limite_tasa=None, url_miniaturas='', prob_fallo=0.0, videos_canal=0):
+    """Sustituye temporalmente yt_dlp.YoutubeDL por FakeYoutubeDL"""
+    import yt_dlp
+    original = yt_dlp.YoutubeDL
+    FakeYoutubeDL.latencia = latencia
+    FakeYoutubeDL.latencia_formatos = latencia_formatos
+    FakeYoutubeDL.fallos = set(fallos)
+    FakeYoutubeDL.limite = LimiteServidor(limite_tasa) if limite_tasa else None
+    FakeYoutubeDL.url_miniaturas = url_miniaturas
+    FakeYoutubeDL.prob_fallo = prob_fallo
+    FakeYoutubeDL.videos_canal = videos_canal
+    FakeYoutubeDL.ausentes_ligero = set(ausentes_ligero)
+    FakeYoutubeDL.llamadas = 0
+    FakeYoutubeDL.registro = []
+    yt_dlp.YoutubeDL = FakeYoutubeDL
+    try:
+        yield
+    finally:
+        yt_dlp.YoutubeDL = original
+
+
+def sin_limite():
+    """Planificador que no limita la tasa, para medir solo el trabajo en sí"""
+    return Planificador(tasa=1e6, tasa_max=1e6, rafaga=1e6, espera_base=0.01)
+
+
+def crear_extractor(carpeta, workers=1, **kwargs):
+    kwargs.setdefault('planificador', sin_limite())
+    return main.YouTubeRecipeExtractor("https://youtube.com/@falso", carpeta, max_workers=workers, **kwargs)
+
+
+def videos_sinteticos(n):
+    return [{'id': f"vid{i:05d}"} for i in range(n)]
+
+
+def bench_procesar_videos(n=40, latencia=0.05, workers=(1, 2, 4, 8)):
+    """Mide el tiempo de procesar_videos según el número de workers"""
+    print(f"procesar_videos: {n} videos, {latencia * 1000:.0f} ms por extract_info, 1 fallo")
+    videos = videos_sinteticos(n)
+    fallido = videos[n // 2]['id']
+    esperados = [i for i in range(1, n + 1) if i != n // 2 + 1]
+    with youtube_falso(latencia, fallos=[fallido]):
+        for w in workers:
+            with tempfile.TemporaryDirectory() as carpeta:
+                extractor = crear_extractor(carpeta, w)
+                with contextlib.redirect_stdout(None):
+                    inicio = time.perf_counter()
+                    extractor.procesar_videos(videos)
+                    duracion = time.perf_counter() - inicio
+                extractor.cerrar()
+                numeros = [r['numero'] for r in extractor.recipes]
+                assert numeros == esperados, "orden o numeración alterados"
+                print(f"   workers={w:<3} {duracion:6.2f} s")
+
+
+def bench_sincronizar(n=200, nuevos=5, latencia=0.01):
+    """Compara una ejecución completa con una sincronización incremental"""
+    print(f"sincronizar: {n} videos guardados, {nuevos} nuevos")
+    with youtube_falso(latencia), tempfile.TemporaryDirectory() as carpeta:
+        for etiqueta, videos, sincronizar in (
+            ("completa", videos_sinteticos(n), False),
+            ("incremental", videos_sinteticos(n + nuevos), True),
+        ):
+            FakeYoutubeDL.llamadas = 0
+            extractor = crear_extractor(carpeta, 4)
+            with contextlib.redirect_stdout(None):
+                inicio = time.perf_counter()
+                extractor.procesar_videos(videos, sincronizar)
+                duracion = time.perf_counter() - inicio
+            extractor.cerrar()
+            print(f"   {etiqueta:<12} {duracion:6.2f} s  extract_info={FakeYoutubeDL.llamadas}")
+
+
+def bench_cola(n=400, latencia=0.02, procesos=(1, 2, 4), plazo=2.0):
+    """Modo cola: procesos trabajadores en esta máquina y un trabajador que muere a mitad de lote"""
+    import multiprocessing
+    import cola
+    canal = "https://youtube.com/@falso"
+    print(f"cola de trabajo: {n} videos publicados, {latencia * 1000:.0f} ms por extract_info, "
+          f"1 video a la vez por proceso")
+
+    with youtube_falso(latencia, videos_canal=n), tempfile.TemporaryDirectory() as base:
+        # Referencia: el mismo canal en un solo proceso, sin cola
+        extractor = crear_extractor(os.path.join(base, 'referencia'))
+        with contextlib.redirect_stdout(None):
+            extractor.procesar_videos(extractor._enumerar_videos(info_sintetico(n)))
+        extractor.cerrar()
+        referencia = [(r['numero'], r['titulo']) for r in extractor.recipes]
+
+        def ejecutar(etiqueta, carpeta, procesos, matar=None):
+            with contextlib.redirect_stdout(None):
+                cola.publicar(canal, carpeta)
+                inicio = time.perf_counter()
+                if matar:
+                    # Un trabajador que muere (SIGKILL) con su lote reservado
+                    muerto = multiprocessing.Process(target=cola._trabajador, args=(
+                        canal, carpeta, cola.ruta_cola(carpeta), 'muerto', 1, 20, plazo, 1e6, 1e6))
+                    muerto.start()
+                    time.sleep(matar)
+                    muerto.kill()
+                    muerto.join()
+                cola.trabajar(canal, carpeta, procesos=procesos, plazo=plazo, tasa=1e6, tasa_max=1e6)
+                duracion = time.perf_counter() - inicio
+                cola.fusionar(canal, carpeta)
+            with open(os.path.join(carpeta, 'datos', 'recetas.json'), encoding='utf-8') as f:
+                recetas = json.load(f)
+            assert [(r['numero'], r['titulo']) for r in recetas] == referencia, "orden distinto al de un proceso"
+            trabajos = cola.ColaTrabajo(cola.ruta_cola(carpeta))
+            repetidos = trabajos._conn.execute("SELECT COUNT(*) FROM trabajos WHERE intentos > 1").fetchone()[0]
+            trabajos.cerrar()
+            print(f"   {etiqueta:<24} {duracion:6.2f} s  recetas={len(recetas)}  "
+                  f"reclamados dos veces={repetidos}  mismo orden que un proceso")
+
+        for p in procesos:
+            ejecutar(f"{p} proceso{'s' if p > 1 else ''}", os.path.join(base, f"p{p}"), p)
+        ejecutar("2 procesos + 1 muerto", os.path.join(base, 'muerto'), 2, matar=0.5)
+
+
+def tab_sintetica(n, t, tabs=3, solapamiento=0.3, prefijo='vid', latencia=0.0):
+    """Tab `t` de un canal de `n` videos, con entradas perezosas como yt-dlp
+
+    Cada tab repite una fracción `solapamiento` de los videos de la anterior;
+    cada página de 100 entradas tarda `latencia` segundos.
+    """
+    por_tab = n // tabs
+    repetidos = int(por_tab * solapamiento)
+
+    def entradas():
+        inicio = max(0, t * por_tab - repetidos)
+        for i in range(inicio, (t + 1) * por_tab):
+            if latencia and (i - inicio) % 100 == 0:
+                time.sleep(latencia)
+            yield {'id': f"{prefijo}{i:06d}", 'url': f"https://www.youtube.com/watch?v={prefijo}{i:06d}",
+                   'title': f"Receta {i}", '_type': 'url'}
+
+    return {'_type': 'playlist', 'title': f"Tab {t}", 'entries': entradas()}
+
+
+def info_sintetico(n, tabs=3, solapamiento=0.3, prefijo='vid', latencia=0.0):
+    """Diccionario de canal con `tabs` tabs y entradas perezosas (ver tab_sintetica)"""
+    return {'entries': [tab_sintetica(n, t, tabs, solapamiento, prefijo, latencia) for t in range(tabs)]}
+
+
+def enumerar_cuadratico(info):
+    """Enumeración original de extraer_videos (lista + búsqueda lineal)"""
+    all_videos = []
+    for entry in info['entries']:
+        for video in entry['entries']:
+            if video and video.get('id'):
+                if not any(v['id'] == video['id'] for v in all_videos):
+                    all_videos.append(video)
+    return iter(all_videos)
+
+
+def bench_enumeracion(ns=(1000, 5000, 20000)):
+    """Tiempo hasta el primer video, tiempo total y pico de memoria al enumerar"""
+    print("enumeración del canal (3 tabs, 30% de solapamiento)")
+    carpeta = tempfile.TemporaryDirectory()
+    extractor = crear_extractor(carpeta.name)
+    variantes = (("cuadrática", enumerar_cuadratico),
+                 ("generador", extractor._enumerar_videos))
+    for n in ns:
+        for etiqueta, enumerar in variantes:
+            if etiqueta == "cuadrática" and n > 5000:
+                continue
+            info = info_sintetico(n)
+            tracemalloc.start()
+            with contextlib.redirect_stdout(None):
+                inicio = time.perf_counter()
+                videos = enumerar(info)
+                next(videos)
+                primero = time.perf_counter() - inicio
+                unicos = 1 + sum(1 for _ in videos)
+                duracion = time.perf_counter() - inicio
+            pico = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"   n={n:<6} {etiqueta:<11} primero={primero * 1000:8.2f} ms  "
+                  f"total={duracion * 1000:9.1f} ms  pico={pico / 1024:8.0f} KiB  únicos={unicos}")
+
+    # Camino de producción: _listar_canal + _enumerar_videos contra el doble de
+    # yt-dlp (1 ms por página de 100), frente a extract_info con process=True
+    print("enumeración a través de extract_info (1 ms por página de 100 entradas)")
+    latencia, videos_canal = FakeYoutubeDL.latencia, FakeYoutubeDL.videos_canal
+    FakeYoutubeDL.latencia = 0.001
+    for n in ns:
+        FakeYoutubeDL.videos_canal = n
+        for etiqueta in ("process=True", "process=False"):
+            ydl = FakeYoutubeDL()
+            tracemalloc.start()
+            with contextlib.redirect_stdout(None):
+                inicio = time.perf_counter()
+                if etiqueta == "process=True":
+                    videos = extractor._enumerar_videos(ydl.extract_info(extractor.channel_url, download=False))
+                else:
+                    videos = extractor._enumerar_videos(extractor._listar_canal(ydl), ydl)
+                next(videos)
+                primero = time.perf_counter() - inicio
+                unicos = 1 + sum(1 for _ in videos)
+                duracion = time.perf_counter() - inicio
+            pico = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"   n={n:<6} {etiqueta:<13} primero={primero * 1000:8.2f} ms  "
+                  f"total={duracion * 1000:9.1f} ms  pico={pico / 1024:8.0f} KiB  únicos={unicos}")
+    FakeYoutubeDL.latencia, FakeYoutubeDL.videos_canal = latencia, videos_canal
+    extractor.cerrar()
+    carpeta.cleanup()
+
+
+class ServidorMiniaturas:
+    """Servidor HTTP local que sirve imágenes de prueba con ETag y 304
+
+    /img/<n>.jpg devuelve una imagen distinta por n; /dup/<n>.jpg siempre la
+    misma. Si se pasa `jpeg`, cada imagen es ese JPEG con la ruta añadida
+    tras el final (válida y distinta por ruta); si no, bytes de relleno.
+    Con `limite_tasa` responde 429 por encima de esa tasa. Cuenta
+    peticiones, respuestas 304 y 429 y conexiones TCP abiertas.
+    """
+
+    def __init__(self, tamano=30 * 1024, limite_tasa=None, jpeg=None):
+        self.limite = LimiteServidor(limite_tasa) if limite_tasa else None
+        self.limitadas = 0
+        self.peticiones = 0
+        self.no_modificadas = 0
+        self.conexiones = 0
+        servidor = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                servidor.conexiones += 1
+
+            def do_GET(self):
+                servidor.peticiones += 1
+                if servidor.limite and not servidor.limite.permitir():
+                    servidor.limitadas += 1
+                    self.send_response(429)
+                    self.send_header('Retry-After', '1')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                semilla = '0' if self.path.startswith('/dup/') else self.path
+                if jpeg:
+                    cuerpo = jpeg + semilla.encode()
+                else:
+                    cuerpo = hashlib.sha256(semilla.encode()).digest() * (tamano // 32)
+                etag = '"%s"' % hashlib.md5(cuerpo).hexdigest()
+                if self.headers.get('If-None-Match') == etag:
+                    servidor.no_modificadas += 1
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/jpeg')
+                self.send_header('Content-Length', str(len(cuerpo)))
+                self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def reiniciar_contadores(self):
+        self.peticiones = self.no_modificadas = self.conexiones = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.cerrar()
+
+    def cerrar(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def bench_miniaturas(n=200, duplicadas=20):
+    """Compara requests.get suelto con DescargadorMiniaturas (1ª y 2ª ejecución)"""
+    print(f"miniaturas: {n} imágenes ({duplicadas} idénticas) desde un servidor local")
+    servidor = ServidorMiniaturas()
+    urls = [f"{servidor.url}/img/{i}.jpg" for i in range(n - duplicadas)]
+    urls += [f"{servidor.url}/dup/{i}.jpg" for i in range(duplicadas)]
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        inicio = time.perf_counter()
+        for i, url in enumerate(urls):
+            with open(os.path.join(carpeta, f"{i}.jpg"), 'wb') as f:
+                f.write(requests.get(url, timeout=10).content)
+        duracion = time.perf_counter() - inicio
+        print(f"   requests.get     {duracion:6.2f} s  conexiones={servidor.conexiones}")
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        extractor = crear_extractor(carpeta, 4)
+        for etiqueta in ("descargador #1", "descargador #2"):
+            servidor.reiniciar_contadores()
+            inicio = time.perf_counter()
+            rutas = [extractor.descargar_miniatura(url, f"{i}.jpg") for i, url in enumerate(urls)]
+            duracion = time.perf_counter() - inicio
+            assert all(rutas), "descarga fallida"
+            # Las idénticas son enlaces duros: un nombre por video, el contenido una sola vez
+            carpeta_miniaturas = os.path.join(carpeta, "miniaturas")
+            nombres = os.listdir(carpeta_miniaturas)
+            contenidos = len({os.stat(os.path.join(carpeta_miniaturas, nombre)).st_ino for nombre in nombres})
+            print(f"   {etiqueta:<16} {duracion:6.2f} s  conexiones={servidor.conexiones}  "
+                  f"304={servidor.no_modificadas}  ficheros={len(nombres)}  contenidos={contenidos}")
+        extractor.cerrar()
+    servidor.cerrar()
+
+
+def feed_atom(ids, canal='UCfalso'):
+    """Feed Atom como el de YouTube con los videos `ids` (del más reciente al más antiguo)"""
+    entradas = ''.join(
+        f"<entry><id>yt:video:{video_id}</id><yt:videoId>{video_id}</yt:videoId>"
+        f"<yt:channelId>{canal}</yt:channelId><title>Receta {video_id}</title>"
+        f"<published>2025-01-01T00:00:00+00:00</published></entry>"
+        for video_id in ids
+    )
+    return (f'<?xml version="1.0" encoding="UTF-8"?><feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" '
+            f'xmlns="http://www.w3.org/2005/Atom"><yt:channelId>{canal}</yt:channelId>'
+            f'<title>Canal falso</title>{entradas}</feed>')
+
+
+class ServidorFeed:
+    """Servidor HTTP local que sirve `self.feed` en /feeds/videos.xml con ETag, Last-Modified y 304
+
+    Cuenta peticiones, respuestas 304 y bytes de cuerpo enviados.
+    """
+
+    def __init__(self, feed=''):
+        self.feed = feed
+        self.peticiones = 0
+        self.no_modificadas = 0
+        self.bytes = 0
+        servidor = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                servidor.peticiones += 1
+                cuerpo = servidor.feed.encode('utf-8')
+                etag = '"%s"' % hashlib.md5(cuerpo).hexdigest()
+                if self.headers.get('If-None-Match') == etag:
+                    servidor.no_modificadas += 1
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                servidor.bytes += len(cuerpo)
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/atom+xml')
+                self.send_header('Content-Length', str(len(cuerpo)))
+                self.send_header('ETag', etag)
+                self.send_header('Last-Modified', 'Wed, 01 Jan 2025 00:00:00 GMT')
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/feeds/videos.xml"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def cerrar(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def bench_vigilancia(n=300, latencia=0.01):
+    """Rondas del modo vigilancia contra un feed local: completa, sin cambios, 304, un video nuevo,
+    un estreno que falla y se reintenta, y feed incoherente"""
+    import vigilancia
+    print(f"vigilancia: canal de {n} videos, {latencia * 1000:.0f} ms por extract_info, feed de 15 videos")
+    servidor = ServidorFeed()
+    with youtube_falso(latencia, videos_canal=n), tempfile.TemporaryDirectory() as carpeta, en_carpeta(carpeta):
+        extractor = crear_extractor(carpeta, 4)
+        vigilante = vigilancia.VigilanteCanal(extractor, servidor.url, pdf=True)
+        recientes = [f"vid{i:06d}" for i in range(15)]
+        con_estreno = feed_atom(['estreno01', 'nuevo0001'] + recientes[:13])
+        pasos = (
+            ("sin recetas.json", None, ()),
+            ("feed cambiado, nada nuevo", feed_atom(recientes), ()),
+            ("feed sin cambios (304)", None, ()),
+            ("1 video nuevo", feed_atom(['nuevo0001'] + recientes[:14]), ()),
+            ("estreno aún no disponible", con_estreno, ('estreno01',)),
+            ("estreno ya emitido", None, ()),
+            ("feed sin cambios (304)", None, ()),
+            ("feed incoherente", feed_atom([f"otro{i:05d}" for i in range(15)]), ()),
+        )
+        # Tiempo del libro PDF incremental, aparte del de detectar y extraer
+        segundos_pdf = [0.0]
+        actualizar_pdf = vigilante._actualizar_pdf
+
+        def medir_pdf():
+            inicio = time.perf_counter()
+            actualizar_pdf()
+            segundos_pdf[0] += time.perf_counter() - inicio
+        vigilante._actualizar_pdf = medir_pdf
+
+        for etiqueta, feed, fallos in pasos:
+            if feed:
+                servidor.feed = feed
+            FakeYoutubeDL.fallos = set(fallos)
+            FakeYoutubeDL.llamadas = 0
+            peticiones, bytes_feed, segundos_pdf[0] = servidor.peticiones, servidor.bytes, 0.0
+            with contextlib.redirect_stdout(None):
+                inicio = time.perf_counter()
+                cambios = vigilante.ronda()
+                duracion = time.perf_counter() - inicio
+            print(f"   {etiqueta:<26} {duracion - segundos_pdf[0]:6.2f} s + PDF {segundos_pdf[0]:5.2f} s  "
+                  f"extract_info={FakeYoutubeDL.llamadas:<4} feed={servidor.peticiones - peticiones} "
+                  f"({servidor.bytes - bytes_feed} B)  nuevas={cambios}")
+            if etiqueta == "1 video nuevo":
+                recetas = extractor.cargar_json()
+                assert recetas[0]['url'].endswith('nuevo0001') and len(recetas) == n + 1
+                assert [r['numero'] for r in recetas] == list(range(1, n + 2))
+            elif etiqueta.startswith("estreno"):
+                # El estreno fallido no deja guardados los validadores: se reintenta con el feed completo
+                assert [v['id'] for v in vigilante.estado['pendientes']] == list(fallos)
+                assert any(r['url'].endswith('estreno01') for r in extractor.cargar_json()) != bool(fallos)
+        vigilante.cerrar()
+        extractor.cerrar()
+    servidor.cerrar()
+
+
+def generar_miniaturas(carpeta, n, ancho=1280, alto=720):
+    """Crea n JPEG de tamaño completo (con ruido, para que no compriman de más)"""
+    from PIL import Image
+    os.makedirs(carpeta, exist_ok=True)
+    rutas = []
+    for i in range(n):
+        ruta = os.path.join(carpeta, f"receta_vid{i:05d}.jpg")
+        img = Image.effect_noise((ancho, alto), 40 + i % 30).convert('RGB')
+        img.save(ruta, 'JPEG', quality=92)
+        rutas.append(ruta)
+    return rutas
+
+
+# Texto con caracteres fuera de ASCII, distintos en cada receta
+NOTAS_NO_ASCII = (
+    "Túrós süteményhez 2 tojás és ½ csésze tejföl.",
+    "Főzési idő: 45 perc, hőfok 180 °C.",
+    "Piñones tostados y azúcar glas ¿sobran?",
+    "Crème brûlée — «la de la abuela».",
+    "Gyümölcsös rétes… őszibarack, szilva.",
+    "Łódź: pierogi z serem, ¼ kg mąki.",
+    "Añadir 3 € de jamón ibérico ‘al gusto’.",
+    "Zöldséges lecsó, ¾ óra alatt kész • könnyű.",
+)
+
+
+def generar_recetas_json(ruta, n, miniaturas=(), longitud_descripcion=600):
+    """Escribe un recetas.json sintético con n recetas"""
+    recetas = []
+    for i in range(n):
+        recetas.append({
+            'numero': i + 1,
+            'titulo': f"Receta sintética {i:05d}",
+            'descripcion': ("Ingredientes: 200 g harina, 2 huevos, 100 ml leche.\n" * 20)[:longitud_descripcion],
+            'url': f"https://www.youtube.com/watch?v=vid{i:05d}",
+            'duracion': 300,
+            'fecha_publicacion': '20250101',
+            'miniatura_url': '',
+            'miniatura_local': miniaturas[i % len(miniaturas)] if miniaturas else '',
+        })
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(recetas, f, ensure_ascii=False)
+    return recetas
+
+
+@contextlib.contextmanager
+def en_carpeta(carpeta):
+    anterior = os.getcwd()
+    os.chdir(carpeta)
+    try:
+        yield
+    finally:
+        os.chdir(anterior)
+
+
+def bench_miniaturas_pdf(n=100):
+    """Tamaño y tiempo de pdf.py con miniaturas originales y con derivados"""
+    import pdf
+    print(f"miniaturas en el PDF: {n} recetas con JPEG de 1280x720")
+    with tempfile.TemporaryDirectory() as carpeta, en_carpeta(carpeta):
+        rutas = generar_miniaturas(os.path.join(carpeta, 'miniaturas'), n)
+        metadatos = os.path.join(carpeta, 'datos', 'recetas.json')
+        generar_recetas_json(metadatos, n, rutas)
+        impresion = os.path.join(carpeta, 'miniaturas', 'impresion')
+        for etiqueta, carpeta_impresion in (("originales", None),
+                                            ("derivados (frío)", impresion),
+                                            ("derivados (caché)", impresion)):
+            generador = pdf.RecipeCookbookGenerator(metadatos, print_thumbnail_dir=carpeta_impresion)
+            with contextlib.redirect_stdout(None):
+                inicio = time.perf_counter()
+                generador.generate()
+                duracion = time.perf_counter() - inicio
+            tamano = os.path.getsize(generador._get_output_filename())
+            print(f"   {etiqueta:<18} {duracion:6.2f} s  {tamano / 1024 / 1024:7.2f} MiB")
+
+
+def contar_paginas(ruta):
+    from pypdf import PdfReader
+    return len(PdfReader(ruta).pages)
+
+
+def bench_pdf_paralelo(n=2000, workers=(1, 2, 4)):
+    """Tiempo de RecipeCookbookGenerator.generate según el número de procesos"""
+    import pdf
+    print(f"PDF paralelo: {n} recetas sin miniaturas ({os.cpu_count()} CPU)")
+    with tempfile.TemporaryDirectory() as carpeta, en_carpeta(carpeta):
+        metadatos = os.path.join(carpeta, 'datos', 'recetas.json')
+        generar_recetas_json(metadatos, n)
+        for w in workers:
+            generador = pdf.RecipeCookbookGenerator(metadatos, print_thumbnail_dir=None)
+            with contextlib.redirect_stdout(None):
+                inicio = time.perf_counter()
+                generador.generate(workers=w)
+                duracion = time.perf_counter() - inicio
+            paginas = contar_paginas(generador._get_output_filename())
+            print(f"   workers={w:<3} {duracion:6.2f} s  páginas={paginas}")
+
+
+def bench_pdf_incremental(n=1000):
+    """Reconstrucción completa frente a incremental tras cambiar una receta
+
+    Cada receta lleva caracteres no ASCII distintos: con subconjuntos de
+    fuente propios de cada fragmento el libro incremental multiplicaría su
+    tamaño, así que se comprueba frente al de la construcción completa.
+    """
+    import pdf
+    print(f"PDF incremental: {n} recetas, se modifica 1")
+    with tempfile.TemporaryDirectory() as carpeta, en_carpeta(carpeta):
+        metadatos = os.path.join(carpeta, 'datos', 'recetas.json')
+        recetas = generar_recetas_json(metadatos, n)
+        for i, receta in enumerate(recetas):
+            notas = len(NOTAS_NO_ASCII)
+            receta['descripcion'] += f"\n{NOTAS_NO_ASCII[i % notas]}\n{NOTAS_NO_ASCII[i // notas % notas]}"
+        with open(metadatos, 'w', encoding='utf-8') as f:
+            json.dump(recetas, f, ensure_ascii=False)
+        cache = os.path.join(carpeta, 'pdf_cache')
+
+        def construir(etiqueta, fragment_cache_dir):
+            generador = pdf.RecipeCookbookGenerator(metadatos, print_thumbnail_dir=None,
+                                                    fragment_cache_dir=fragment_cache_dir)
+            with contextlib.redirect_stdout(None):
+                inicio = time.perf_counter()
+                generador.generate()
+                duracion = time.perf_counter() - inicio
+            salida = generador._get_output_filename()
+            paginas = contar_paginas(salida)
+            tamano = os.path.getsize(salida)
+            etapas = {etapa: h.suma for etapa, h in generador.metrics.histogramas.items()}
+            print(f"   {etiqueta:<22} {duracion:6.2f} s  páginas={paginas}  {tamano / 1e6:6.2f} MB  "
+                  f"maquetación={etapas.get('pdf_maquetacion', 0):.2f} s  unión={etapas.get('pdf_union', 0):.2f} s")
+            return duracion, tamano, etapas
+
+        completa, tamano_completa, _ = construir("completa", None)
+        construir("incremental (frío)", cache)
+        recetas[n // 2]['descripcion'] += "\nNueva nota del autor."
+        with open(metadatos, 'w', encoding='utf-8') as f:
+            json.dump(recetas, f, ensure_ascii=False)
+        incremental, tamano_incremental, etapas = construir("incremental (1 cambio)", cache)
+        assert tamano_incremental <= 1.5 * tamano_completa, (
+            f"el PDF incremental ocupa {tamano_incremental / tamano_completa:.1f} veces el completo")
+        assert incremental < completa, "reconstruir tras un cambio no es más rápido que la construcción completa"
+        # Renderizar el fragmento cambiado y unir; el resto (claves, portada) debe ser poco
+        esperado = etapas['pdf_maquetacion'] + etapas['pdf_union']
+        assert incremental <= 1.25 * esperado + 0.25, (
+            f"1 cambio: {incremental:.2f} s frente a {esperado:.2f} s de renderizar el fragmento y unir")
+
+
+def bench_indice_pdf(n=1000):
+    """Coste del índice con números de página: sin mapa de páginas, con mapa y por partes"""
+    import pdf
+    print(f"índice del PDF: {n} recetas, 1 de cada 10 ocupa dos páginas")
+    with tempfile.TemporaryDirectory() as carpeta, en_carpeta(carpeta):
+        metadatos = os.path.join(carpeta, 'datos', 'recetas.json')
+        recetas = generar_recetas_json(metadatos, n)
+        for receta in recetas[::10]:
+            receta['descripcion'] *= 8
+        with open(metadatos, 'w', encoding='utf-8') as f:
+            json.dump(recetas, f, ensure_ascii=False)
+        mapa = os.path.join(carpeta, 'datos', 'pdf_paginas.json')
+
+        def construir(etiqueta, **opciones):
+            generador = pdf.RecipeCookbookGenerator(metadatos, print_thumbnail_dir=None, page_map_path=mapa, **opciones)
+            with contextlib.redirect_stdout(None):
+                inicio = time.perf_counter()
+                generador.generate()
+                duracion = time.perf_counter() - inicio
+            maquetaciones = 1 + generador.metrics.contadores.get('pdf_reconstrucciones', 0)
+            paginas = contar_paginas(generador._get_output_filename())
+            print(f"   {etiqueta:<26} {duracion:6.2f} s  maquetaciones={maquetaciones}  páginas={paginas}")
+
+        construir("un documento, sin mapa")
+        construir("un documento, con mapa")
+        os.remove(mapa)
+        construir("por partes, sin mapa", streaming=True)
+
+
+def bench_marcado(n=20000, n_pdf=200):
+    """Saneado del marcado: coste al procesar y al leer, y libro con recetas problemáticas"""
+    import pdf
+    from marcado import fuentes_libro, marcado_de, marcar
+    problemas = ["<b>sin cerrar", "Pogácsa <3 & tea", "Túrós ő & ű 😀❤️", "</para> −5 °C"]
+    recetas = [{'titulo': f"{problemas[i % 4]} {i}", 'descripcion': "200 g liszt, 2 tojás & só <i>\n" * 30}
+               for i in range(n)]
+    print(f"saneado del marcado: {n} recetas")
+    inicio = time.perf_counter()
+    for receta in recetas:
+        receta['marcado'] = marcar(receta)
+    print(f"   al procesar (marcar)     {(time.perf_counter() - inicio) / n * 1e6:6.1f} µs/receta")
+    fuentes_libro()  # al maquetar ya está elegida la fuente del libro
+    inicio = time.perf_counter()
+    for receta in recetas:
+        marcado_de(receta)
+    print(f"   al maquetar (guardado)   {(time.perf_counter() - inicio) / n * 1e6:6.1f} µs/receta")
+
+    print(f"libro con recetas problemáticas: {n_pdf} recetas, 1 de cada 10 con marcado roto, emoji o miniatura corrupta")
+    with tempfile.TemporaryDirectory() as carpeta, en_carpeta(carpeta):
+        miniaturas = generar_miniaturas(os.path.join(carpeta, 'miniaturas'), 2, 320, 180)
+        with open(miniaturas[1], 'wb') as f:
+            f.write(b'\xff\xd8 no es un JPEG')
+        metadatos = os.path.join(carpeta, 'datos', 'recetas.json')
+        recetas = generar_recetas_json(metadatos, n_pdf, miniaturas[:1])
+        for i, receta in enumerate(recetas[::10]):
+            receta['titulo'] = problemas[i % 4] + receta['titulo']
+            receta['descripcion'] += problemas[(i + 1) % 4]
+            if i % 3 == 0:
+                receta['miniatura_local'] = miniaturas[1]
+        with open(metadatos, 'w', encoding='utf-8') as f:
+            json.dump(recetas, f, ensure_ascii=False)
+        for etiqueta, opciones in (("un documento", {}), ("por partes", {'streaming': True})):
+            generador = pdf.RecipeCookbookGenerator(metadatos, print_thumbnail_dir=None, page_map_path=None, **opciones)
+            with contextlib.redirect_stdout(None):
+                inicio = time.perf_counter()
+                generador.generate()
+                duracion = time.perf_counter() - inicio
+            paginas = contar_paginas(generador._get_output_filename())
+            print(f"   {etiqueta:<14} {duracion:6.2f} s  páginas={paginas}  "
+                  f"degradadas={generador.metrics.contadores.get('pdf_recetas_degradadas', 0)}")
+
+
+def bench_extraccion_ligera(n=40, latencia=0.02, latencia_formatos=0.06):
+    """Extracción completa frente a ligera, y ligera con campos ausentes"""
+    print(f"extracción por video: {n} videos, página {latencia * 1000:.0f} ms, "
+          f"formatos {latencia_formatos * 1000:.0f} ms")
+    casos = (("completa", False, ()), ("ligera", True, ()),
+             ("ligera sin descripción", True, ('description',)))
+    for etiqueta, ligera, ausentes in casos:
+        with youtube_falso(latencia, latencia_formatos=latencia_formatos, ausentes_ligero=ausentes), \
+                tempfile.TemporaryDirectory() as carpeta:
+            extractor = crear_extractor(carpeta, 1, extraccion_ligera=ligera)
+            with contextlib.redirect_stdout(None):
+                inicio = time.perf_counter()
+                extractor.procesar_videos(videos_sinteticos(n))
+                duracion = time.perf_counter() - inicio
+            extractor.cerrar()
+            assert all(r['fecha_publicacion'] == '20250101' for r in extractor.recipes)
+            omitido = {', '.join(o) or '-' for o in FakeYoutubeDL.registro}
+            print(f"   {etiqueta:<24} {duracion:6.2f} s  extract_info={FakeYoutubeDL.llamadas}  "
+                  f"omitido={sorted(omitido)}")
+
+
+def comparar_extraccion_real(urls):
+    """Mide las opciones completas y ligeras contra YouTube (requiere red)"""
+    import yt_dlp
+    for etiqueta, opts, process in (("completa", main.YDL_OPTS_VIDEO, True),
+                                    ("ligera", main.YDL_OPTS_VIDEO_LIGERO, False)):
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            inicio = time.perf_counter()
+            for url in urls:
+                ydl.extract_info(url, download=False, process=process)
+            duracion = time.perf_counter() - inicio
+        print(f"   {etiqueta:<9} {duracion / len(urls):6.2f} s por video")
+
+
+def bench_limitacion(n=150, limite_tasa=40, workers=8):
+    """Extracción contra servidores que responden 429 por encima de `limite_tasa`"""
+    print(f"limitación: {n} videos, metadatos y miniaturas limitados a {limite_tasa} peticiones/s")
+    servidor = ServidorMiniaturas(limite_tasa=limite_tasa)
+    planificador = Planificador(tasa=100, tasa_max=200, rafaga=10, espera_base=0.1)
+    with youtube_falso(0.01, limite_tasa=limite_tasa, url_miniaturas=servidor.url), \
+            tempfile.TemporaryDirectory() as carpeta:
+        extractor = crear_extractor(carpeta, workers, planificador=planificador)
+        with contextlib.redirect_stdout(None):
+            extractor.procesar_videos(videos_sinteticos(n))
+        extractor.cerrar()
+        completas = sum(1 for r in extractor.recipes if r['miniatura_local'])
+    servidor.cerrar()
+    informe = planificador.informe()
+    print(f"   recetas={len(extractor.recipes)}  con miniatura={completas}  "
+          f"throughput={informe['throughput']}/s  tasa final={informe['tasa_final']}/s  "
+          f"429={informe['limitadas']}  reintentos={informe['reintentos']}  fallidas={len(informe['fallidas'])}")
+
+
+INGREDIENTES = ("dió", "mogyoró", "liszt", "cukor", "tojás", "vaj", "tej", "kakaó", "túró",
+                "alma", "mák", "fahéj", "nuez", "harina", "azúcar", "huevo", "mantequilla",
+                "leche", "chocolate", "manzana", "canela", "almendra", "piñón", "limón")
+UNIDADES = ("g", "dkg", "ml", "dl", "evőkanál", "cucharada", "taza", "db")
+
+
+def corpus_sintetico(n, semilla=7):
+    """Genera n recetas con descripciones de ingredientes en húngaro y español"""
+    import random
+    aleatorio = random.Random(semilla)
+    for i in range(n):
+        elegidos = aleatorio.sample(INGREDIENTES, 6)
+        lineas = [f"- {aleatorio.randint(1, 500)} {aleatorio.choice(UNIDADES)} {ing}" for ing in elegidos]
+        lineas.append(f"Receta número {i} con {elegidos[0]} y {elegidos[1]}, muy fácil.")
+        yield {
+            'numero': i + 1,
+            'titulo': f"{elegidos[0].capitalize()}s sütemény {i}",
+            'descripcion': "\n".join(lineas),
+            'url': f"https://www.youtube.com/watch?v=vid{i:06d}",
+        }
+
+
+def bench_buscador(n=50000, consultas=("dio", "dió harina", "nuez OR mogyoró", "alma fahéj tojás", "choco*")):
+    """Construcción del índice y latencia de consultas sobre un corpus sintético"""
+    from buscador import IndiceRecetas
+    print(f"buscador: {n} recetas sintéticas")
+    with tempfile.TemporaryDirectory() as carpeta:
+        indice = IndiceRecetas(os.path.join(carpeta, 'indice.db'))
+        inicio = time.perf_counter()
+        for receta in corpus_sintetico(n):
+            indice.indexar(receta)
+        indice.confirmar()
+        duracion = time.perf_counter() - inicio
+        tamano = os.path.getsize(os.path.join(carpeta, 'indice.db'))
+        print(f"   construcción {duracion:6.2f} s  ({n / duracion:,.0f} recetas/s)  "
+              f"índice={tamano / 1024 / 1024:.1f} MiB")
+        for consulta in consultas:
+            inicio = time.perf_counter()
+            for _ in range(5):
+                resultados = indice.buscar(consulta)
+            duracion = (time.perf_counter() - inicio) / 5
+            print(f"   {consulta!r:<22} {duracion * 1000:7.1f} ms  resultados={len(resultados)}")
+        indice.cerrar()
+
+
+def bench_ingredientes(n=20000):
+    """Recetas/s de la extracción de ingredientes: análisis en frío y desde caché"""
+    from almacen import AlmacenRecetas
+    from ingredientes import ExtractorIngredientes
+    print(f"ingredientes: {n} descripciones sintéticas")
+    descripciones = [r['descripcion'] for r in corpus_sintetico(n)]
+    with tempfile.TemporaryDirectory() as carpeta:
+        almacen = AlmacenRecetas(os.path.join(carpeta, 'recetas.db'))
+        for etiqueta in ("en frío", "caché SQLite", "caché memoria"):
+            if etiqueta != "caché memoria":
+                extractor = ExtractorIngredientes(almacen)
+            inicio = time.perf_counter()
+            resultados = extractor.extraer_lote(descripciones)
+            duracion = time.perf_counter() - inicio
+            total = sum(len(r) for r in resultados)
+            print(f"   {etiqueta:<15} {n / duracion:10,.0f} recetas/s  ingredientes={total}")
+        almacen.cerrar()
+
+    # Camino de producción: _agregar_receta (ingredientes, marcado, punto de
+    # control e índice) receta a receta frente a lotes de LOTE_INGREDIENTES
+    lote = main.LOTE_INGREDIENTES
+    for etiqueta, tamano in (("receta a receta", 1), (f"lotes de {lote}", lote)):
+        main.LOTE_INGREDIENTES = tamano
+        with tempfile.TemporaryDirectory() as carpeta:
+            extractor = crear_extractor(carpeta)
+            recetas = list(corpus_sintetico(n))
+            inicio = time.perf_counter()
+            for receta in recetas:
+                extractor._agregar_receta(receta)
+            extractor._cerrar_procesado()
+            duracion = time.perf_counter() - inicio
+            extractor.cerrar()
+        print(f"   {etiqueta:<15} {n / duracion:10,.0f} recetas/s  (_agregar_receta, en frío)")
+    main.LOTE_INGREDIENTES = lote
+
+
+def bench_metricas(n=200, latencia=0.002, observaciones=200000):
+    """Coste de la instrumentación: por observación y en relación con procesar_videos"""
+    from metricas import Metricas
+    metricas = Metricas()
+    inicio = time.perf_counter()
+    for _ in range(observaciones):
+        with metricas.medir('x'):
+            pass
+    por_observacion = (time.perf_counter() - inicio) / observaciones
+    print(f"metricas: {por_observacion * 1e6:.2f} µs por observación")
+
+    with tempfile.TemporaryDirectory() as carpeta, youtube_falso(latencia):
+        extractor = crear_extractor(carpeta)
+        with contextlib.redirect_stdout(None):
+            inicio = time.perf_counter()
+            extractor.procesar_videos(videos_sinteticos(n))
+            duracion = time.perf_counter() - inicio
+        extractor.cerrar()
+        informe = extractor.metricas.informe()
+        total = sum(e['cuenta'] for e in informe['etapas'].values()) + len(informe['contadores'])
+        with open(os.path.join(carpeta, 'datos', 'metricas.prom')) as f:
+            lineas = sum(1 for _ in f)
+    print(f"   procesar_videos({n}): {duracion:.2f} s, {total} observaciones "
+          f"(~{total * por_observacion / duracion:.3%} del tiempo), metricas.prom: {lineas} líneas")
+    for etapa, resumen in informe['etapas'].items():
+        print(f"   {etapa:<20} n={resumen['cuenta']:<5} p50={resumen['p50'] * 1000:7.1f} ms  "
+              f"p95={resumen['p95'] * 1000:7.1f} ms")
+
+
+def bench_lotes(grande=600, pequenos=5, videos_pequeno=20, latencia=0.01, workers=8):
+    """Un canal enorme y varios pequeños: canales uno tras otro vs LoteCanales
+
+    Mide cuándo terminan los canales pequeños y el total, con el mismo número
+    de workers y un planificador sin límite en ambos casos.
+    """
+    import lotes
+    canales = {'https://youtube.com/@grande': grande}
+    canales.update({f"https://youtube.com/@pequeno{i}": videos_pequeno for i in range(pequenos)})
+    print(f"lotes: 1 canal de {grande} videos + {pequenos} de {videos_pequeno}, "
+          f"{workers} workers, latencia {latencia * 1000:.0f} ms")
+
+    def registrar(extractor, terminados, inicio):
+        agregar = extractor._agregar_receta
+
+        def _agregar(receta):
+            agregar(receta)
+            terminados[extractor.channel_url] = time.perf_counter() - inicio
+        extractor._agregar_receta = _agregar
+
+    with youtube_falso(latencia, videos_canal=canales):
+        for modo in ("uno tras otro", "lote"):
+            terminados = {}
+            with tempfile.TemporaryDirectory() as carpeta, contextlib.redirect_stdout(None):
+                inicio = time.perf_counter()
+                if modo == "lote":
+                    lote = lotes.LoteCanales(
+                        [(url, os.path.join(carpeta, url.rsplit('@', 1)[-1])) for url in canales],
+                        os.path.join(carpeta, 'compartido'), workers, planificador=sin_limite()
+                    )
+                    for extractor in lote.extractores:
+                        registrar(extractor, terminados, inicio)
+                    lote.ejecutar()
+                    lote.cerrar()
+                else:
+                    for url in canales:
+                        extractor = crear_extractor(os.path.join(carpeta, url.rsplit('@', 1)[-1]), workers)
+                        extractor.channel_url = url
+                        registrar(extractor, terminados, inicio)
+                        extractor.extraer_videos()
+                        extractor.cerrar()
+                total = time.perf_counter() - inicio
+            pequenos_fin = max(t for url, t in terminados.items() if 'pequeno' in url)
+            print(f"   {modo:<14} total={total:6.2f} s  pequeños terminados a los {pequenos_fin:6.2f} s  "
+                  f"grande a los {terminados['https://youtube.com/@grande']:6.2f} s")
+
+
+# Módulos pesados que no debe cargar cada subcomando de cli.py al arrancar
+PROHIBIDOS_ARRANQUE = {
+    'scrape': ('yt_dlp', 'reportlab', 'PIL', 'pypdf'),
+    'sync': ('yt_dlp', 'reportlab', 'PIL', 'pypdf'),
+    'thumbs': ('yt_dlp', 'reportlab', 'PIL', 'pypdf'),
+    'watch': ('yt_dlp', 'reportlab', 'PIL', 'pypdf'),
+    'queue': ('yt_dlp', 'reportlab', 'PIL', 'pypdf'),
+    'pdf': ('yt_dlp', 'requests', 'pypdf'),
+    'search': ('yt_dlp', 'requests', 'reportlab', 'PIL', 'pypdf'),
+}
+# Segundos máximos por subcomando (el más lento, pdf, tarda unos 170 ms)
+LIMITE_ARRANQUE = 0.25
+
+
+def bench_arranque(repeticiones=5, limite=LIMITE_ARRANQUE):
+    """Tiempo de importación y módulos cargados por cada subcomando de cli.py
+
+    Cada medida se hace en un intérprete nuevo (mejor de `repeticiones`).
+    Devuelve la lista de problemas: módulos prohibidos cargados o
+    subcomandos más lentos que `limite` (segundos; None para no comprobarlo).
+    """
+    codigo = ("import json, sys, time; t = time.perf_counter(); import cli; cli.cargar(sys.argv[1]); "
+              "print(json.dumps([time.perf_counter() - t, sorted(sys.modules)]))")
+    carpeta = os.path.dirname(os.path.abspath(__file__))
+    print(f"arranque: importaciones por subcomando (mejor de {repeticiones})")
+    problemas = []
+    for comando, prohibidos in PROHIBIDOS_ARRANQUE.items():
+        mejor, modulos = None, []
+        for _ in range(repeticiones):
+            salida = subprocess.run([sys.executable, '-c', codigo, comando], cwd=carpeta,
+                                    capture_output=True, text=True, check=True).stdout
+            segundos, modulos = json.loads(salida)
+            mejor = segundos if mejor is None else min(mejor, segundos)
+        cargados = sorted(m for m in prohibidos if m in modulos)
+        print(f"   {comando:<8} {mejor * 1000:7.1f} ms  {len(modulos):4d} módulos"
+              + (f"  ⚠️ carga {', '.join(cargados)}" if cargados else ""))
+        if cargados:
+            problemas.append(f"{comando}: carga {', '.join(cargados)}")
+        if limite is not None and mejor > limite:
+            problemas.append(f"{comando}: {mejor * 1000:.0f} ms > {limite * 1000:.0f} ms")
+    return problemas
+
+
+# --- Suite de extremo a extremo -------------------------------------------
+
+TAMANOS_SUITE = (100, 1000, 10000)
+ETAPAS = ('extraer_videos', 'procesar_videos', 'descargar_miniatura', 'crear_libro_pdf', 'generate',
+          'generate_streaming')
+CARPETA_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_results')
+
+
+def jpeg_base(ancho=480, alto=360):
+    """Bytes de un JPEG pequeño con ruido, base de las miniaturas sintéticas"""
+    from PIL import Image
+    salida = io.BytesIO()
+    Image.effect_noise((ancho, alto), 50).convert('RGB').save(salida, 'JPEG', quality=85)
+    return salida.getvalue()
+
+
+def miniaturas_fixture(carpeta, n):
+    """n miniaturas JPEG válidas y distintas (el JPEG base con un sufijo propio)"""
+    os.makedirs(carpeta, exist_ok=True)
+    base = jpeg_base()
+    rutas = []
+    for i in range(n):
+        ruta = os.path.join(carpeta, f"receta_vid{i:06d}.jpg")
+        with open(ruta, 'wb') as f:
+            f.write(base + str(i).encode())
+        rutas.append(ruta)
+    return rutas
+
+
+def _rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _preparar_extraccion(pila, carpeta, n, opciones, enumerar):
+    servidor = pila.enter_context(ServidorMiniaturas(jpeg=jpeg_base()))
+    pila.enter_context(youtube_falso(opciones['latencia'], prob_fallo=opciones['prob_fallo'],
+                                     url_miniaturas=servidor.url, videos_canal=n))
+    extractor = crear_extractor(carpeta, opciones['workers'])
+    pila.callback(extractor.cerrar)
+
+    def medir():
+        if enumerar:
+            extractor.extraer_videos()
+        else:
+            extractor.procesar_videos(videos_sinteticos(n))
+        return {'recetas': len(extractor.recipes), 'peticiones_miniaturas': servidor.peticiones}
+    return medir
+
+
+def _preparar_descargas(pila, carpeta, n, opciones):
+    servidor = pila.enter_context(ServidorMiniaturas(jpeg=jpeg_base()))
+    extractor = crear_extractor(carpeta, opciones['workers'])
+    pila.callback(extractor.cerrar)
+    urls = [f"{servidor.url}/img/{i}.jpg" for i in range(n)]
+
+    def medir():
+        rutas = [extractor.descargar_miniatura(url, f"receta_{i}.jpg") for i, url in enumerate(urls)]
+        return {'descargadas': sum(1 for r in rutas if r), 'conexiones': servidor.conexiones}
+    return medir
+
+
+def _preparar_pdf(pila, carpeta, n, opciones, generador, streaming=False):
+    metadatos = os.path.join(carpeta, 'datos', 'recetas.json')
+    recetas = generar_recetas_json(metadatos, n, miniaturas_fixture(os.path.join(carpeta, 'miniaturas'), n))
+
+    def medir():
+        if generador:
+            import pdf
+            pdf.RecipeCookbookGenerator(
+                metadatos, print_thumbnail_dir=os.path.join(carpeta, 'miniaturas', 'impresion'), streaming=streaming
+            ).generate(workers=opciones['workers_pdf'])
+            ruta = pdf.RecipeCookbookGenerator(recipes=[])._get_output_filename()
+        else:
+            extractor = crear_extractor(carpeta)
+            pila.callback(extractor.cerrar)
+            extractor.recipes = recetas
+            ruta = extractor.crear_libro_pdf()
+        return {'pdf_mb': round(os.path.getsize(ruta) / 1024 / 1024, 2)}
+    return medir
+
+
+def ejecutar_etapa(etapa, n, opciones):
+    """Prepara los datos de una etapa, la ejecuta y devuelve tiempo y memoria"""
+    preparadores = {
+        'extraer_videos': lambda p, c: _preparar_extraccion(p, c, n, opciones, True),
+        'procesar_videos': lambda p, c: _preparar_extraccion(p, c, n, opciones, False),
+        'descargar_miniatura': lambda p, c: _preparar_descargas(p, c, n, opciones),
+        'crear_libro_pdf': lambda p, c: _preparar_pdf(p, c, n, opciones, False),
+        'generate': lambda p, c: _preparar_pdf(p, c, n, opciones, True),
+        'generate_streaming': lambda p, c: _preparar_pdf(p, c, n, opciones, True, streaming=True),
+    }
+    with tempfile.TemporaryDirectory() as carpeta, en_carpeta(carpeta), contextlib.ExitStack() as pila:
+        medir = preparadores[etapa](pila, carpeta)
+        rss_inicial = _rss_mb()
+        with contextlib.redirect_stdout(None):
+            inicio = time.perf_counter()
+            extra = medir()
+            segundos = time.perf_counter() - inicio
+        return {'etapa': etapa, 'n': n, 'segundos': round(segundos, 3),
+                'rss_inicial_mb': round(rss_inicial, 1), 'rss_pico_mb': round(_rss_mb(), 1), **extra}
+
+
+def _commit():
+    """Commit actual (con '-sucio' si hay cambios sin confirmar)"""
+    carpeta = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=carpeta,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        cambios = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=carpeta,
+                                 capture_output=True, text=True).stdout.strip()
+        return commit + ('-sucio' if cambios else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconocido'
+
+
+def ejecutar_suite(tamanos, etapas, opciones, salida=None):
+    """Ejecuta cada (etapa, tamaño) en un proceso nuevo y guarda los resultados en JSON"""
+    commit = _commit()
+    salida = salida or os.path.join(CARPETA_RESULTADOS, f"{commit}.json")
+    print(f"suite: commit {commit}, opciones {opciones}")
+    resultados = []
+    for n in tamanos:
+        for etapa in etapas:
+            proceso = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '_etapa', etapa, str(n), json.dumps(opciones)],
+                capture_output=True, text=True
+            )
+            if proceso.returncode != 0:
+                error = (proceso.stderr.strip().splitlines() or ['?'])[-1]
+                resultados.append({'etapa': etapa, 'n': n, 'error': error})
+                print(f"   {etapa:<20} n={n:<6} ERROR: {error}")
+                continue
+            medicion = json.loads(proceso.stdout.strip().splitlines()[-1])
+            resultados.append(medicion)
+            print(f"   {etapa:<20} n={n:<6} {medicion['segundos']:8.2f} s  "
+                  f"RSS pico={medicion['rss_pico_mb']:7.1f} MiB")
+
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as f:
+        json.dump({
+            'commit': commit,
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'cpus': os.cpu_count(),
+            'opciones': opciones,
+            'resultados': resultados,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"💾 Resultados guardados en: {salida}")
+    return salida
+
+
+def comparar_resultados(base, nuevo, umbral=0.10):
+    """Compara dos ficheros de la suite; devuelve True si hay regresiones"""
+    with open(base, encoding='utf-8') as f:
+        antes = json.load(f)
+    with open(nuevo, encoding='utf-8') as f:
+        despues = json.load(f)
+    print(f"{antes['commit']} -> {despues['commit']} (umbral {umbral:.0%})")
+    indice = {(r['etapa'], r['n']): r for r in antes['resultados'] if 'error' not in r}
+    regresiones = False
+    for r in despues['resultados']:
+        previo = indice.get((r['etapa'], r['n']))
+        if previo is None:
+            continue
+        if 'error' in r:
+            # Funcionaba en la base y ahora falla: peor que cualquier cambio de tiempo
+            regresiones = True
+            print(f"   {r['etapa']:<20} n={r['n']:<6} ok -> error: {r['error']}  ⚠️ regresión")
+            continue
+        for campo in ('segundos', 'rss_pico_mb'):
+            cambio = (r[campo] - previo[campo]) / previo[campo] if previo[campo] else 0.0
+            marca = ''
+            if cambio > umbral:
+                marca, regresiones = '  ⚠️ regresión', True
+            print(f"   {r['etapa']:<20} n={r['n']:<6} {campo:<12} "
+                  f"{previo[campo]:9.2f} -> {r[campo]:9.2f} ({cambio:+.1%}){marca}")
+    return regresiones
+
+
+def micro():
+    bench_procesar_videos()
+    bench_sincronizar()
+    bench_vigilancia()
+    bench_enumeracion()
+    bench_miniaturas()
+    bench_miniaturas_pdf()
+    bench_pdf_paralelo()
+    bench_pdf_incremental()
+    bench_indice_pdf()
+    bench_marcado()
+    bench_extraccion_ligera()
+    bench_limitacion()
+    bench_buscador()
+    bench_ingredientes()
+    bench_metricas()
+    bench_lotes()
+    bench_cola()
+    for problema in bench_arranque():
+        print(f"   ❌ {problema}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks sin conexión del extractor de recetas.")
+    subparsers = parser.add_subparsers(dest='comando')
+    subparsers.add_parser('micro', help='Benchmarks puntuales (por defecto)')
+
+    p = subparsers.add_parser('suite', help='Suite de extremo a extremo con resultados en JSON')
+    p.add_argument('--tamanos', type=int, nargs='+', default=list(TAMANOS_SUITE))
+    p.add_argument('--etapas', nargs='+', choices=ETAPAS, default=list(ETAPAS))
+    p.add_argument('--latencia', type=float, default=0.002, help='Segundos por extract_info')
+    p.add_argument('--prob-fallo', type=float, default=0.01, help='Fracción de videos no disponibles')
+    p.add_argument('--workers', type=int, default=8)
+    p.add_argument('--workers-pdf', type=int, default=1)
+    p.add_argument('--salida', help='Fichero JSON (por defecto bench_results/<commit>.json)')
+
+    p = subparsers.add_parser('comparar', help='Compara dos resultados de la suite')
+    p.add_argument('base')
+    p.add_argument('nuevo')
+    p.add_argument('--umbral', type=float, default=0.10)
+
+    p = subparsers.add_parser('arranque', help='Comprueba el tiempo de importación de cada subcomando')
+    p.add_argument('--limite', type=float, default=LIMITE_ARRANQUE,
+                   help=f'Segundos máximos por subcomando (por defecto, {LIMITE_ARRANQUE})')
+    p.add_argument('--repeticiones', type=int, default=5)
+
+    p = subparsers.add_parser('real', help='Extracción completa vs ligera contra YouTube')
+    p.add_argument('urls', nargs='+')
+
+    p = subparsers.add_parser('_etapa')
+    p.add_argument('etapa', choices=ETAPAS)
+    p.add_argument('n', type=int)
+    p.add_argument('opciones')
+
+    args = parser.parse_args()
+    if args.comando == 'suite':
+        ejecutar_suite(args.tamanos, args.etapas, {
+            'latencia': args.latencia, 'prob_fallo': args.prob_fallo,
+            'workers': args.workers, 'workers_pdf': args.workers_pdf,
+        }, args.salida)
+    elif args.comando == 'comparar':
+        sys.exit(1 if comparar_resultados(args.base, args.nuevo, args.umbral) else 0)
+    elif args.comando == 'arranque':
+        problemas = bench_arranque(args.repeticiones, args.limite)
+        for problema in problemas:
+            print(f"   ❌ {problema}")
+        sys.exit(1 if problemas else 0)
+    elif args.comando == 'real':
+        comparar_extraccion_real(args.urls)
+    elif args.comando == '_etapa':
+        print(json.dumps(ejecutar_etapa(args.etapa, args.n, json.loads(args.opciones))))
+    else:
+        micro()
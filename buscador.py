@@ -0,0 +1,265 @@
+"""
+Índice invertido de recetas y buscador por línea de comandos.
+
+El índice se guarda en SQLite (datos/indice.db) y se actualiza receta a
+receta durante la extracción, así que buscar no requiere leer recetas.json.
+
+Uso:
+    python buscador.py "nuez harina"          # AND implícito
+    python buscador.py "dió OR nuez" -n 20
+    python buscador.py "choco*"               # prefijo
+    python buscador.py --reconstruir recetas_output/datos/recetas.json
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import unicodedata
+from collections import Counter
+
+from almacen import id_de_receta
+
+INDICE_FILE = os.path.join('recetas_output', 'datos', 'indice.db')
+
+_PALABRA = re.compile(r'[0-9a-z]+')
+_LINEA_INGREDIENTE = re.compile(
+    r'^\s*(?:[-•*·▪✔✅➡>]|\d)'
+    r'|\d\s*(?:g|gr|dkg|dag|kg|ml|cl|dl|l|db|gramos?|litros?|evokanal|teaskanal|kaveskanal|'
+    r'bogre|csipet|cucharadas?|cucharaditas?|tazas?|pizcas?)\b'
+)
+
+# Palabras demasiado frecuentes en español y húngaro para aportar algo
+PALABRAS_VACIAS = frozenset("""
+    de la el en y a los las con del un una por para que se al o es su sus lo como mas muy
+    az es egy is hogy nem meg van ha el fel be ki vagy ezt ez csak mar
+""".split())
+
+# Peso de cada aparición según dónde esté la palabra
+PESO_TITULO = 3.0
+PESO_INGREDIENTE = 2.0
+PESO_TEXTO = 1.0
+
+
+def normalizar(texto):
+    """Minúsculas y sin acentos: 'Dió' -> 'dio', 'Piñón' -> 'pinon'"""
+    descompuesto = unicodedata.normalize('NFKD', texto.lower())
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def palabras(texto):
+    return [p for p in _PALABRA.findall(normalizar(texto))
+            if len(p) > 1 and not p.isdigit() and p not in PALABRAS_VACIAS]
+
+
+def terminos_receta(receta):
+    """Devuelve {término: peso} a partir del título y la descripción"""
+    pesos = Counter()
+    for palabra in palabras(receta.get('titulo', '')):
+        pesos[palabra] += PESO_TITULO
+    for linea in (receta.get('descripcion') or '').splitlines():
+        peso = PESO_INGREDIENTE if _LINEA_INGREDIENTE.search(normalizar(linea)) else PESO_TEXTO
+        for palabra in palabras(linea):
+            pesos[palabra] += peso
+    return pesos
+
+
+class IndiceRecetas:
+    """Índice invertido en SQLite con actualización incremental por receta"""
+
+    # Máximo de términos en que se expande una búsqueda por prefijo
+    MAX_EXPANSION = 50
+
+    def __init__(self, db_path=INDICE_FILE):
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documentos (
+                doc INTEGER PRIMARY KEY,
+                video_id TEXT UNIQUE NOT NULL,
+                numero INTEGER,
+                titulo TEXT NOT NULL,
+                url TEXT NOT NULL,
+                huella TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS terminos (
+                termino TEXT PRIMARY KEY,
+                df INTEGER NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS postings (
+                termino TEXT NOT NULL,
+                doc INTEGER NOT NULL,
+                peso REAL NOT NULL,
+                PRIMARY KEY (termino, doc)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc);
+        """)
+
+    def indexar(self, receta):
+        """Añade o actualiza una receta; no hace nada si su texto no cambió"""
+        video_id = id_de_receta(receta)
+        huella = hashlib.sha1(
+            f"{receta.get('titulo', '')}\0{receta.get('descripcion', '')}".encode('utf-8')
+        ).hexdigest()
+        fila = self._conn.execute(
+            "SELECT doc, huella FROM documentos WHERE video_id = ?", (video_id,)
+        ).fetchone()
+        if fila and fila[1] == huella:
+            # Solo puede haber cambiado la posición en el canal
+            self._conn.execute("UPDATE documentos SET numero = ? WHERE doc = ?",
+                               (receta.get('numero'), fila[0]))
+            return
+        if fila:
+            self._eliminar_postings(fila[0])
+            doc = fila[0]
+            self._conn.execute(
+                "UPDATE documentos SET numero = ?, titulo = ?, url = ?, huella = ? WHERE doc = ?",
+                (receta.get('numero'), receta.get('titulo', ''), receta.get('url', ''), huella, doc)
+            )
+        else:
+            doc = self._conn.execute(
+                "INSERT INTO documentos (video_id, numero, titulo, url, huella) VALUES (?, ?, ?, ?, ?)",
+                (video_id, receta.get('numero'), receta.get('titulo', ''), receta.get('url', ''), huella)
+            ).lastrowid
+
+        pesos = terminos_receta(receta)
+        self._conn.executemany(
+            "INSERT INTO postings (termino, doc, peso) VALUES (?, ?, ?)",
+            [(termino, doc, peso) for termino, peso in pesos.items()]
+        )
+        self._conn.executemany(
+            "INSERT INTO terminos (termino, df) VALUES (?, 1) "
+            "ON CONFLICT (termino) DO UPDATE SET df = df + 1",
+            [(termino,) for termino in pesos]
+        )
+
+    def _eliminar_postings(self, doc):
+        terminos = [fila[0] for fila in self._conn.execute(
+            "SELECT termino FROM postings WHERE doc = ?", (doc,))]
+        self._conn.executemany("UPDATE terminos SET df = df - 1 WHERE termino = ?",
+                               [(t,) for t in terminos])
+        self._conn.execute("DELETE FROM postings WHERE doc = ?", (doc,))
+
+    def confirmar(self):
+        self._conn.commit()
+
+    def cerrar(self):
+        self._conn.commit()
+        self._conn.close()
+
+    def _expandir(self, termino):
+        """Devuelve [(término, df)] para un término o prefijo ('choco*')"""
+        if termino.endswith('*'):
+            prefijo = termino[:-1]
+            return self._conn.execute(
+                "SELECT termino, df FROM terminos WHERE termino >= ? AND termino < ? AND df > 0 "
+                "ORDER BY df DESC LIMIT ?",
+                (prefijo, prefijo + '\uffff', self.MAX_EXPANSION)
+            ).fetchall()
+        return self._conn.execute(
+            "SELECT termino, df FROM terminos WHERE termino = ? AND df > 0", (termino,)
+        ).fetchall()
+
+    def _buscar_grupo(self, terminos, total_docs, limite):
+        """Documentos que contienen todos los términos, con su puntuación TF-IDF"""
+        valores = []
+        for ranura, termino in enumerate(terminos):
+            expansion = self._expandir(termino)
+            if not expansion:
+                return {}
+            for t, df in expansion:
+                valores.append((t, ranura, math.log(total_docs / df) + 1))
+        filas = self._conn.execute(
+            f"""
+            WITH q (termino, ranura, idf) AS (VALUES {', '.join(['(?, ?, ?)'] * len(valores))})
+            SELECT p.doc, SUM(p.peso * q.idf) AS puntuacion
+            FROM q JOIN postings p ON p.termino = q.termino
+            GROUP BY p.doc
+            HAVING COUNT(DISTINCT q.ranura) = ?
+            ORDER BY puntuacion DESC
+            LIMIT ?
+            """,
+            [v for fila in valores for v in fila] + [len(terminos), limite]
+        ).fetchall()
+        return dict(filas)
+
+    def buscar(self, consulta, limite=10):
+        """Busca recetas; las palabras se combinan con AND y los grupos con OR
+
+        Devuelve una lista de dicts (numero, titulo, url, puntuacion) ordenada
+        por relevancia.
+        """
+        total_docs = self._conn.execute("SELECT COUNT(*) FROM documentos").fetchone()[0]
+        if not total_docs:
+            return []
+
+        puntuaciones = {}
+        for grupo in re.split(r'\s+OR\s+', consulta.strip()):
+            terminos = []
+            for parte in grupo.split():
+                if parte == 'AND':
+                    continue
+                prefijo = parte.endswith('*')
+                terminos.extend(t + '*' if prefijo else t for t in palabras(parte))
+            if not terminos:
+                continue
+            for doc, puntuacion in self._buscar_grupo(terminos, total_docs, limite).items():
+                puntuaciones[doc] = max(puntuacion, puntuaciones.get(doc, 0))
+
+        mejores = sorted(puntuaciones.items(), key=lambda item: -item[1])[:limite]
+        resultados = []
+        for doc, puntuacion in mejores:
+            numero, titulo, url = self._conn.execute(
+                "SELECT numero, titulo, url FROM documentos WHERE doc = ?", (doc,)
+            ).fetchone()
+            resultados.append({'numero': numero, 'titulo': titulo, 'url': url,
+                               'puntuacion': round(puntuacion, 2)})
+        return resultados
+
+
+def reconstruir(indice, json_path):
+    """Indexa todas las recetas de un recetas.json (o .jsonl) existente"""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        if json_path.endswith('.jsonl'):
+            recetas = (json.loads(linea) for linea in f if linea.strip())
+            total = sum(1 for _ in map(indice.indexar, recetas))
+        else:
+            recetas = json.load(f)
+            total = len(recetas)
+            for receta in recetas:
+                indice.indexar(receta)
+    indice.confirmar()
+    return total
+
+
+def agregar_argumentos(parser):
+    """Argumentos de la búsqueda (también los usa el subcomando `search` de cli.py)"""
+    parser.add_argument('consulta', nargs='?', help='Palabras (AND), grupos separados por OR, prefijos con *')
+    parser.add_argument('-n', type=int, default=10, help='Número máximo de resultados')
+    parser.add_argument('--indice', default=INDICE_FILE, help='Ruta del índice SQLite')
+    parser.add_argument('--reconstruir', metavar='JSON', help='Indexar un recetas.json existente')
+
+
+def ejecutar(args):
+    indice = IndiceRecetas(args.indice)
+    if args.reconstruir:
+        print(f"📚 {reconstruir(indice, args.reconstruir)} recetas indexadas en {args.indice}")
+    if args.consulta:
+        resultados = indice.buscar(args.consulta, args.n)
+        if not resultados:
+            print("🔍 Sin resultados")
+        for r in resultados:
+            print(f"{r['puntuacion']:7.2f}  #{r['numero']}  {r['titulo']}\n         {r['url']}")
+    indice.cerrar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Busca recetas en el índice local.")
+    agregar_argumentos(parser)
+    ejecutar(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Línea de comandos única del extractor de recetas.
+
+Uso:
+    python cli.py sync [--canal URL] [--workers 4] [--pdf]      # solo videos nuevos o caducados
+    python cli.py scrape [--canal URL] [--workers 4] [--pdf]    # vuelve a pedir todos los videos
+    python cli.py sync --canales canales.txt                    # varios canales (ver lotes.py)
+    python cli.py watch [--intervalo 900] [--pdf]               # sondea el feed y procesa solo lo nuevo
+    python cli.py queue publicar|trabajar|fusionar|estado       # extracción repartida (ver cola.py)
+    python cli.py thumbs                                        # revisa las miniaturas de recetas.json
+    python cli.py pdf [--workers N] [--incremental]             # libro PDF desde recetas.json
+    python cli.py search "nuez harina"                          # busca en el índice local
+
+Cada subcomando importa solo lo que necesita (ver MODULOS): `search` no
+carga yt-dlp, requests, Pillow ni reportlab, `pdf` no carga yt-dlp ni
+requests, y `sync` carga yt-dlp al pedir el primer video. Con --tiempos se
+muestra el tiempo de arranque; en sync/scrape/thumbs también queda en
+datos/metricas.json y en `queue trabajar` en datos/metricas_<trabajador>.json
+(etapa "arranque").
+"""
+import argparse
+import importlib
+import sys
+import time
+
+INICIO = time.perf_counter()
+
+CANAL = "https://youtube.com/@bebepiskota2913"
+CARPETA = "recetas_output"
+
+# Módulos del proyecto que importa cada subcomando
+MODULOS = {
+    'scrape': ('main',),
+    'sync': ('main',),
+    'watch': ('main', 'vigilancia'),
+    'queue': ('cola',),
+    'thumbs': ('main',),
+    'pdf': ('pdf',),
+    'search': ('buscador',),
+}
+
+
+def cargar(comando):
+    """Importa los módulos de un subcomando"""
+    return [importlib.import_module(modulo) for modulo in MODULOS[comando]]
+
+
+def extraer(args, main, sincronizar, arranque):
+    if args.canales:
+        import lotes
+        lote = lotes.LoteCanales(lotes.leer_canales(args.canales), args.compartido, args.workers)
+        lote.metricas.observar('arranque', arranque)
+        try:
+            lote.ejecutar(sincronizar)
+            if args.pdf:
+                lote.crear_libros_pdf()
+        finally:
+            lote.cerrar()
+        return
+
+    extractor = main.YouTubeRecipeExtractor(args.canal, args.carpeta, args.workers)
+    extractor.metricas.observar('arranque', arranque)
+    try:
+        extractor.extraer_videos(sincronizar)
+        if args.pdf and extractor.recipes:
+            extractor.crear_libro_pdf()
+    finally:
+        extractor.cerrar()
+
+
+def vigilar(args, main, vigilancia, arranque):
+    extractor = main.YouTubeRecipeExtractor(args.canal, args.carpeta, args.workers)
+    extractor.metricas.observar('arranque', arranque)
+    vigilante = vigilancia.VigilanteCanal(extractor, args.feed, args.intervalo, args.completa_cada, args.pdf)
+    try:
+        vigilante.vigilar(args.rondas)
+    except KeyboardInterrupt:
+        print("\n⏹️  Vigilancia detenida")
+    finally:
+        vigilante.cerrar()
+        extractor.cerrar()
+
+
+def cola_trabajo(args, cola, arranque):
+    if args.accion == 'publicar':
+        cola.publicar(args.canal, args.carpeta, args.cola)
+    elif args.accion == 'trabajar':
+        cola.trabajar(args.canal, args.carpeta, args.cola, args.procesos, args.workers, args.lote, args.plazo,
+                      args.nombre, arranque=arranque)
+    elif args.accion == 'fusionar':
+        cola.fusionar(args.canal, args.carpeta, args.cola, args.pdf)
+    else:
+        cola.estado(args.carpeta, args.cola)
+
+
+def miniaturas(args, main, arranque):
+    extractor = main.YouTubeRecipeExtractor(args.canal, args.carpeta, args.workers)
+    extractor.metricas.observar('arranque', arranque)
+    try:
+        extractor.actualizar_miniaturas()
+    finally:
+        extractor.cerrar()
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(description="Extractor de recetas de YouTube y libro PDF.")
+    parser.add_argument('--tiempos', action='store_true', help='Mostrar el tiempo de arranque y los módulos cargados')
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    for comando, ayuda in (('sync', 'Extrae solo los videos nuevos o caducados'),
+                           ('scrape', 'Vuelve a extraer todos los videos del canal')):
+        p = subparsers.add_parser(comando, help=ayuda)
+        p.add_argument('--canal', default=CANAL, help='URL del canal')
+        p.add_argument('--carpeta', default=CARPETA, help='Carpeta de salida')
+        p.add_argument('--workers', type=int, default=4, help='Videos en paralelo')
+        p.add_argument('--pdf', action='store_true', help='Crear también el libro PDF')
+        p.add_argument('--canales', metavar='FICHERO', help='Varios canales en un proceso (ver lotes.py)')
+        p.add_argument('--compartido', default='recetas_compartido',
+                       help='Carpeta compartida del modo lote')
+
+    p = subparsers.add_parser('watch', help='Sondea el feed del canal y procesa solo los videos nuevos')
+    p.add_argument('--canal', default=CANAL, help='URL del canal')
+    p.add_argument('--carpeta', default=CARPETA, help='Carpeta de salida')
+    p.add_argument('--workers', type=int, default=4, help='Videos en paralelo')
+    p.add_argument('--pdf', action='store_true', help='Actualizar el libro PDF (incremental) tras cada cambio')
+    p.add_argument('--feed', help='URL del feed Atom (por defecto, el del ID del canal)')
+    p.add_argument('--intervalo', type=float, default=900, help='Segundos entre sondeos')
+    p.add_argument('--completa-cada', type=float, default=24 * 3600,
+                   help='Segundos entre enumeraciones completas del canal')
+    p.add_argument('--rondas', type=int, help='Número de sondeos (por defecto, sin fin)')
+
+    p = subparsers.add_parser('queue', help='Extracción repartida entre procesos o máquinas con una cola SQLite')
+    p.add_argument('accion', choices=('publicar', 'trabajar', 'fusionar', 'estado'),
+                   help='publicar los videos del canal, procesarlos, escribir recetas.json o ver la cola')
+    p.add_argument('--canal', default=CANAL, help='URL del canal')
+    p.add_argument('--carpeta', default=CARPETA, help='Carpeta de salida (compartida por los trabajadores)')
+    p.add_argument('--cola', help='Base de datos de la cola (por defecto, <carpeta>/datos/cola.db)')
+    p.add_argument('--procesos', type=int, default=1, help='Procesos trabajadores en esta máquina')
+    p.add_argument('--workers', type=int, default=4, help='Videos en paralelo por proceso')
+    p.add_argument('--lote', type=int, default=20, help='Videos que reclama cada trabajador de una vez')
+    p.add_argument('--plazo', type=float, default=300, help='Segundos hasta que un video reclamado vuelve a la cola')
+    p.add_argument('--nombre', help='Nombre del trabajador (por defecto, máquina-pid)')
+    p.add_argument('--pdf', action='store_true', help='Crear el libro PDF al fusionar')
+
+    p = subparsers.add_parser('thumbs', help='Revisa las miniaturas de recetas.json y prepara las de impresión')
+    p.add_argument('--canal', default=CANAL, help=argparse.SUPPRESS)
+    p.add_argument('--carpeta', default=CARPETA, help='Carpeta de salida')
+    p.add_argument('--workers', type=int, default=4, help='Descargas en paralelo')
+
+    # Los argumentos de pdf y search los definen sus módulos, que se importan
+    # solo si se usa el subcomando
+    subparsers.add_parser('pdf', help='Genera el libro PDF desde recetas.json', add_help=False)
+    subparsers.add_parser('search', help='Busca recetas en el índice local', add_help=False)
+    return parser
+
+
+def ejecutar(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    args, resto = crear_parser().parse_known_args(argv)
+    modulos = cargar(args.comando)
+    arranque = time.perf_counter() - INICIO
+    if args.tiempos:
+        print(f"⏱️  Arranque: {arranque * 1000:.0f} ms, {len(sys.modules)} módulos cargados", file=sys.stderr)
+
+    if args.comando in ('pdf', 'search'):
+        # El resto de la línea de comandos lo interpreta el propio módulo
+        modulo = modulos[0]
+        parser = argparse.ArgumentParser(prog=f"cli.py {args.comando}")
+        if args.comando == 'pdf':
+            modulo.add_arguments(parser)
+            metricas = importlib.import_module('metricas').Metricas()
+            metricas.observar('arranque', arranque)
+            modulo.run(parser.parse_args(resto), metricas)
+        else:
+            modulo.agregar_argumentos(parser)
+            modulo.ejecutar(parser.parse_args(resto))
+        return
+
+    if resto:
+        crear_parser().error(f"argumentos no reconocidos: {' '.join(resto)}")
+    if args.comando == 'thumbs':
+        miniaturas(args, *modulos, arranque)
+    elif args.comando == 'watch':
+        vigilar(args, *modulos, arranque)
+    elif args.comando == 'queue':
+        cola_trabajo(args, *modulos, arranque)
+    else:
+        extraer(args, *modulos, args.comando == 'sync', arranque)
+
+
+if __name__ == '__main__':
+    ejecutar()
@@ -0,0 +1,348 @@
+"""
+Modo cola: reparte la extracción de un canal entre varios procesos o máquinas.
+
+1. `publicar` enumera el canal y mete cada ID de video, con su posición en
+   el canal, en una cola SQLite (por defecto <carpeta>/datos/cola.db).
+2. `trabajar` (en cualquier número de procesos, en esta u otras máquinas
+   que vean la misma carpeta) reclama lotes de IDs con un plazo (lease),
+   extrae metadatos y miniaturas y deja cada receta en la cola. Si un
+   trabajador muere, sus IDs vuelven a repartirse cuando vence el plazo;
+   tras `max_intentos` reclamaciones sin éxito un ID queda como fallido.
+3. `fusionar` escribe recetas.json con las recetas terminadas ordenadas por
+   su posición en el canal (el mismo orden y numeración que una ejecución
+   en un solo proceso), las guarda en el almacén y reconstruye el índice.
+
+La cola usa el journal clásico de SQLite (no WAL), que solo necesita
+bloqueos de fichero: vale para un volumen compartido con bloqueos POSIX
+(no para NFS sin bloqueos). Cada máquina usa su propio almacén
+(datos/almacen_<máquina>.db, también con el journal clásico), compartido
+por sus procesos, y su propio presupuesto de peticiones, repartido entre
+sus procesos; las miniaturas se escriben en la carpeta común con escritura
+atómica. Los trabajadores no abren el índice de búsqueda (datos/indice.db).
+
+Uso:
+    python cli.py queue publicar [--canal URL] [--carpeta C]
+    python cli.py queue trabajar [--procesos 4] [--workers 4] [--lote 20] [--plazo 300]
+    python cli.py queue fusionar [--pdf]
+    python cli.py queue estado
+"""
+import json
+import os
+import socket
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import main
+from almacen import AlmacenRecetas, PuntoControl, id_de_receta
+from marcado import VERSION_MARCADO, marcar
+from planificador import Planificador
+
+ESTADOS = ('pendiente', 'en_curso', 'hecho', 'fallido')
+
+
+class ColaTrabajo:
+    """Cola de IDs de video con reclamación por plazo, en SQLite
+
+    Las horas son de reloj (time.time()) porque los plazos se comparan
+    entre máquinas; un desfase de unos segundos solo adelanta o retrasa
+    la recuperación de un trabajo abandonado.
+    """
+
+    def __init__(self, ruta, plazo=300, max_intentos=3):
+        self.ruta = ruta
+        self.plazo = plazo
+        self.max_intentos = max_intentos
+        os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+        # isolation_level=None: las transacciones se abren a mano con BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(ruta, timeout=60, isolation_level=None)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS trabajos (
+                video_id TEXT PRIMARY KEY,
+                posicion INTEGER NOT NULL,
+                estado TEXT NOT NULL DEFAULT 'pendiente',
+                trabajador TEXT NOT NULL DEFAULT '',
+                vence REAL NOT NULL DEFAULT 0,
+                intentos INTEGER NOT NULL DEFAULT 0,
+                receta TEXT,
+                error TEXT NOT NULL DEFAULT ''
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS trabajos_estado ON trabajos (estado, posicion)")
+
+    def _transaccion(self, operacion):
+        """Ejecuta operacion(conexión) con el bloqueo de escritura tomado desde el principio"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            resultado = operacion(self._conn)
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+        return resultado
+
+    def publicar(self, videos, bloque=500):
+        """Añade los videos (en el orden del canal) y actualiza la posición de los que ya estaban
+
+        Los ya terminados no se repiten; los fallidos vuelven a intentarse.
+        Devuelve el número de videos publicados.
+        """
+        publicados = 0
+        pendientes = []
+
+        def insertar(conn):
+            conn.executemany(
+                "INSERT INTO trabajos (video_id, posicion) VALUES (?, ?) "
+                "ON CONFLICT (video_id) DO UPDATE SET posicion = excluded.posicion, "
+                "intentos = CASE WHEN estado = 'fallido' THEN 0 ELSE intentos END, "
+                "estado = CASE WHEN estado = 'fallido' THEN 'pendiente' ELSE estado END",
+                pendientes
+            )
+
+        for publicados, video in enumerate(videos, 1):
+            pendientes.append((video['id'], publicados))
+            if len(pendientes) >= bloque:
+                self._transaccion(insertar)
+                pendientes = []
+        if pendientes:
+            self._transaccion(insertar)
+        return publicados
+
+    def reclamar(self, trabajador, cantidad):
+        """Reserva hasta `cantidad` trabajos pendientes o con el plazo vencido: [(video_id, posicion)]"""
+        def reclamar(conn):
+            ahora = time.time()
+            # Los que ya agotaron sus intentos no se vuelven a repartir
+            conn.execute(
+                "UPDATE trabajos SET estado = 'fallido', error = 'plazo vencido demasiadas veces' "
+                "WHERE intentos >= ? AND (estado = 'pendiente' OR (estado = 'en_curso' AND vence < ?))",
+                (self.max_intentos, ahora)
+            )
+            filas = conn.execute(
+                "SELECT video_id, posicion FROM trabajos "
+                "WHERE estado = 'pendiente' OR (estado = 'en_curso' AND vence < ?) "
+                "ORDER BY posicion LIMIT ?",
+                (ahora, cantidad)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE trabajos SET estado = 'en_curso', trabajador = ?, vence = ?, intentos = intentos + 1 "
+                "WHERE video_id = ?",
+                [(trabajador, ahora + self.plazo, video_id) for video_id, _ in filas]
+            )
+            return filas
+        return self._transaccion(reclamar)
+
+    def renovar(self, trabajador):
+        """Alarga el plazo de todo lo que tiene reservado el trabajador"""
+        self._transaccion(lambda conn: conn.execute(
+            "UPDATE trabajos SET vence = ? WHERE trabajador = ? AND estado = 'en_curso'",
+            (time.time() + self.plazo, trabajador)
+        ))
+
+    def completar(self, trabajador, recetas):
+        """Guarda las recetas terminadas; devuelve cuántas seguían reservadas por este trabajador
+
+        Si el plazo venció y otro trabajador reclamó el video, se descarta
+        esta copia: la suya llegará igual.
+        """
+        def completar(conn):
+            return sum(conn.execute(
+                "UPDATE trabajos SET estado = 'hecho', receta = ?, error = '' "
+                "WHERE video_id = ? AND trabajador = ? AND estado = 'en_curso'",
+                (json.dumps(receta, ensure_ascii=False), id_de_receta(receta), trabajador)
+            ).rowcount for receta in recetas)
+        return self._transaccion(completar)
+
+    def fallar(self, trabajador, video_ids, error):
+        """Devuelve los videos a la cola, o los marca como fallidos si agotaron sus intentos"""
+        self._transaccion(lambda conn: conn.executemany(
+            "UPDATE trabajos SET estado = CASE WHEN intentos >= ? THEN 'fallido' ELSE 'pendiente' END, "
+            "vence = 0, error = ? WHERE video_id = ? AND trabajador = ? AND estado = 'en_curso'",
+            [(self.max_intentos, error, video_id, trabajador) for video_id in video_ids]
+        ))
+
+    def resumen(self):
+        """{estado: número de videos}"""
+        cuentas = dict.fromkeys(ESTADOS, 0)
+        cuentas.update(self._conn.execute("SELECT estado, COUNT(*) FROM trabajos GROUP BY estado"))
+        return cuentas
+
+    def quedan(self):
+        """Videos pendientes o reservados (terminará cuando sea 0)"""
+        return self._conn.execute(
+            "SELECT COUNT(*) FROM trabajos WHERE estado IN ('pendiente', 'en_curso')"
+        ).fetchone()[0]
+
+    def recetas(self):
+        """Recetas terminadas en el orden del canal, numeradas por su posición"""
+        for posicion, receta in self._conn.execute(
+            "SELECT posicion, receta FROM trabajos WHERE estado = 'hecho' ORDER BY posicion"
+        ):
+            yield dict(json.loads(receta), numero=posicion)
+
+    def cerrar(self):
+        self._conn.close()
+
+
+class TrabajadorCola(main.YouTubeRecipeExtractor):
+    """Extractor que toma los videos de la cola y le devuelve las recetas
+
+    No escribe recetas.json, el punto de control común ni el índice (ni
+    siquiera abre datos/indice.db): eso lo hace `fusionar` con el resultado
+    de todos los trabajadores.
+    """
+
+    def __init__(self, cola, nombre, channel_url, output_folder, max_workers=1, lote=20, **kwargs):
+        datos = os.path.join(output_folder, "datos")
+        os.makedirs(datos, exist_ok=True)
+        # En el volumen compartido: sin WAL (ver el docstring del módulo)
+        almacen = AlmacenRecetas(os.path.join(datos, f"almacen_{socket.gethostname()}.db"), wal=False)
+        super().__init__(channel_url, output_folder, max_workers, almacen=almacen, indexar=False, **kwargs)
+        self.cola = cola
+        self.nombre = nombre
+        self.lote = lote
+        # Solo para las miniaturas reintentadas; se borra tras cada lote
+        self.punto_control = PuntoControl(os.path.join(datos, f"cola_{nombre}.jsonl"))
+        self._posiciones = {}
+
+    def _agregar_receta(self, receta):
+        super()._agregar_receta(receta)
+        if receta:
+            # Cada receta terminada demuestra que el trabajador sigue vivo
+            self.cola.renovar(self.nombre)
+
+    def _registrar_receta(self, receta):
+        if receta.get('marcado', {}).get('version') != VERSION_MARCADO:
+            receta['marcado'] = marcar(receta)
+        receta['numero'] = self._posiciones[id_de_receta(receta)]
+        self.recipes.append(receta)
+
+    def _terminar_procesado(self, vistos):
+        self.metricas.contar('videos_vistos', vistos)
+
+    def trabajar(self, espera=5.0):
+        """Procesa lotes de la cola hasta que no quede nada; devuelve el número de recetas terminadas"""
+        terminadas = 0
+        while True:
+            lote = self.cola.reclamar(self.nombre, self.lote)
+            if not lote:
+                if not self.cola.quedan():
+                    break
+                # Lo que queda lo tienen otros; se recoge si su plazo vence
+                time.sleep(min(espera, self.cola.plazo / 4))
+                continue
+            self._posiciones = dict(lote)
+            self.recipes = []
+            self.procesar_videos([{'id': video_id} for video_id, _ in lote])
+            terminadas += self.cola.completar(self.nombre, self.recipes)
+            hechos = {id_de_receta(receta) for receta in self.recipes}
+            self.cola.fallar(self.nombre, [video_id for video_id, _ in lote if video_id not in hechos],
+                             "error al extraer")
+            self.punto_control.eliminar()
+        self.metricas.fijar('recetas', terminadas)
+        self.metricas.guardar(os.path.join(self.output_folder, "datos", f"metricas_{self.nombre}.json"))
+        return terminadas
+
+    def cerrar(self):
+        super().cerrar()
+        self.almacen.cerrar()
+
+
+def ruta_cola(carpeta):
+    return os.path.join(carpeta, "datos", "cola.db")
+
+
+def publicar(channel_url, carpeta, ruta=None):
+    """Enumera el canal y publica sus videos en la cola"""
+    cola = ColaTrabajo(ruta or ruta_cola(carpeta))
+    extractor = main.YouTubeRecipeExtractor(channel_url, carpeta)
+    try:
+        with main.requerir('yt_dlp', 'yt-dlp').YoutubeDL(main.YDL_OPTS_CANAL) as ydl:
+            print(f"📡 Publicando los videos de {channel_url}...")
+            info = extractor._listar_canal(ydl)
+            publicados = cola.publicar(extractor._enumerar_videos(info, ydl))
+        print(f"✅ {publicados} videos en la cola {cola.ruta}: {cola.resumen()}")
+        return publicados
+    finally:
+        extractor.cerrar()
+        cola.cerrar()
+
+
+def _trabajador(channel_url, carpeta, ruta, nombre, max_workers, lote, plazo, tasa, tasa_max, arranque=None):
+    """Un proceso trabajador (ver trabajar)"""
+    cola = ColaTrabajo(ruta, plazo)
+    trabajador = TrabajadorCola(cola, nombre, channel_url, carpeta, max_workers, lote,
+                                planificador=Planificador(tasa=tasa, tasa_max=tasa_max))
+    if arranque is not None:
+        trabajador.metricas.observar('arranque', arranque)
+    try:
+        return trabajador.trabajar()
+    finally:
+        trabajador.cerrar()
+        cola.cerrar()
+
+
+def trabajar(channel_url, carpeta, ruta=None, procesos=1, max_workers=1, lote=20, plazo=300, nombre=None,
+             tasa=8.0, tasa_max=40.0, arranque=None):
+    """Lanza `procesos` trabajadores en esta máquina y espera a que la cola se vacíe
+
+    `tasa` y `tasa_max` (peticiones/s) son el presupuesto de esta máquina y
+    se reparten entre sus procesos. `arranque` (segundos hasta cargar cli.py)
+    queda en las métricas de cada trabajador.
+    """
+    ruta = ruta or ruta_cola(carpeta)
+    nombre = nombre or f"{socket.gethostname()}-{os.getpid()}"
+    procesos = max(1, procesos)
+    argumentos = (max_workers, lote, plazo, tasa / procesos, tasa_max / procesos, arranque)
+    if procesos == 1:
+        terminadas = _trabajador(channel_url, carpeta, ruta, nombre, *argumentos)
+    else:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            futuros = [pool.submit(_trabajador, channel_url, carpeta, ruta, f"{nombre}-{i}", *argumentos)
+                       for i in range(procesos)]
+            terminadas = sum(futuro.result() for futuro in futuros)
+    print(f"✅ {terminadas} recetas terminadas por {procesos} procesos")
+    return terminadas
+
+
+def fusionar(channel_url, carpeta, ruta=None, pdf=False):
+    """Escribe recetas.json con lo terminado en la cola, en orden del canal; devuelve el número de recetas"""
+    cola = ColaTrabajo(ruta or ruta_cola(carpeta))
+    extractor = main.YouTubeRecipeExtractor(channel_url, carpeta)
+    try:
+        resumen = cola.resumen()
+        if resumen['pendiente'] or resumen['en_curso']:
+            print(f"⚠️  La cola no ha terminado ({resumen}); se fusiona lo que ya está hecho")
+        extractor.recipes = list(cola.recetas())
+        for receta in extractor.recipes:
+            # Así una sincronización posterior no vuelve a pedirlos
+            extractor.almacen.guardar(id_de_receta(receta), receta)
+            extractor.indice.indexar(receta)
+        extractor.indice.confirmar()
+        # Sin pasar por el punto de control de la carpeta, que es de las ejecuciones normales
+        json_path = os.path.join(carpeta, "datos", "recetas.json")
+        with open(json_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(extractor.recipes, f, ensure_ascii=False, indent=2)
+        os.replace(json_path + '.tmp', json_path)
+        print(f"💾 {len(extractor.recipes)} recetas guardadas en: {json_path}")
+        if resumen['fallido']:
+            print(f"⚠️  {resumen['fallido']} videos fallidos (ver `cli.py queue estado`)")
+        if pdf and extractor.recipes:
+            extractor.crear_libro_pdf()
+        return len(extractor.recipes)
+    finally:
+        extractor.cerrar()
+        cola.cerrar()
+
+
+def estado(carpeta, ruta=None):
+    """Imprime el número de videos por estado y los errores de los fallidos"""
+    cola = ColaTrabajo(ruta or ruta_cola(carpeta))
+    try:
+        print(f"📊 {cola.ruta}: {cola.resumen()}")
+        for video_id, error in cola._conn.execute(
+            "SELECT video_id, error FROM trabajos WHERE estado = 'fallido' ORDER BY posicion"
+        ):
+            print(f"   ❌ {video_id}: {error}")
+    finally:
+        cola.cerrar()
@@ -0,0 +1,109 @@
+import hashlib
+import os
+import tempfile
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class DescargadorMiniaturas:
+    """Descarga miniaturas con un pool de conexiones compartido entre hilos
+
+    Usa peticiones condicionales (ETag/Last-Modified), escritura atómica y
+    deduplicación por SHA-256 del contenido: una imagen idéntica a otra ya
+    descargada se guarda como enlace duro a ella, con el nombre propio del
+    video, así que reemplazar una no cambia la otra.
+    """
+
+    TAMANO_BLOQUE = 64 * 1024
+
+    def __init__(self, carpeta, almacen, max_conexiones=10, timeout=10, metricas=None):
+        self.carpeta = carpeta
+        self.almacen = almacen
+        self.timeout = timeout
+        self.metricas = metricas
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_conexiones, pool_maxsize=max_conexiones)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def descargar(self, url, filename, carpeta=None):
+        """Descarga `url` en carpeta/filename y devuelve la ruta local de la imagen
+
+        `carpeta` permite compartir el descargador entre canales (ver lotes.py).
+        """
+        carpeta = carpeta or self.carpeta
+        filepath = os.path.join(carpeta, filename)
+
+        headers = {}
+        previa = self.almacen.obtener_miniatura(url)
+        # Solo se valida la copia propia: versiones anteriores apuntaban a la de otro video
+        if previa and previa['ruta'] == filepath and os.path.exists(filepath):
+            if previa['etag']:
+                headers['If-None-Match'] = previa['etag']
+            if previa['last_modified']:
+                headers['If-Modified-Since'] = previa['last_modified']
+
+        with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+            if response.status_code == 304:
+                # Consumir el cuerpo vacío devuelve la conexión al pool
+                response.content
+                if self.metricas:
+                    self.metricas.contar('miniaturas_no_modificadas')
+                return previa['ruta']
+            response.raise_for_status()
+
+            sha256 = hashlib.sha256()
+            descargados = 0
+            fd, temporal = tempfile.mkstemp(dir=carpeta, suffix='.part')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    for bloque in response.iter_content(self.TAMANO_BLOQUE):
+                        sha256.update(bloque)
+                        f.write(bloque)
+                        descargados += len(bloque)
+            except BaseException:
+                os.remove(temporal)
+                raise
+
+            if self.metricas:
+                self.metricas.contar('miniaturas_bytes', descargados)
+
+            digest = sha256.hexdigest()
+            existente = self.almacen.ruta_por_hash(digest)
+            if existente and existente != filepath and self._enlazar(existente, filepath, digest, carpeta):
+                # Imagen idéntica a otra ya descargada: se comparte el contenido en disco
+                os.remove(temporal)
+                if self.metricas:
+                    self.metricas.contar('miniaturas_duplicadas')
+            else:
+                os.replace(temporal, filepath)
+
+            self.almacen.guardar_miniatura(
+                url, filepath,
+                response.headers.get('ETag', ''),
+                response.headers.get('Last-Modified', ''),
+                digest
+            )
+        return filepath
+
+    @staticmethod
+    def _enlazar(existente, filepath, digest, carpeta):
+        """Pone en filepath un enlace duro a `existente` si aún tiene ese contenido"""
+        try:
+            with open(existente, 'rb') as f:
+                if hashlib.sha256(f.read()).hexdigest() != digest:
+                    return False
+            # Enlace con nombre temporal y os.replace: filepath nunca queda a medias
+            temporal = os.path.join(carpeta, f".{digest}.{os.getpid()}.{threading.get_ident()}.lnk")
+            os.link(existente, temporal)
+        except OSError:
+            # No existe o el sistema de ficheros no admite enlaces duros: se guarda la copia
+            return False
+        os.replace(temporal, filepath)
+        return True
+
+    def cerrar(self):
+        self.session.close()
@@ -0,0 +1,94 @@
+import hashlib
+import importlib.util
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+# Pillow es opcional para pdf.py: sin él se usan las miniaturas originales.
+# Se importa solo al generar derivados.
+HAY_PILLOW = importlib.util.find_spec('PIL') is not None
+
+# Resolución de impresión de las miniaturas en los libros PDF
+DPI_IMPRESION = 150
+
+
+def elegir_miniatura(thumbnails, ancho_minimo):
+    """Devuelve la URL de la variante más pequeña con al menos `ancho_minimo` px
+
+    `thumbnails` es la lista de variantes que devuelve yt-dlp. Se prefieren
+    JPEG frente a WebP, y si ninguna es lo bastante grande se elige la mayor.
+    """
+    variantes = [t for t in thumbnails or () if t.get('url') and t.get('width')]
+    jpeg = [t for t in variantes if not t['url'].split('?')[0].endswith('.webp')]
+    variantes = jpeg or variantes
+    if not variantes:
+        return ''
+    suficientes = [t for t in variantes if t['width'] >= ancho_minimo]
+    if suficientes:
+        return min(suficientes, key=lambda t: t['width'])['url']
+    return max(variantes, key=lambda t: t['width'])['url']
+
+
+def _generar_derivado(origen, destino, ancho, alto, calidad):
+    """Redimensiona y recomprime una miniatura (se ejecuta en otro proceso)"""
+    from PIL import Image
+    with Image.open(origen) as img:
+        # Nunca ampliar: si el original es más pequeño se conserva su ancho
+        if img.width < ancho:
+            alto = max(1, round(alto * img.width / ancho))
+            ancho = img.width
+        img = img.convert('RGB').resize((ancho, alto), Image.LANCZOS)
+        fd, temporal = tempfile.mkstemp(dir=os.path.dirname(destino), suffix='.part')
+        with os.fdopen(fd, 'wb') as f:
+            img.save(f, 'JPEG', quality=calidad, optimize=True)
+    os.replace(temporal, destino)
+    return destino
+
+
+class DerivadosMiniaturas:
+    """Caché en disco de miniaturas preparadas para imprimir a un tamaño dado
+
+    Cada derivado se identifica por el SHA-256 del original y el tamaño en
+    píxeles, así que solo se regenera cuando cambia la imagen o el tamaño.
+    """
+
+    def __init__(self, carpeta, dpi=DPI_IMPRESION, calidad=80, max_procesos=None):
+        self.carpeta = carpeta
+        self.dpi = dpi
+        self.calidad = calidad
+        self.max_procesos = max_procesos
+
+    def preparar(self, rutas, ancho_pt, alto_pt):
+        """Devuelve {ruta original: ruta del derivado} para un tamaño en puntos
+
+        Las rutas inexistentes, o todas si Pillow no está instalado, se omiten;
+        quien llama debe usar entonces la ruta original.
+        """
+        if not HAY_PILLOW:
+            return {}
+        os.makedirs(self.carpeta, exist_ok=True)
+        ancho = round(ancho_pt / 72 * self.dpi)
+        alto = round(alto_pt / 72 * self.dpi)
+
+        derivados, pendientes = {}, {}
+        for ruta in set(rutas):
+            if not ruta or not os.path.exists(ruta):
+                continue
+            with open(ruta, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            destino = os.path.join(self.carpeta, f"{digest[:24]}_{ancho}x{alto}_q{self.calidad}.jpg")
+            if os.path.exists(destino):
+                derivados[ruta] = destino
+            else:
+                pendientes[ruta] = destino
+
+        if pendientes:
+            with ProcessPoolExecutor(max_workers=self.max_procesos) as pool:
+                futuros = {ruta: pool.submit(_generar_derivado, ruta, destino, ancho, alto, self.calidad)
+                           for ruta, destino in pendientes.items()}
+                for ruta, futuro in futuros.items():
+                    try:
+                        derivados[ruta] = futuro.result()
+                    except Exception as e:
+                        print(f"   ⚠️  Error preparando miniatura {ruta}: {str(e)}")
+        return derivados
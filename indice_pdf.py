@@ -0,0 +1,175 @@
+"""
+Índice de los libros PDF con número de página y enlace a cada receta.
+
+Cada receta empieza con una Marca, que anota la página en la que queda y
+la registra como destino con nombre; las entradas del índice
+(EntradaIndice) enlazan con ese nombre. Los números de página se obtienen
+sin el multiBuild de ReportLab, que maqueta el libro entero dos veces:
+
+- Al maquetar por partes (unir_con_indice), las recetas van primero y la
+  portada con el índice se maqueta al final, ya con las páginas reales, y
+  se pone delante al unir. Si la portada ocupa más páginas de las
+  previstas solo se repite la portada.
+- En un solo documento, las páginas se estiman con el mapa de la
+  maquetación anterior (MapaPaginas): lo que ocupaba cada receta y la
+  portada. Las marcas comprueban la estimación y, si falla (la primera vez
+  o si cambian recetas largas), se maqueta una vez más con las reales.
+"""
+import hashlib
+import json
+import math
+import os
+from collections import deque
+
+from reportlab.pdfbase.pdfdoc import PDFArray, PDFDictionary, PDFName
+from reportlab.platypus import Flowable, Paragraph
+
+
+def nombre_destino(receta):
+    """Nombre del destino de una receta; no depende de su posición en el libro"""
+    clave = receta.get('url') or receta.get('titulo') or ''
+    return 'receta_' + hashlib.sha1(clave.encode('utf-8')).hexdigest()[:16]
+
+
+class Marca(Flowable):
+    """Flowable sin tamaño que anota en `paginas` la página donde empieza una receta"""
+
+    def __init__(self, nombre, paginas):
+        super().__init__()
+        self.nombre = nombre
+        self.paginas = paginas
+
+    def wrap(self, ancho, alto):
+        return 0, 0
+
+    def draw(self):
+        self.paginas[self.nombre] = self.canv.getPageNumber()
+        # Solo se escribe en el PDF si algún enlace del mismo documento lo usa
+        self.canv.bookmarkPage(self.nombre)
+
+
+class EntradaIndice(Paragraph):
+    """Paragraph del índice que enlaza con el destino `nombre`
+
+    Con externo=True el enlace apunta al destino por su nombre (/Dest
+    /nombre) sin que exista en este documento: lo resuelve el PDF unido
+    (ver unir_pdf.unir_pdfs).
+    """
+
+    def __init__(self, texto, estilo, nombre=None, externo=False, **kw):
+        super().__init__(texto, estilo, **kw)
+        self.nombre = nombre
+        self.externo = externo
+
+    def draw(self):
+        super().draw()
+        if not self.nombre:
+            return
+        rect = (0, 0, self.width, self.height)
+        if not self.externo:
+            self.canv.linkRect('', self.nombre, rect, relative=1, thickness=0)
+            return
+        # linkRect exige que el destino esté definido en el mismo documento
+        self.canv._addAnnotation(PDFDictionary({
+            'Type': PDFName('Annot'),
+            'Subtype': PDFName('Link'),
+            'Rect': PDFArray(self.canv._absRect(rect, relative=1)),
+            'Border': PDFArray([0, 0, 0]),
+            'Dest': PDFName(self.nombre),
+        }))
+
+
+def estimar_paginas(flowables, ancho, alto):
+    """Páginas que ocupan unos flowables en un marco de ancho × alto (sin contar cortes)"""
+    total = sum(flowable.wrap(ancho, alto)[1] for flowable in flowables)
+    return max(1, math.ceil(total / alto))
+
+
+class MapaPaginas:
+    """Páginas de la última maquetación: las de la portada y las de cada receta
+
+    Se guarda en JSON junto a los datos para estimar la siguiente.
+    """
+
+    def __init__(self, ruta=None):
+        self.ruta = ruta
+        self.delante = None
+        self.longitudes = {}
+        if ruta and os.path.exists(ruta):
+            try:
+                with open(ruta, encoding='utf-8') as f:
+                    datos = json.load(f)
+                self.delante = datos['delante']
+                self.longitudes = datos['longitudes']
+            except (ValueError, KeyError, TypeError):
+                pass
+
+    def estimar(self, nombres, delante):
+        """Página de cada receta si van en este orden tras `delante` páginas"""
+        paginas = {}
+        pagina = delante + 1
+        for nombre in nombres:
+            paginas[nombre] = pagina
+            pagina += self.longitudes.get(nombre, 1)
+        return paginas
+
+    def actualizar(self, paginas, total):
+        """Recoge las páginas reales de las recetas y el total de páginas del libro"""
+        orden = sorted(paginas.items(), key=lambda item: item[1])
+        self.delante = orden[0][1] - 1 if orden else total
+        siguientes = [pagina for _, pagina in orden[1:]] + [total + 1]
+        self.longitudes = {nombre: siguiente - pagina for (nombre, pagina), siguiente in zip(orden, siguientes)}
+
+    def guardar(self):
+        if not self.ruta:
+            return
+        os.makedirs(os.path.dirname(self.ruta) or '.', exist_ok=True)
+        temporal = self.ruta + '.part'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump({'delante': self.delante, 'longitudes': self.longitudes}, f)
+        os.replace(temporal, self.ruta)
+
+
+def unir_con_indice(partes, destino, maquetar_delante, mapa, al_terminar_parte=None):
+    """Une las partes de recetas y pone delante la portada con el índice
+
+    `partes` da pares (ruta, {nombre: página dentro de la parte}), con las
+    páginas anotadas por las Marcas. `maquetar_delante(paginas)` maqueta la
+    portada con {nombre: página en el libro} y devuelve (ruta, páginas que
+    ocupa). Actualiza y guarda `mapa`. Devuelve el número total de páginas.
+    """
+    from unir_pdf import unir_pdfs
+
+    relativas = {}
+    pendientes = deque()
+    recetas = [0]  # páginas de recetas copiadas hasta ahora
+    destinos = {}
+
+    def rutas():
+        for ruta, paginas in partes:
+            pendientes.append(paginas)
+            yield ruta
+
+    def terminada(ruta, paginas):
+        if pendientes:
+            for nombre, pagina in pendientes.popleft().items():
+                relativas[nombre] = recetas[0] + pagina
+            recetas[0] += paginas
+        if al_terminar_parte:
+            al_terminar_parte(ruta, paginas)
+
+    def delante():
+        pendientes.clear()
+        previstas = mapa.delante or 1
+        ruta, paginas = maquetar_delante({nombre: previstas + pagina for nombre, pagina in relativas.items()})
+        if paginas != previstas:
+            # El ancho de la columna de páginas es fijo: la segunda vez ocupa lo mismo
+            previstas = paginas
+            ruta, paginas = maquetar_delante({nombre: previstas + pagina for nombre, pagina in relativas.items()})
+        destinos.update((nombre, previstas + pagina) for nombre, pagina in relativas.items())
+        return ruta
+
+    total = unir_pdfs(rutas(), destino, terminada, delante, destinos)
+    mapa.actualizar(destinos, total)
+    mapa.guardar()
+    return total
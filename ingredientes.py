@@ -0,0 +1,120 @@
+import hashlib
+import re
+
+# Cambiarlo invalida la caché de ingredientes ya extraídos
+VERSION_PATRONES = 1
+
+_VINETA = r'[-–•*·▪✔✅➡>]*'
+_CANTIDAD = r'(?P<cantidad>\d+(?:[.,]\d+)?(?:\s*/\s*\d+)?(?:\s*-\s*\d+(?:[.,]\d+)?)?|[½¼¾⅓⅔]|fél|medio|media)'
+_UNIDAD = (r'(?P<unidad>kg|dkg|dag|gr|g|mg|ml|cl|dl|l|db|'
+           r'evőkanál|ek|kávéskanál|kk|teáskanál|tk|bögre|csipet|csomag|gerezd|szelet|'
+           r'cucharadas?|cucharaditas?|tazas?|pizcas?|dientes?|sobres?|gramos?|litros?)')
+
+# "200 g harina", "- 2 evőkanál cukor", "½ taza de leche"
+_CANTIDAD_PRIMERO = re.compile(
+    rf'^\s*{_VINETA}\s*{_CANTIDAD}\s*(?:{_UNIDAD}\.?(?=\s))?\s+(?:de\s+)?(?P<nombre>[^\d].*?)\s*$',
+    re.IGNORECASE
+)
+# "harina: 200 g", "liszt - 25 dkg"
+_NOMBRE_PRIMERO = re.compile(
+    rf'^\s*{_VINETA}\s*(?P<nombre>[^\d:]+?)\s*[:\-–]\s*{_CANTIDAD}\s*(?:{_UNIDAD}\.?)?\s*$',
+    re.IGNORECASE
+)
+# "- sal", "• só ízlés szerint" (solo dentro de una sección de ingredientes)
+_SOLO_VINETA = re.compile(r'^\s*[-–•*·▪✔✅➡>]+\s*(?P<nombre>[^\d].{0,60}?)\s*$')
+_CABECERA = re.compile(r'^\s*(?:hozzávalók|ingredientes|összetevők)\b', re.IGNORECASE)
+
+_FRACCIONES = {'½': 0.5, '¼': 0.25, '¾': 0.75, '⅓': 1 / 3, '⅔': 2 / 3,
+               'fél': 0.5, 'medio': 0.5, 'media': 0.5}
+
+
+def _numero(cantidad):
+    """'1,5' -> 1.5, '1/2' -> 0.5, '2-3' -> 2.0, '½' -> 0.5"""
+    cantidad = cantidad.lower().replace(' ', '')
+    if cantidad in _FRACCIONES:
+        return _FRACCIONES[cantidad]
+    cantidad = cantidad.split('-')[0].replace(',', '.')
+    if '/' in cantidad:
+        numerador, denominador = cantidad.split('/')
+        return float(numerador) / float(denominador) if float(denominador) else None
+    return float(cantidad)
+
+
+def extraer_ingredientes(descripcion):
+    """Devuelve la lista de ingredientes (cantidad, unidad, ingrediente, linea) de una descripción"""
+    ingredientes = []
+    en_seccion = False
+    for linea in (descripcion or '').splitlines():
+        if not linea.strip():
+            en_seccion = False
+            continue
+        if _CABECERA.match(linea):
+            en_seccion = True
+            continue
+        coincidencia = _CANTIDAD_PRIMERO.match(linea) or _NOMBRE_PRIMERO.match(linea)
+        if coincidencia:
+            ingredientes.append({
+                'cantidad': _numero(coincidencia.group('cantidad')),
+                'unidad': (coincidencia.group('unidad') or '').lower(),
+                'ingrediente': coincidencia.group('nombre').strip(' .,;'),
+                'linea': linea.strip(),
+            })
+        elif en_seccion and (coincidencia := _SOLO_VINETA.match(linea)):
+            ingredientes.append({
+                'cantidad': None,
+                'unidad': '',
+                'ingrediente': coincidencia.group('nombre').strip(' .,;'),
+                'linea': linea.strip(),
+            })
+    return ingredientes
+
+
+def formatear_ingrediente(ingrediente):
+    """'200 g harina' a partir de un ingrediente extraído"""
+    partes = []
+    if ingrediente.get('cantidad') is not None:
+        partes.append(f"{ingrediente['cantidad']:g}")
+    if ingrediente.get('unidad'):
+        partes.append(ingrediente['unidad'])
+    partes.append(ingrediente.get('ingrediente', ''))
+    return ' '.join(partes)
+
+
+def huella_descripcion(descripcion):
+    texto = f"{VERSION_PATRONES}\0{descripcion or ''}"
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()
+
+
+class ExtractorIngredientes:
+    """Extrae ingredientes con caché por huella de la descripción
+
+    La caché vive en memoria y, si se pasa un almacén, también en SQLite, de
+    modo que una descripción sin cambios no se vuelve a analizar nunca.
+    """
+
+    def __init__(self, almacen=None):
+        self.almacen = almacen
+        self._memoria = {}
+        self.analizadas = 0
+        self.en_cache = 0
+
+    def extraer_lote(self, descripciones):
+        """Devuelve la lista de ingredientes de cada descripción, en el mismo orden"""
+        huellas = [huella_descripcion(d) for d in descripciones]
+        faltan = {h for h in huellas if h not in self._memoria}
+        if faltan and self.almacen is not None:
+            self._memoria.update(self.almacen.obtener_ingredientes(faltan))
+
+        nuevos = {}
+        for huella, descripcion in zip(huellas, descripciones):
+            if huella in self._memoria:
+                self.en_cache += 1
+                continue
+            self._memoria[huella] = nuevos[huella] = extraer_ingredientes(descripcion)
+            self.analizadas += 1
+        if nuevos and self.almacen is not None:
+            self.almacen.guardar_ingredientes(nuevos)
+        return [self._memoria[h] for h in huellas]
+
+    def extraer(self, descripcion):
+        return self.extraer_lote([descripcion])[0]
@@ -0,0 +1,219 @@
+"""
+Modo lote: varios canales en un solo proceso.
+
+Todos los canales comparten el pool de hilos, el planificador (un único
+presupuesto de peticiones), la sesión HTTP de las miniaturas y el almacén
+de metadatos/miniaturas/ingredientes. Cada canal tiene su propia carpeta de
+salida (recetas.json, punto de control, índice de búsqueda y libro PDF).
+
+Uso:
+    python lotes.py canales.txt [--workers 8] [--compartido recetas_compartido] [--sin-pdf]
+
+canales.txt tiene un canal por línea ("URL [carpeta]"; las líneas con # se
+ignoran) o es un JSON con una lista de {"url": ..., "carpeta": ...}.
+"""
+import argparse
+import json
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import main
+from almacen import AlmacenRecetas
+from descargas import DescargadorMiniaturas
+from metricas import Metricas
+from planificador import Planificador
+
+CARPETA_COMPARTIDA = 'recetas_compartido'
+
+
+def carpeta_de_canal(url, base='recetas_output'):
+    """Carpeta de salida por defecto: recetas_output/<nombre del canal>"""
+    nombre = url.rstrip('/').rsplit('/', 1)[-1].lstrip('@') or 'canal'
+    return os.path.join(base, nombre)
+
+
+def leer_canales(ruta):
+    """Lee la lista de canales: (url, carpeta) por canal"""
+    with open(ruta, encoding='utf-8') as f:
+        texto = f.read()
+    if ruta.endswith('.json'):
+        return [(c['url'], c.get('carpeta') or carpeta_de_canal(c['url'])) for c in json.loads(texto)]
+    canales = []
+    for linea in texto.splitlines():
+        linea = linea.split('#', 1)[0].strip()
+        if linea:
+            url, _, carpeta = linea.partition(' ')
+            canales.append((url, carpeta.strip() or carpeta_de_canal(url)))
+    return canales
+
+
+class _Canal:
+    """Estado de un canal durante el lote"""
+
+    def __init__(self, extractor, ydl, info, sincronizar):
+        self.extractor = extractor
+        self.ydl = ydl
+        self.videos = extractor._enumerar_videos(info, ydl)
+        self.max_edad, self.terminadas = extractor._preparar_procesado(sincronizar)
+        self.en_vuelo = deque()
+        self.vistos = 0
+        self.agotado = False
+
+    def recoger(self, bloquear=False):
+        """Añade, en el orden del canal, los resultados ya terminados"""
+        while self.en_vuelo and (bloquear or self.en_vuelo[0].done()):
+            self.extractor._agregar_receta(self.en_vuelo.popleft().result())
+
+
+class LoteCanales:
+    """Procesa varios canales con recursos compartidos y reparto equitativo
+
+    Los canales se turnan (round-robin) para enviar videos al pool, de modo
+    que un canal enorme no retrasa a los pequeños. Como mucho hay
+    2 × max_workers videos en vuelo entre todos los canales.
+    """
+
+    def __init__(self, canales, carpeta_compartida=CARPETA_COMPARTIDA, max_workers=8, ttl_dias=7,
+                 planificador=None, metricas=None):
+        self.max_workers = max(1, max_workers)
+        self.carpeta_compartida = carpeta_compartida
+        self.planificador = planificador or Planificador()
+        self.metricas = metricas or Metricas()
+
+        os.makedirs(os.path.join(carpeta_compartida, 'miniaturas'), exist_ok=True)
+        self.almacen = AlmacenRecetas(os.path.join(carpeta_compartida, 'recetas.db'))
+        self.descargador = DescargadorMiniaturas(
+            os.path.join(carpeta_compartida, 'miniaturas'), self.almacen,
+            max_conexiones=self.max_workers, metricas=self.metricas
+        )
+        self.ydls = main.InstanciasYDL()
+
+        self.extractores = [
+            main.YouTubeRecipeExtractor(
+                url, carpeta, self.max_workers, ttl_dias,
+                planificador=self.planificador, metricas=self.metricas,
+                almacen=self.almacen, descargador=self.descargador, ydls=self.ydls
+            )
+            for url, carpeta in canales
+        ]
+
+    def _listar(self, extractor):
+        """Lista plana de un canal; el YoutubeDL queda abierto mientras se recorre"""
+        ydl = main.requerir('yt_dlp', 'yt-dlp').YoutubeDL(main.YDL_OPTS_CANAL)
+        try:
+            return ydl, extractor._listar_canal(ydl)
+        except BaseException:
+            ydl.close()
+            raise
+
+    def ejecutar(self, sincronizar=True):
+        """Procesa todos los canales; devuelve {url: número de recetas}"""
+        print(f"🔍 Procesando {len(self.extractores)} canales con {self.max_workers} workers\n")
+        limite = 2 * self.max_workers
+        canales = []
+        activos = deque()
+        en_vuelo = deque()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                # Los listados de los canales también pasan por el pool
+                listados = {pool.submit(self._listar, extractor): extractor for extractor in self.extractores}
+
+                while listados or activos or en_vuelo:
+                    for futuro in [f for f in listados if f.done()]:
+                        extractor = listados.pop(futuro)
+                        try:
+                            ydl, info = futuro.result()
+                        except Exception as e:
+                            self.metricas.contar('errores_canal')
+                            print(f"❌ Error al listar {extractor.channel_url}: {str(e)}")
+                            continue
+                        print(f"   📁 Canal listo: {extractor.channel_url}")
+                        canal = _Canal(extractor, ydl, info, sincronizar)
+                        canales.append(canal)
+                        activos.append(canal)
+
+                    if activos and len(en_vuelo) < limite:
+                        # Turno del siguiente canal: un video y vuelve al final de la cola
+                        canal = activos.popleft()
+                        video = next(canal.videos, None)
+                        if video is None:
+                            canal.agotado = True
+                            continue
+                        canal.vistos += 1
+                        futuro = pool.submit(canal.extractor._procesar_video, canal.vistos, video, '?',
+                                             canal.max_edad, canal.terminadas)
+                        canal.en_vuelo.append(futuro)
+                        en_vuelo.append(futuro)
+                        activos.append(canal)
+                    elif en_vuelo:
+                        en_vuelo.popleft().result()
+                        for canal in canales:
+                            canal.recoger()
+                    elif listados:
+                        wait(listados, return_when=FIRST_COMPLETED)
+
+                for canal in canales:
+                    canal.recoger(bloquear=True)
+
+            # Videos y miniaturas que fallaron por limitación o errores de red
+            self.planificador.ejecutar_reintentos()
+        finally:
+            self.ydls.cerrar()
+            for canal in canales:
+                canal.ydl.close()
+                canal.extractor._cerrar_procesado()
+
+        main.imprimir_informe(self.planificador)
+        for canal in canales:
+            print(f"\n📺 {canal.extractor.channel_url}")
+            canal.extractor._terminar_procesado(canal.vistos)
+        self.guardar_metricas()
+        return {extractor.channel_url: len(extractor.recipes) for extractor in self.extractores}
+
+    def crear_libros_pdf(self):
+        """Un libro PDF por canal, en su carpeta"""
+        for extractor in self.extractores:
+            if extractor.recipes:
+                extractor.crear_libro_pdf()
+        self.guardar_metricas()
+
+    def guardar_metricas(self):
+        """Métricas globales del lote en la carpeta compartida"""
+        informe = self.planificador.informe()
+        self.metricas.fijar('tasa_peticiones', informe['tasa_final'])
+        self.metricas.fijar('recetas', sum(len(extractor.recipes) for extractor in self.extractores))
+        self.metricas.guardar(
+            os.path.join(self.carpeta_compartida, 'metricas.json'),
+            os.path.join(self.carpeta_compartida, 'metricas.prom'),
+            planificador=informe,
+            canales={extractor.channel_url: len(extractor.recipes) for extractor in self.extractores}
+        )
+
+    def cerrar(self):
+        for extractor in self.extractores:
+            extractor.cerrar()
+        self.descargador.cerrar()
+        self.almacen.cerrar()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Extrae las recetas de varios canales en un solo proceso.")
+    parser.add_argument('canales', help='Fichero con un canal por línea ("URL [carpeta]") o JSON')
+    parser.add_argument('--workers', type=int, default=8, help='Hilos compartidos por todos los canales')
+    parser.add_argument('--compartido', default=CARPETA_COMPARTIDA,
+                        help='Carpeta del almacén, las miniaturas y las métricas compartidas')
+    parser.add_argument('--sin-pdf', action='store_true', help='No generar los libros PDF')
+    args = parser.parse_args()
+
+    lote = LoteCanales(leer_canales(args.canales), args.compartido, args.workers)
+    try:
+        resultados = lote.ejecutar(sincronizar=True)
+        if not args.sin_pdf:
+            lote.crear_libros_pdf()
+    finally:
+        lote.cerrar()
+    print("\n" + "=" * 60)
+    for url, recetas in resultados.items():
+        print(f"   {recetas:6d} recetas  {url}")
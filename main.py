@@ -1,166 +1,569 @@
 import os
+import sys
 import json
-from datetime import datetime
-import requests
+import importlib
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from almacen import AlmacenRecetas, PuntoControl, id_de_receta
+from buscador import IndiceRecetas
+from ingredientes import ExtractorIngredientes, formatear_ingrediente
+from marcado import VERSION_MARCADO, aplicar_fuentes, lienzo_libro, marcado_de, marcar, recortar, sanear
+from descargas import DescargadorMiniaturas
+from imagenes import DPI_IMPRESION, DerivadosMiniaturas, elegir_miniatura
+from metricas import Metricas
+from planificador import Planificador, es_transitorio
 
 # Necesitarás instalar estas librerías:
 # pip install yt-dlp pillow reportlab
+#
+# yt-dlp y reportlab tardan en cargarse, así que se importan solo al usarlos
+# (ver requerir): sincronizar no carga reportlab y generar el PDF no carga yt-dlp
+
+def requerir(modulo, paquete):
+    """Importa una dependencia pesada al usarla, o sale explicando cómo instalarla"""
+    try:
+        return importlib.import_module(modulo)
+    except ImportError:
+        print("Por favor instala las dependencias necesarias:")
+        print(f"pip install {paquete}")
+        sys.exit(1)
+
+# Puntos por pulgada (reportlab.lib.units.inch)
+PULGADA = 72.0
+
+# Tamaño de la miniatura en el libro PDF
+MINIATURA_ANCHO = 4 * PULGADA
+MINIATURA_ALTO = 3 * PULGADA
+
+# Opciones para obtener información detallada de cada video
+YDL_OPTS_VIDEO = {
+    'quiet': True,
+    'no_warnings': True,
+    'skip_download': True,
+}
+
+# Opciones para pedir solo los metadatos: sin JS del reproductor ni
+# configuraciones extra de clientes, que solo sirven para resolver formatos,
+# y sin manifiestos DASH/HLS ni subtítulos traducidos
+YDL_OPTS_VIDEO_LIGERO = dict(YDL_OPTS_VIDEO, extractor_args={
+    'youtube': {
+        'player_skip': ['js', 'configs'],
+        'skip': ['dash', 'hls', 'translated_subs'],
+    },
+})
+
+# Opciones para extraer solo la lista de videos del canal
+YDL_OPTS_CANAL = {
+    'quiet': True,
+    'no_warnings': True,
+    'extract_flat': 'in_playlist',
+    'skip_download': True,
+}
+
+# Campos de yt-dlp que necesita una receta
+CAMPOS_RECETA = ('title', 'description', 'duration', 'upload_date')
+
+# Recetas por parte al maquetar el libro por partes (memoria acotada)
+RECETAS_POR_PARTE = 100
+
+# Recetas terminadas cuyos ingredientes se extraen juntos: una consulta y un
+# commit al almacén por lote en lugar de por receta (ver _vaciar_recetas)
+LOTE_INGREDIENTES = 50
+
+class InstanciasYDL:
+    """Una instancia de YoutubeDL por hilo (y modo), reutilizable entre canales"""
+    
+    def __init__(self):
+        self._local = threading.local()
+        self._ydls = []
+        self._lock = threading.Lock()
+    
+    def obtener(self, ligero=False):
+        """Devuelve la instancia de YoutubeDL propia del hilo actual"""
+        atributo = 'ydl_ligero' if ligero else 'ydl'
+        ydl = getattr(self._local, atributo, None)
+        if ydl is None:
+            ydl = requerir('yt_dlp', 'yt-dlp').YoutubeDL(YDL_OPTS_VIDEO_LIGERO if ligero else YDL_OPTS_VIDEO)
+            setattr(self._local, atributo, ydl)
+            with self._lock:
+                self._ydls.append(ydl)
+        return ydl
+    
+    def cerrar(self):
+        """Cierra todas las instancias de YoutubeDL creadas por los hilos"""
+        with self._lock:
+            ydls, self._ydls = self._ydls, []
+        for ydl in ydls:
+            ydl.close()
+        self._local = threading.local()
 
-try:
-    import yt_dlp
-    from PIL import Image
-    from reportlab.lib.pagesizes import letter, A4
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import inch
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image as RLImage, PageBreak
-    from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
-except ImportError:
-    print("Por favor instala las dependencias necesarias:")
-    print("pip install yt-dlp pillow reportlab")
-    exit(1)
 
 class YouTubeRecipeExtractor:
-    def __init__(self, channel_url, output_folder="recetas_output"):
+    def __init__(self, channel_url, output_folder="recetas_output", max_workers=1, ttl_dias=7,
+                 extraccion_ligera=True, planificador=None, metricas=None,
+                 almacen=None, descargador=None, ydls=None, indexar=True):
         self.channel_url = channel_url
+        # ID del canal (UC...), conocido tras listarlo; lo usa vigilancia.py para el feed
+        self.channel_id = None
         self.output_folder = output_folder
         self.recipes = []
         
+        # Número de videos que se procesan en paralelo (1 = secuencial)
+        self.max_workers = max(1, max_workers)
+        
+        # En modo lote (ver lotes.py) el almacén, el descargador, las
+        # instancias de YoutubeDL y las métricas son compartidos: los cierra
+        # y guarda quien los creó
+        self._propios = {'almacen': almacen is None, 'descargador': descargador is None,
+                         'ydls': ydls is None, 'metricas': metricas is None}
+        self.ydls = ydls or InstanciasYDL()
+        
+        # Pedir solo metadatos y recurrir a la extracción completa si falta algún campo
+        self.extraccion_ligera = extraccion_ligera
+        
+        # Limita la tasa de peticiones (metadatos y miniaturas) y gestiona los reintentos
+        self.planificador = planificador or Planificador()
+        
+        # Tiempos por etapa y contadores; se guardan en datos/metricas.json y .prom
+        self.metricas = metricas or Metricas()
+        
         # Crear carpetas
         os.makedirs(output_folder, exist_ok=True)
         os.makedirs(f"{output_folder}/miniaturas", exist_ok=True)
         os.makedirs(f"{output_folder}/datos", exist_ok=True)
+        
+        # Metadatos ya descargados; en modo sincronización solo se vuelven
+        # a pedir los videos nuevos o con más de ttl_dias de antigüedad
+        self.almacen = almacen or AlmacenRecetas(os.path.join(output_folder, "datos", "recetas.db"))
+        self.ttl_dias = ttl_dias
+        
+        # Cada receta terminada se registra aquí para poder reanudar tras un fallo
+        self.punto_control = PuntoControl(os.path.join(output_folder, "datos", "recetas.jsonl"))
+        
+        # Ingredientes estructurados, en caché por huella de la descripción
+        self.ingredientes = ExtractorIngredientes(self.almacen)
+        # Recetas terminadas que esperan a extraer sus ingredientes en lote
+        self._por_registrar = []
+        
+        # Índice de búsqueda, actualizado receta a receta (ver buscador.py); sin
+        # él (indexar=False) no se abre datos/indice.db, como en los trabajadores de cola.py
+        self.indice = IndiceRecetas(os.path.join(output_folder, "datos", "indice.db")) if indexar else None
+        
+        # Una sesión HTTP compartida por todos los hilos para las miniaturas
+        self.descargador = descargador or DescargadorMiniaturas(
+            os.path.join(output_folder, "miniaturas"), self.almacen,
+            max_conexiones=self.max_workers, metricas=self.metricas
+        )
     
-    def extraer_videos(self):
-        """Extrae información de todos los videos del canal"""
+    def extraer_videos(self, sincronizar=False):
+        """Extrae información de todos los videos del canal; devuelve cuántos hay (None si falla)"""
         print(f"🔍 Extrayendo información del canal: {self.channel_url}\n")
         
-        # Opciones para extraer solo la lista de videos
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-            'extract_flat': 'in_playlist',
-            'skip_download': True,
-        }
-        
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            with requerir('yt_dlp', 'yt-dlp').YoutubeDL(YDL_OPTS_CANAL) as ydl:
                 print("📡 Obteniendo lista de videos...")
-                info = ydl.extract_info(self.channel_url, download=False)
+                info = self._listar_canal(ydl)
                 
-                # Encontrar todos los videos en las diferentes tabs
-                all_videos = []
+                # Cada video se procesa en cuanto sale de la lista del canal
+                total = self.procesar_videos(self._enumerar_videos(info, ydl), sincronizar)
                 
-                if 'entries' in info:
-                    for entry in info['entries']:
-                        if entry is None:
-                            continue
-                        
-                        # Si es una playlist (tab del canal)
-                        if entry.get('_type') == 'playlist' and 'entries' in entry:
-                            tab_name = entry.get('title', 'Unknown')
-                            print(f"   📁 Procesando: {tab_name}")
-                            
-                            for video in entry['entries']:
-                                if video and video.get('id'):
-                                    # Solo añadir si no está ya en la lista
-                                    if not any(v['id'] == video['id'] for v in all_videos):
-                                        all_videos.append(video)
-                        # Si es un video directo
-                        elif entry.get('id'):
-                            if not any(v['id'] == entry['id'] for v in all_videos):
-                                all_videos.append(entry)
+                print(f"\n✅ Se encontraron {total} videos únicos\n")
                 
-                print(f"\n✅ Se encontraron {len(all_videos)} videos únicos\n")
-                
-                if len(all_videos) == 0:
+                if total == 0:
                     print("❌ No se encontraron videos en el canal")
-                    return
-                
-                # Procesar cada video
-                self.procesar_videos(all_videos)
+                return total
                 
         except Exception as e:
             print(f"❌ Error al extraer videos: {str(e)}")
             import traceback
             traceback.print_exc()
     
-    def procesar_videos(self, videos):
-        """Procesa cada video individualmente"""
-        total = len(videos)
+    def _listar_canal(self, ydl):
+        """Primera página de la lista del canal; el resto se pide al recorrerla
         
-        for i, video in enumerate(videos, 1):
-            try:
-                video_id = video.get('id')
-                video_url = f"https://www.youtube.com/watch?v={video_id}"
-                
-                print(f"📹 [{i}/{total}] Procesando video {video_id}...")
-                
-                # Opciones para obtener información detallada
-                ydl_opts = {
-                    'quiet': True,
-                    'no_warnings': True,
-                    'skip_download': True,
-                }
-                
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    video_info = ydl.extract_info(video_url, download=False)
-                    
-                    titulo = video_info.get('title', 'Sin título')
-                    print(f"   ✓ {titulo[:60]}...")
-                    
-                    receta = {
-                        'numero': i,
-                        'titulo': titulo,
-                        'descripcion': video_info.get('description', 'Sin descripción'),
-                        'url': video_url,
-                        'duracion': video_info.get('duration', 0),
-                        'fecha_publicacion': video_info.get('upload_date', ''),
-                        'miniatura_url': video_info.get('thumbnail', ''),
-                        'miniatura_local': ''
-                    }
-                    
-                    # Descargar miniatura
-                    miniatura_path = self.descargar_miniatura(
-                        receta['miniatura_url'], 
-                        f"receta_{i:03d}.jpg"
-                    )
-                    receta['miniatura_local'] = miniatura_path
-                    
-                    self.recipes.append(receta)
-                    
-            except Exception as e:
-                print(f"   ⚠️  Error procesando video: {str(e)}")
+        Con process=True yt-dlp haría list() de las entradas de cada tab (todas
+        sus páginas) antes de devolver nada; sin procesar, las tabs llegan como
+        URLs y sus entradas como generadores (ver _enumerar_videos).
+        """
+        with self.metricas.medir('enumeracion'):
+            info = self._resolver_tab(ydl, ydl.extract_info(self.channel_url, download=False, process=False))
+        self.channel_id = info.get('channel_id') or self.channel_id
+        return info
+    
+    @staticmethod
+    def _resolver_tab(ydl, entry):
+        """Sigue las entradas que solo son la URL de una tab del canal (/videos, /shorts...)"""
+        while (ydl is not None and entry.get('_type') in ('url', 'url_transparent')
+               and entry.get('ie_key') == 'YoutubeTab'):
+            entry = ydl.extract_info(entry['url'], download=False, process=False)
+        return entry
+    
+    def _enumerar_videos(self, info, ydl=None):
+        """Recorre las tabs del canal y genera cada video una sola vez
+        
+        Con `ydl`, las tabs sin resolver se piden al llegar a ellas, así que
+        el primer video sale tras la primera página y no tras el canal entero.
+        """
+        vistos = set()
+        
+        for entry in info.get('entries') or ():
+            if entry is None:
                 continue
+            entry = self._resolver_tab(ydl, entry)
+            
+            # Si es una playlist (tab del canal)
+            if entry.get('_type') == 'playlist' and 'entries' in entry:
+                tab_name = entry.get('title', 'Unknown')
+                print(f"   📁 Procesando: {tab_name}")
+                videos = entry['entries']
+            # Si es un video directo
+            else:
+                videos = (entry,)
+            
+            for video in videos:
+                # Solo generar si no ha salido ya en otra tab
+                if video and video.get('id') and video['id'] not in vistos:
+                    vistos.add(video['id'])
+                    yield video
+    
+    def _ydl(self, ligero=False):
+        """Devuelve la instancia de YoutubeDL propia del hilo actual"""
+        return self.ydls.obtener(ligero)
+    
+    def _cerrar_ydls(self):
+        if self._propios['ydls']:
+            self.ydls.cerrar()
+    
+    def procesar_videos(self, videos, sincronizar=False, conocidas=None):
+        """Procesa cada video individualmente
+        
+        `videos` puede ser cualquier iterable, incluido un generador: cada
+        video se procesa en cuanto llega. Los que están en `conocidas`
+        ({video_id: receta}) no se vuelven a pedir, solo se renumeran.
+        Devuelve el número de videos vistos.
+        """
+        total = len(videos) if hasattr(videos, '__len__') else '?'
+        max_edad, terminadas = self._preparar_procesado(sincronizar)
+        if conocidas:
+            # Lo registrado por una ejecución anterior interrumpida es más reciente
+            terminadas = {**conocidas, **terminadas}
+        vistos = 0
+        
+        try:
+            if self.max_workers > 1:
+                # Como mucho 2 videos por worker en vuelo; los resultados se
+                # recogen en el orden original del canal
+                with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                    en_vuelo = deque()
+                    for vistos, video in enumerate(videos, 1):
+                        en_vuelo.append(pool.submit(self._procesar_video, vistos, video, total, max_edad, terminadas))
+                        if len(en_vuelo) >= 2 * self.max_workers:
+                            self._agregar_receta(en_vuelo.popleft().result())
+                    while en_vuelo:
+                        self._agregar_receta(en_vuelo.popleft().result())
+            else:
+                for vistos, video in enumerate(videos, 1):
+                    self._agregar_receta(self._procesar_video(vistos, video, total, max_edad, terminadas))
+            
+            # Videos y miniaturas que fallaron por limitación o errores de red
+            self.planificador.ejecutar_reintentos()
+        finally:
+            self._cerrar_ydls()
+            self._cerrar_procesado()
+        
+        imprimir_informe(self.planificador)
+        self._terminar_procesado(vistos)
+        return vistos
+    
+    def procesar_nuevos(self, videos):
+        """Procesa solo los videos que no están en recetas.json y los pone delante
+        
+        `videos` va del más reciente al más antiguo (como el feed del canal).
+        Las recetas anteriores se conservan sin pedirlas de nuevo; el orden
+        exacto del canal lo restablece la siguiente enumeración completa.
+        Devuelve el número de recetas nuevas.
+        """
+        conocidas = {id_de_receta(receta): receta for receta in self.cargar_json()}
+        nuevos = [video for video in videos if video['id'] not in conocidas]
+        if not nuevos:
+            return 0
+        self.recipes = []
+        self.procesar_videos(nuevos + [{'id': video_id} for video_id in conocidas], conocidas=conocidas)
+        return sum(1 for receta in self.recipes if id_de_receta(receta) not in conocidas)
+    
+    def cargar_json(self):
+        """Recetas de recetas.json (lista vacía si aún no existe)"""
+        json_path = os.path.join(self.output_folder, "datos", "recetas.json")
+        if not os.path.exists(json_path):
+            return []
+        with open(json_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def _preparar_procesado(self, sincronizar):
+        """Antigüedad máxima aceptada del almacén y recetas del punto de control"""
+        terminadas = self.punto_control.cargar()
+        if terminadas:
+            print(f"⏯️  Reanudando: {len(terminadas)} videos ya procesados en una ejecución anterior")
+        return (self.ttl_dias * 24 * 3600 if sincronizar else None), terminadas
+    
+    def _cerrar_procesado(self):
+        try:
+            self._vaciar_recetas()
+        finally:
+            self.punto_control.cerrar()
+            if self.indice is not None:
+                self.indice.confirmar()
+    
+    def _terminar_procesado(self, vistos):
+        """Ordena las recetas y guarda el JSON y las métricas"""
+        self.recipes.sort(key=lambda receta: receta['numero'])
+        self.metricas.contar('videos_vistos', vistos)
         
         # Guardar datos en JSON
         if self.recipes:
             self.guardar_json()
             print(f"\n✅ Extracción completada: {len(self.recipes)} recetas guardadas")
+        
+        self.guardar_metricas()
+    
+    def _agregar_receta(self, receta):
+        """Encola una receta terminada; se registra con las demás del lote"""
+        if receta:
+            self._por_registrar.append(receta)
+            if len(self._por_registrar) >= LOTE_INGREDIENTES:
+                self._vaciar_recetas()
     
-    def descargar_miniatura(self, url, filename):
-        """Descarga la miniatura del video"""
+    def _vaciar_recetas(self):
+        """Extrae de una vez los ingredientes de las recetas encoladas y las registra"""
+        recetas, self._por_registrar = self._por_registrar, []
+        sin_ingredientes = [receta for receta in recetas if 'ingredientes' not in receta]
+        if sin_ingredientes:
+            extraidos = self.ingredientes.extraer_lote([receta['descripcion'] for receta in sin_ingredientes])
+            for receta, ingredientes in zip(sin_ingredientes, extraidos):
+                receta['ingredientes'] = ingredientes
+        for receta in recetas:
+            self._registrar_receta(receta)
+    
+    def _registrar_receta(self, receta):
+        # Título y descripción saneados para el PDF, una sola vez por receta
+        if receta.get('marcado', {}).get('version') != VERSION_MARCADO:
+            receta['marcado'] = marcar(receta)
+        self.recipes.append(receta)
+        self.punto_control.agregar(receta)
+        if self.indice is not None:
+            self.indice.indexar(receta)
+    
+    def _procesar_video(self, i, video, total, max_edad=None, terminadas=None, intento=0):
+        """Extrae la información de un video y descarga su miniatura"""
+        try:
+            video_id = video.get('id')
+            video_url = f"https://www.youtube.com/watch?v={video_id}"
+            
+            if terminadas and video_id in terminadas:
+                self.metricas.contar('videos_reanudados')
+                return dict(terminadas[video_id], numero=i)
+            
+            if max_edad is not None:
+                receta = self.almacen.obtener(video_id, max_edad)
+                if receta is not None:
+                    self.metricas.contar('videos_sin_cambios')
+                    print(f"♻️  [{i}/{total}] Video {video_id} sin cambios")
+                    receta['numero'] = i
+                    return receta
+            
+            print(f"📹 [{i}/{total}] Procesando video {video_id}...")
+            inicio = time.perf_counter()
+            
+            with self.metricas.medir('extract_info'):
+                video_info = self._extraer_info(video_url)
+            
+            titulo = video_info.get('title', 'Sin título')
+            print(f"   ✓ {titulo[:60]}...")
+            
+            receta = {
+                'numero': i,
+                'titulo': titulo,
+                'descripcion': video_info.get('description', 'Sin descripción'),
+                'url': video_url,
+                'duracion': video_info.get('duration', 0),
+                'fecha_publicacion': video_info.get('upload_date', ''),
+                # La variante más pequeña que sigue siendo nítida al imprimir
+                'miniatura_url': (elegir_miniatura(video_info.get('thumbnails'),
+                                                   MINIATURA_ANCHO / PULGADA * DPI_IMPRESION)
+                                  or video_info.get('thumbnail', '')),
+                'miniatura_local': ''
+            }
+            
+            # Descargar miniatura (nombrada por ID para que no cambie
+            # aunque el video cambie de posición entre ejecuciones)
+            miniatura_path = self.descargar_miniatura(
+                receta['miniatura_url'], 
+                f"receta_{video_id}.jpg",
+                receta
+            )
+            receta['miniatura_local'] = miniatura_path
+            
+            self.almacen.guardar(video_id, receta)
+            self.metricas.observar('video', time.perf_counter() - inicio)
+            self.metricas.contar('videos_extraidos')
+            return receta
+                
+        except Exception as e:
+            descripcion = f"video {video.get('id')}"
+            if es_transitorio(e):
+                espera = self.planificador.reintentar(
+                    descripcion,
+                    lambda n: self._agregar_receta(
+                        self._procesar_video(i, video, total, max_edad, terminadas, n)),
+                    intento + 1
+                )
+                if espera is not None:
+                    self.metricas.contar('reintentos_video')
+                    print(f"   ⏳ {descripcion} reprogramado en {espera:.1f} s: {str(e)}")
+                    return None
+            else:
+                self.planificador.fallo(descripcion)
+            self.metricas.contar('errores_video')
+            print(f"   ⚠️  Error procesando video: {str(e)}")
+            return None
+    
+    def _extraer_info(self, video_url):
+        """Obtiene los metadatos de un video, en modo ligero si es posible"""
+        if self.extraccion_ligera:
+            # process=False evita la selección y ordenación de formatos
+            video_info = self.planificador.llamar(
+                self._ydl(ligero=True).extract_info, video_url, download=False, process=False)
+            
+            # Campos que yt-dlp solo rellena al procesar el resultado
+            if not video_info.get('upload_date') and video_info.get('timestamp'):
+                fecha = datetime.fromtimestamp(video_info['timestamp'], timezone.utc)
+                video_info['upload_date'] = fecha.strftime('%Y%m%d')
+            if not video_info.get('thumbnail') and video_info.get('thumbnails'):
+                video_info['thumbnail'] = video_info['thumbnails'][-1].get('url', '')
+            
+            faltan = [campo for campo in CAMPOS_RECETA if video_info.get(campo) is None]
+            if not faltan:
+                return video_info
+            self.metricas.contar('extracciones_completas')
+            print(f"   ↪️  Faltan campos ({', '.join(faltan)}), extracción completa")
+        
+        return self.planificador.llamar(self._ydl().extract_info, video_url, download=False)
+    
+    def descargar_miniatura(self, url, filename, receta=None, intento=0):
+        """Descarga la miniatura del video
+        
+        Si se pasa la receta y el error es transitorio, la descarga se
+        reprograma y la receta se actualiza cuando termine.
+        """
         if not url:
             return ""
         
         try:
-            response = requests.get(url, timeout=10)
-            filepath = os.path.join(self.output_folder, "miniaturas", filename)
-            
-            with open(filepath, 'wb') as f:
-                f.write(response.content)
-            
-            return filepath
+            with self.metricas.medir('descarga_miniatura'):
+                return self.planificador.llamar(self.descargador.descargar, url, filename,
+                                                os.path.join(self.output_folder, "miniaturas"))
         except Exception as e:
+            descripcion = f"miniatura {filename}"
+            if receta is not None and es_transitorio(e):
+                espera = self.planificador.reintentar(
+                    descripcion,
+                    lambda n: self._reintentar_miniatura(receta, filename, n),
+                    intento + 1
+                )
+                if espera is not None:
+                    self.metricas.contar('reintentos_miniatura')
+                    print(f"   ⏳ {descripcion} reprogramada en {espera:.1f} s: {str(e)}")
+                    return ""
+            else:
+                self.planificador.fallo(descripcion)
+            self.metricas.contar('errores_miniatura')
             print(f"   ⚠️  Error descargando miniatura: {str(e)}")
             return ""
     
+    def _reintentar_miniatura(self, receta, filename, intento):
+        miniatura_path = self.descargar_miniatura(receta['miniatura_url'], filename, receta, intento)
+        if miniatura_path:
+            receta['miniatura_local'] = miniatura_path
+            self.almacen.guardar(id_de_receta(receta), receta)
+            self.punto_control.agregar(receta, forzar=True)
+    
+    def actualizar_miniaturas(self):
+        """Revisa las miniaturas de recetas.json sin volver a pedir los metadatos
+
+        Las peticiones son condicionales, así que solo se descargan las que
+        faltan o han cambiado. Después prepara los derivados de impresión.
+        """
+        json_path = os.path.join(self.output_folder, "datos", "recetas.json")
+        if not os.path.exists(json_path):
+            print(f"❌ No existe {json_path}")
+            return 0
+        with open(json_path, 'r', encoding='utf-8') as f:
+            self.recipes = json.load(f)
+
+        print(f"🖼️  Revisando {len(self.recipes)} miniaturas...")
+
+        def actualizar(receta):
+            ruta = self.descargar_miniatura(receta.get('miniatura_url'), f"receta_{id_de_receta(receta)}.jpg")
+            if ruta and ruta != receta.get('miniatura_local'):
+                receta['miniatura_local'] = ruta
+                return True
+            return False
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            cambiadas = sum(pool.map(actualizar, self.recipes))
+
+        if cambiadas:
+            with self.metricas.medir('escritura_json'):
+                with open(json_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.recipes, f, ensure_ascii=False, indent=2)
+
+        with self.metricas.medir('pdf_miniaturas'):
+            DerivadosMiniaturas(os.path.join(self.output_folder, "miniaturas", "impresion")).preparar(
+                [receta.get('miniatura_local') for receta in self.recipes], MINIATURA_ANCHO, MINIATURA_ALTO
+            )
+        print(f"✅ {cambiadas} miniaturas nuevas o con otra ruta")
+        self.guardar_metricas()
+        return cambiadas
+
+    def cerrar(self):
+        """Libera la sesión HTTP y las conexiones al almacén y al índice"""
+        if self._propios['descargador']:
+            self.descargador.cerrar()
+        if self._propios['almacen']:
+            self.almacen.cerrar()
+        if self.indice is not None:
+            self.indice.cerrar()
+    
     def guardar_json(self):
         """Guarda los datos en formato JSON"""
         json_path = os.path.join(self.output_folder, "datos", "recetas.json")
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(self.recipes, f, ensure_ascii=False, indent=2)
+        with self.metricas.medir('escritura_json'):
+            if os.path.exists(self.punto_control.ruta):
+                # Compactar el registro JSONL; después ya no hace falta reanudar
+                self.punto_control.compactar(json_path)
+                self.punto_control.eliminar()
+            else:
+                with open(json_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.recipes, f, ensure_ascii=False, indent=2)
         print(f"\n💾 Datos guardados en: {json_path}")
     
+    def guardar_metricas(self):
+        """Guarda el informe de la ejecución en JSON y en formato de texto de Prometheus"""
+        if not self._propios['metricas']:
+            return
+        informe = self.planificador.informe()
+        self.metricas.fijar('tasa_peticiones', informe['tasa_final'])
+        self.metricas.fijar('recetas', len(self.recipes))
+        carpeta = os.path.join(self.output_folder, "datos")
+        self.metricas.guardar(os.path.join(carpeta, "metricas.json"),
+                              os.path.join(carpeta, "metricas.prom"),
+                              planificador=informe)
+    
     def crear_libro_pdf(self):
         """Crea un libro PDF bonito con todas las recetas"""
         if not self.recipes:
@@ -169,10 +572,23 @@ class YouTubeRecipeExtractor:
         
         print("\n📖 Generando libro de recetas PDF...")
         
+        requerir('reportlab', 'reportlab')
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.lib.units import inch
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image as RLImage, PageBreak, LongTable, TableStyle
+        from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_RIGHT
+        from reportlab.lib.utils import ImageReader
+        from indice_pdf import EntradaIndice, MapaPaginas, Marca, estimar_paginas, nombre_destino, unir_con_indice
+        
         pdf_path = os.path.join(self.output_folder, f"Libro_Recetas_{datetime.now().strftime('%Y%m%d')}.pdf")
-        doc = SimpleDocTemplate(pdf_path, pagesize=A4,
-                                topMargin=0.75*inch, bottomMargin=0.75*inch,
-                                leftMargin=0.75*inch, rightMargin=0.75*inch)
+        # Páginas de la maquetación anterior, para numerar el índice a la primera
+        mapa = MapaPaginas(os.path.join(self.output_folder, "datos", "paginas_pdf.json"))
+        
+        def documento(ruta):
+            return SimpleDocTemplate(ruta, pagesize=A4,
+                                     topMargin=0.75*inch, bottomMargin=0.75*inch,
+                                     leftMargin=0.75*inch, rightMargin=0.75*inch)
         
         # Estilos
         styles = getSampleStyleSheet()
@@ -209,72 +625,203 @@ class YouTubeRecipeExtractor:
             leading=14
         )
         
+        # Número de página del índice, en una columna de ancho fijo
+        pagina_style = ParagraphStyle('IndicePagina', parent=styles['Normal'], alignment=TA_RIGHT)
+        # Helvetica no tiene 'ő' ni 'ű': se usa DejaVu Sans si está instalada (ver marcado.py)
+        aplicar_fuentes([*styles.byName.values(), title_style, recipe_title_style, content_style, pagina_style])
+        ancho_marco = A4[0] - 1.5*inch - 12
+        
+        # Miniaturas redimensionadas al tamaño de impresión (en caché)
+        with self.metricas.medir('pdf_miniaturas'):
+            derivados = DerivadosMiniaturas(os.path.join(self.output_folder, "miniaturas", "impresion")).preparar(
+                [receta['miniatura_local'] for receta in self.recipes], MINIATURA_ANCHO, MINIATURA_ALTO
+            )
+        
         # Construir el documento
-        story = []
-        
-        # Portada
-        story.append(Spacer(1, 2*inch))
-        story.append(Paragraph("🍳", title_style))
-        story.append(Paragraph("Libro de Recetas", title_style))
-        story.append(Paragraph("Colección Bebepiskóta", styles['Normal']))
-        story.append(Spacer(1, 0.5*inch))
-        story.append(Paragraph(f"Recopilado el {datetime.now().strftime('%d/%m/%Y')}", styles['Normal']))
-        story.append(Paragraph(f"Total de recetas: {len(self.recipes)}", styles['Normal']))
-        story.append(PageBreak())
-        
-        # Índice
-        story.append(Paragraph("📑 Índice de Recetas", title_style))
-        story.append(Spacer(1, 0.3*inch))
-        
-        for receta in self.recipes:
-            indice_text = f"{receta['numero']}. {receta['titulo']}"
-            story.append(Paragraph(indice_text, styles['Normal']))
-            story.append(Spacer(1, 6))
-        
-        story.append(PageBreak())
-        
-        # Recetas
-        for receta in self.recipes:
-            # Título de la receta
-            story.append(Paragraph(f"Receta #{receta['numero']}", styles['Normal']))
-            story.append(Paragraph(receta['titulo'], recipe_title_style))
-            story.append(Spacer(1, 0.2*inch))
+        inicio = time.perf_counter()
+        
+        def portada(story, paginas, externo):
+            story.append(Spacer(1, 2*inch))
+            story.append(Paragraph("🍳", title_style))
+            story.append(Paragraph("Libro de Recetas", title_style))
+            story.append(Paragraph("Colección Bebepiskóta", styles['Normal']))
+            story.append(Spacer(1, 0.5*inch))
+            story.append(Paragraph(f"Recopilado el {datetime.now().strftime('%d/%m/%Y')}", styles['Normal']))
+            story.append(Paragraph(f"Total de recetas: {len(self.recipes)}", styles['Normal']))
+            story.append(PageBreak())
+            story.extend(indice(paginas, externo))
+        
+        def indice(paginas, externo):
+            # Cada entrada enlaza con la primera página de su receta
+            filas = []
+            for receta in self.recipes:
+                nombre = nombre_destino(receta)
+                filas.append([
+                    EntradaIndice(f"{receta['numero']}. {marcado_de(receta)[0]}", styles['Normal'], nombre, externo),
+                    EntradaIndice(str(paginas.get(nombre, '')), pagina_style, nombre, externo),
+                ])
+            # LongTable reparte miles de filas entre páginas sin recalcular la tabla entera
+            tabla = LongTable(filas, colWidths=[ancho_marco - 0.6*inch, 0.6*inch])
+            tabla.setStyle(TableStyle([
+                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+                ('TOPPADDING', (0, 0), (-1, -1), 0),
+                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+            ]))
+            return [Paragraph("📑 Índice de Recetas", title_style), Spacer(1, 0.3*inch), tabla, PageBreak()]
+        
+        # Recetas que no salen tal cual en el PDF: {url: (título, motivo)}
+        degradadas = {}
+        
+        def degradar(receta, motivo):
+            titulo, motivos = degradadas.get(receta['url'], (receta['titulo'], ''))
+            if motivo not in motivos:
+                motivos = f"{motivos}; {motivo}" if motivos else motivo
+            degradadas[receta['url']] = (titulo, motivos)
+        
+        def contenido_receta(receta, titulo, descripcion):
+            contenido = [
+                Paragraph(f"Receta #{receta['numero']}", styles['Normal']),
+                Paragraph(titulo, recipe_title_style),
+                Spacer(1, 0.2*inch),
+            ]
             
-            # Miniatura
+            # Miniatura (se lee la cabecera ya: una imagen rota haría fallar la maquetación)
             if receta['miniatura_local'] and os.path.exists(receta['miniatura_local']):
                 try:
-                    img = RLImage(receta['miniatura_local'], width=4*inch, height=3*inch)
-                    story.append(img)
-                    story.append(Spacer(1, 0.2*inch))
-                except Exception as e:
-                    pass
+                    miniatura = derivados.get(receta['miniatura_local'], receta['miniatura_local'])
+                    ImageReader(miniatura).getSize()
+                    contenido.append(RLImage(miniatura, width=MINIATURA_ANCHO, height=MINIATURA_ALTO))
+                    contenido.append(Spacer(1, 0.2*inch))
+                except Exception:
+                    degradar(receta, f"miniatura ilegible: {receta['miniatura_local']}")
+            
+            # Ingredientes extraídos al procesar el video
+            if receta.get('ingredientes'):
+                contenido.append(Paragraph("<b>Ingredientes:</b>", content_style))
+                for ingrediente in receta['ingredientes']:
+                    contenido.append(Paragraph(f"• {sanear(formatear_ingrediente(ingrediente))[0]}", styles['Normal']))
+                contenido.append(Spacer(1, 0.2*inch))
             
             # Descripción
             if receta['descripcion'] and len(receta['descripcion']) > 50:
-                story.append(Paragraph("<b>Descripción:</b>", content_style))
-                
-                # Limpiar y formatear descripción
-                descripcion = receta['descripcion'].replace('\n', '<br/>')
+                contenido.append(Paragraph("<b>Descripción:</b>", content_style))
                 # Limitar longitud si es muy larga
-                if len(descripcion) > 2000:
-                    descripcion = descripcion[:2000] + "..."
-                
-                story.append(Paragraph(descripcion, content_style))
-                story.append(Spacer(1, 0.2*inch))
+                contenido.append(Paragraph(recortar(descripcion, 2000).replace('\n', '<br/>'), content_style))
+                contenido.append(Spacer(1, 0.2*inch))
             
             # Link al video
-            story.append(Paragraph(f"🔗 <b>Ver video completo:</b> {receta['url']}", styles['Normal']))
-            
+            contenido.append(Paragraph(f"🔗 <b>Ver video completo:</b> {sanear(receta['url'])[0]}", styles['Normal']))
+            return contenido
+        
+        def receta_simplificada(receta, titulo, descripcion):
+            # Solo el texto saneado, sin imagen ni ingredientes
+            return [
+                Paragraph(f"Receta #{receta['numero']}", styles['Normal']),
+                Paragraph(titulo, recipe_title_style),
+                Paragraph(recortar(descripcion, 2000).replace('\n', '<br/>'), content_style),
+                Paragraph(f"Ver video completo: {sanear(receta['url'])[0]}", styles['Normal']),
+            ]
+        
+        def agregar_receta(story, receta, paginas):
+            # La marca anota en qué página empieza la receta
+            story.append(Marca(nombre_destino(receta), paginas))
+            titulo, descripcion, perdidos = marcado_de(receta)
+            if perdidos:
+                degradar(receta, f"caracteres sin glifo en la fuente: {perdidos}")
+            # Cada receta se comprueba por separado: si ReportLab no acepta
+            # algo, sale simplificada en lugar de perder el libro entero
+            try:
+                story.extend(contenido_receta(receta, titulo, descripcion))
+            except Exception as e:
+                degradar(receta, f"versión simplificada ({e})")
+                story.extend(receta_simplificada(receta, titulo, descripcion))
             story.append(PageBreak())
         
+        # Con pypdf el libro se maqueta por partes que se van uniendo al
+        # fichero final, así que la memoria no crece con el número de recetas.
+        # La portada y el índice se maquetan al final, con las páginas reales
+        try:
+            import unir_pdf
+        except ImportError:
+            unir_pdf = None
+        
+        def partes(carpeta):
+            for desde in range(0, len(self.recipes), RECETAS_POR_PARTE):
+                parte = []
+                paginas = {}
+                with self.metricas.medir('pdf_story'):
+                    for receta in self.recipes[desde:desde + RECETAS_POR_PARTE]:
+                        agregar_receta(parte, receta, paginas)
+                ruta = os.path.join(carpeta, f"parte_{desde:06d}.pdf")
+                with self.metricas.medir('pdf_maquetacion'):
+                    documento(ruta).build(parte, canvasmaker=lienzo_libro())
+                yield ruta, paginas
+        
+        def maquetar_portada(carpeta):
+            def maquetar(paginas):
+                ruta = os.path.join(carpeta, "portada.pdf")
+                story = []
+                portada(story, paginas, externo=True)
+                doc = documento(ruta)
+                with self.metricas.medir('pdf_maquetacion'):
+                    doc.build(story, canvasmaker=lienzo_libro())
+                return ruta, doc.page
+            return maquetar
+        
+        def libro_completo():
+            # Sin pypdf: un solo documento, con las páginas estimadas a partir
+            # de la maquetación anterior y comprobadas por las marcas
+            if mapa.delante is None:
+                mapa.delante = 1 + estimar_paginas(indice({}, False)[:-1], ancho_marco, A4[1] - 1.5*inch - 12)
+            estimadas = mapa.estimar([nombre_destino(receta) for receta in self.recipes], mapa.delante)
+            for intento in range(3):
+                story = []
+                paginas = {}
+                portada(story, estimadas, externo=False)
+                for receta in self.recipes:
+                    agregar_receta(story, receta, paginas)
+                self.metricas.observar('pdf_story', time.perf_counter() - inicio)
+                doc = documento(pdf_path)
+                with self.metricas.medir('pdf_maquetacion'):
+                    doc.build(story, canvasmaker=lienzo_libro())
+                if paginas == estimadas or intento == 2:
+                    break
+                print("   📑 Las páginas del índice no coincidían, maquetando otra vez...")
+                self.metricas.contar('pdf_reconstrucciones')
+                estimadas = paginas
+            mapa.actualizar(paginas, doc.page)
+            mapa.guardar()
+        
         # Generar PDF
         try:
-            doc.build(story)
+            if unir_pdf:
+                with tempfile.TemporaryDirectory(dir=self.output_folder) as carpeta:
+                    unir_con_indice(partes(carpeta), pdf_path, maquetar_portada(carpeta), mapa,
+                                    lambda ruta, paginas: os.remove(ruta))
+            else:
+                libro_completo()
+            if degradadas:
+                self.metricas.contar('pdf_recetas_degradadas', len(degradadas))
+                print(f"⚠️  {len(degradadas)} recetas con cambios en el PDF:")
+                for titulo, motivo in degradadas.values():
+                    print(f"   - {titulo[:60]}: {motivo}")
             print(f"✅ Libro PDF creado: {pdf_path}")
             return pdf_path
         except Exception as e:
+            self.metricas.contar('errores_pdf')
             print(f"❌ Error creando PDF: {str(e)}")
             return None
+        finally:
+            self.guardar_metricas()
+
+def imprimir_informe(planificador):
+    """Resumen de peticiones, reintentos y fallos definitivos del planificador"""
+    informe = planificador.informe()
+    print(f"\n📊 {informe['exitos']} peticiones correctas ({informe['throughput']}/s), "
+          f"{informe['limitadas']} limitadas, {informe['reintentos']} reintentos, "
+          f"{len(informe['fallidas'])} fallos definitivos")
+    for descripcion in informe['fallidas']:
+        print(f"   ❌ {descripcion}")
 
 def main():
     print("=" * 60)
@@ -285,11 +832,11 @@ def main():
     # URL del canal
     canal_url = "https://youtube.com/@bebepiskota2913"
     
-    # Crear extractor
-    extractor = YouTubeRecipeExtractor(canal_url)
+    # Crear extractor (4 videos en paralelo)
+    extractor = YouTubeRecipeExtractor(canal_url, max_workers=4)
     
-    # Extraer videos
-    extractor.extraer_videos()
+    # Extraer videos (solo se descargan los nuevos o caducados)
+    extractor.extraer_videos(sincronizar=True)
     
     # Crear libro PDF
     if extractor.recipes:
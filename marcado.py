@@ -0,0 +1,243 @@
+"""
+Saneado del texto de las recetas para los Paragraph de ReportLab.
+
+Paragraph interpreta el texto como marcado: una etiqueta suelta ('<b'
+sin cerrar, '<3') hace que lance una excepción y se pierda el libro
+entero. Además una fuente solo dibuja los caracteres para los que tiene
+glifo: el resto sale como un recuadro.
+
+escapar() quita los caracteres de control y escapa el marcado; no depende
+de la fuente, así que se ejecuta una vez al procesar cada receta y el
+resultado se guarda en ella (campo 'marcado'). Al maquetar, marcado_de() y
+sanear() quitan solo los caracteres sin glifo en la fuente del libro
+(fuentes_libro(): DejaVu Sans si está instalada, que tiene 'ő' y 'ű'; si
+no, Helvetica, que solo tiene WinAnsi) y devuelven cuáles se perdieron.
+
+ReportLab incrusta de cada fuente TrueType solo los caracteres usados, en
+el orden en que aparecen, así que dos partes del libro con textos distintos
+llevan fuentes incrustadas distintas. lienzo_libro() llena el primer
+subconjunto de cada fuente con los mismos caracteres en todos los
+documentos: las partes comparten la fuente y unir_pdfs la escribe una vez.
+"""
+import functools
+import os
+import re
+
+# Cambiarlo hace que se vuelva a sanear el texto guardado en las recetas
+VERSION_MARCADO = 2
+
+_ESCAPAR = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;'})
+
+# Caracteres con un equivalente exacto, por si la fuente no los tiene
+_EQUIVALENTES = {
+    '\u2212': '-', '\u2010': '-', '\u2011': '-',  # signo menos y guiones
+    '\u2007': ' ', '\u2009': ' ', '\u200a': ' ', '\u202f': ' ',  # espacios finos
+}
+
+_CONTROL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]')
+
+# Sitios habituales de DejaVu Sans (Linux, macOS con Homebrew/MacTeX, Windows)
+DIRECTORIOS_FUENTES = (
+    '/usr/share/fonts/truetype/dejavu', '/usr/share/fonts/dejavu', '/usr/share/fonts/TTF',
+    '/usr/local/share/fonts', '/opt/homebrew/share/fonts', '/Library/Fonts',
+    os.path.join(os.environ.get('WINDIR', 'C:\\Windows'), 'Fonts'),
+)
+# Variante de Helvetica: (sufijo del fichero de DejaVu Sans, negrita, cursiva, variante si falta el fichero)
+_VARIANTES = {
+    'Helvetica': ('', 0, 0, None),
+    'Helvetica-Bold': ('-Bold', 1, 0, 'Helvetica'),
+    'Helvetica-Oblique': ('-Oblique', 0, 1, 'Helvetica'),
+    'Helvetica-BoldOblique': ('-BoldOblique', 1, 1, 'Helvetica-Bold'),
+}
+
+# Helvetica (la fuente si no se llama a fuentes_libro o no hay DejaVu): WinAnsi sin control
+_glifos = frozenset(
+    c for c in bytes(range(256)).decode('cp1252', errors='ignore') if c.isprintable()
+) | frozenset('\r\n\t')
+_fuentes = None
+
+# Caracteres con que se llena el primer subconjunto (hasta 256 códigos, con
+# ASCII) de las fuentes del libro: Latin-1, puntuación tipográfica y Latin
+# Extended-A (ő, ű...). Lo que no quepa va a subconjuntos propios de cada parte
+_COMUNES = (''.join(chr(c) for c in range(0xa1, 0x100) if chr(c).isprintable())
+            + '–—‘’‚“”„•…€™‰′″' + ''.join(chr(c) for c in range(0x100, 0x180)))
+_cebado = {}  # nombre de la fuente: caracteres de _COMUNES que caben en su primer subconjunto
+_recortes = {}  # (nombre de la fuente, códigos del primer subconjunto): fuente recortada
+_lienzo = None
+
+
+def fuentes_libro():
+    """{variante de Helvetica: fuente registrada en ReportLab} para los estilos del libro
+
+    Registra DejaVu Sans (una vez por proceso) y hace que sanear() quite solo
+    los caracteres sin glifo en ella. Sin DejaVu deja Helvetica.
+    """
+    global _fuentes, _glifos
+    if _fuentes is not None:
+        return _fuentes
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.lib.fonts import addMapping
+
+    _fuentes = {nombre: nombre for nombre in _VARIANTES}
+    normal = next((os.path.join(d, 'DejaVuSans.ttf') for d in DIRECTORIOS_FUENTES
+                   if os.path.isfile(os.path.join(d, 'DejaVuSans.ttf'))), None)
+    if normal is None:
+        return _fuentes
+    glifos = None
+    for variante, (sufijo, negrita, cursiva, alternativa) in _VARIANTES.items():
+        ruta = os.path.join(os.path.dirname(normal), f'DejaVuSans{sufijo}.ttf')
+        if os.path.isfile(ruta):
+            fuente = TTFont(f'DejaVuSans{sufijo}', ruta)
+            pdfmetrics.registerFont(fuente)
+            _fuentes[variante] = fuente.fontName
+            mapa = {chr(c) for c in fuente.face.charToGlyph if chr(c).isprintable()}
+            glifos = mapa if glifos is None else glifos & mapa
+        else:
+            _fuentes[variante] = _fuentes[alternativa]
+        # <b> e <i> dentro de un Paragraph eligen la variante de la familia
+        addMapping('DejaVuSans', negrita, cursiva, _fuentes[variante])
+    _glifos = frozenset(glifos) | frozenset('\r\n\t')
+    return _fuentes
+
+
+def aplicar_fuentes(estilos):
+    """Cambia Helvetica por la fuente del libro en los estilos dados"""
+    fuentes = fuentes_libro()
+    for estilo in estilos:
+        for atributo in ('fontName', 'bulletFontName'):
+            fuente = getattr(estilo, atributo, None)
+            if fuente in fuentes:
+                setattr(estilo, atributo, fuentes[fuente])
+
+
+def _cebar(fuente, doc):
+    """Asigna a la fuente en doc el primer subconjunto con los caracteres comunes"""
+    cadena = _cebado.get(fuente.fontName)
+    if cadena is None:
+        # La primera vez, carácter a carácter hasta llenar el subconjunto
+        cadena = ''
+        for c in _COMUNES:
+            if ord(c) in fuente.face.charToGlyph:
+                fuente.splitString(c, doc)
+                cadena += c
+                if fuente.state[doc].nextCode >= 256:
+                    break
+        _cebado[fuente.fontName] = cadena
+        # Ese subconjunto es igual en cada documento: la fuente se recorta una vez
+        _recortes[fuente.fontName, tuple(fuente.state[doc].subsets[0])] = None
+        fuente.face.makeSubset = functools.partial(_recortar, fuente.fontName, fuente.face.makeSubset)
+    else:
+        fuente.splitString(cadena, doc)
+    fuente.getSubsetInternalName(0, doc)
+
+
+def _recortar(nombre, recortar, subconjunto):
+    """makeSubset de la fuente, recordando el resultado para el primer subconjunto"""
+    clave = nombre, tuple(subconjunto)
+    if clave not in _recortes:
+        return recortar(subconjunto)
+    if _recortes[clave] is None:
+        _recortes[clave] = recortar(subconjunto)
+    return _recortes[clave]
+
+
+def lienzo_libro():
+    """Clase de Canvas (canvasmaker) para maquetar el libro o una parte
+
+    Incrusta las fuentes del libro siempre en el mismo orden y con el mismo
+    primer subconjunto, para que sean idénticas en todas las partes.
+    """
+    global _lienzo
+    if _lienzo is not None:
+        return _lienzo
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfgen.canvas import Canvas
+
+    fuentes = [pdfmetrics.getFont(nombre) for nombre in dict.fromkeys(fuentes_libro().values())]
+    fuentes = [fuente for fuente in fuentes if getattr(fuente, '_dynamicFont', False)]
+
+    class Lienzo(Canvas):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            for fuente in fuentes:
+                _cebar(fuente, self._doc)
+
+    _lienzo = Lienzo
+    return _lienzo
+
+
+def escapar(texto):
+    """Texto sin caracteres de control y con el marcado escapado (no depende de la fuente)"""
+    texto = texto or ''
+    if _CONTROL.search(texto):
+        texto = _CONTROL.sub('', texto)
+    return texto.translate(_ESCAPAR)
+
+
+def _ajustar(texto):
+    """(texto con solo caracteres con glifo en la fuente del libro, caracteres quitados)"""
+    # ASCII imprimible (lo único que queda tras escapar()) está en todas las fuentes
+    faltan = set(texto) - _glifos if not texto.isascii() else ()
+    if not faltan:
+        return texto, ''
+    equivalentes = {c: _EQUIVALENTES[c] for c in faltan if c in _EQUIVALENTES and _EQUIVALENTES[c] in _glifos}
+    if equivalentes:
+        texto = texto.translate(str.maketrans(equivalentes))
+        faltan -= equivalentes.keys()
+    if faltan:
+        texto = texto.translate(dict.fromkeys(map(ord, faltan)))
+    return texto, ''.join(sorted(faltan))
+
+
+def sanear(texto):
+    """Devuelve (texto escapado con solo caracteres dibujables, caracteres quitados)"""
+    return _ajustar(escapar(texto))
+
+
+def marcar(receta):
+    """Campo 'marcado' de una receta: título y descripción escapados (si cambian) y sus caracteres no ASCII"""
+    marcado = {'version': VERSION_MARCADO}
+    especiales = set()
+    for campo in ('titulo', 'descripcion'):
+        original = receta.get(campo) or ''
+        texto = escapar(original)
+        if texto != original:
+            marcado[campo] = texto
+        if not texto.isascii():
+            especiales.update(c for c in set(texto) if not c.isascii())
+    if especiales:
+        marcado['especiales'] = ''.join(sorted(especiales))
+    return marcado
+
+
+def marcado_de(receta):
+    """(título, descripción, caracteres quitados) listos para Paragraph
+
+    Usa el campo 'marcado' si está al día; si no (recetas.json antiguo), escapa
+    ahora. Los caracteres quitados son los que no tienen glifo en la fuente del libro.
+    """
+    marcado = receta.get('marcado')
+    if not marcado or marcado.get('version') != VERSION_MARCADO:
+        marcado = marcar(receta)
+    titulo = marcado.get('titulo', receta.get('titulo') or '')
+    descripcion = marcado.get('descripcion', receta.get('descripcion') or '')
+    if _glifos.issuperset(marcado.get('especiales', '')):
+        # Lo normal: la fuente tiene todos sus caracteres y no hay que recorrer el texto
+        return titulo, descripcion, ''
+    titulo, perdidos_titulo = _ajustar(titulo)
+    descripcion, perdidos = _ajustar(descripcion)
+    if perdidos_titulo:
+        perdidos = ''.join(sorted(set(perdidos_titulo + perdidos)))
+    return titulo, descripcion, perdidos
+
+
+def recortar(texto, limite):
+    """Corta un texto ya escapado sin partir una entidad (&amp;, &lt;...)"""
+    if len(texto) <= limite:
+        return texto
+    texto = texto[:limite]
+    entidad = texto.rfind('&')
+    if entidad != -1 and ';' not in texto[entidad:]:
+        texto = texto[:entidad]
+    return texto + "..."
@@ -0,0 +1,151 @@
+import bisect
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+# Límites (en segundos) de los buckets de los histogramas de latencia
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+PREFIJO = 'recetas'
+
+
+class Histograma:
+    """Histograma de latencias con buckets fijos, como los de Prometheus"""
+
+    __slots__ = ('cuentas', 'suma', 'total', 'maximo')
+
+    def __init__(self):
+        self.cuentas = [0] * (len(BUCKETS) + 1)
+        self.suma = 0.0
+        self.total = 0
+        self.maximo = 0.0
+
+    def observar(self, segundos):
+        self.cuentas[bisect.bisect_left(BUCKETS, segundos)] += 1
+        self.suma += segundos
+        self.total += 1
+        if segundos > self.maximo:
+            self.maximo = segundos
+
+    def percentil(self, p):
+        """Estimación del percentil p (0-1): límite superior del bucket que lo contiene"""
+        if not self.total:
+            return 0.0
+        objetivo = p * self.total
+        acumulado = 0
+        for limite, cuenta in zip(BUCKETS, self.cuentas):
+            acumulado += cuenta
+            if acumulado >= objetivo:
+                return min(limite, self.maximo)
+        return self.maximo
+
+    def resumen(self):
+        return {
+            'cuenta': self.total,
+            'segundos': round(self.suma, 4),
+            'media': round(self.suma / self.total, 4) if self.total else 0.0,
+            'p50': round(self.percentil(0.5), 4),
+            'p95': round(self.percentil(0.95), 4),
+            'max': round(self.maximo, 4),
+            'buckets': dict(zip([str(limite) for limite in BUCKETS] + ['+Inf'], self.cuentas)),
+        }
+
+
+class Metricas:
+    """Tiempos por etapa, histogramas de latencia y contadores de una ejecución
+
+    Compartido entre hilos; cada observación cuesta un perf_counter y un
+    bisect bajo un lock, así que puede dejarse activado siempre.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histogramas = {}
+        self.contadores = {}
+        self.valores = {}
+        self.inicio = time.perf_counter()
+        self.fecha = datetime.now().isoformat(timespec='seconds')
+
+    @contextlib.contextmanager
+    def medir(self, etapa):
+        """Mide el bloque y lo añade al histograma de la etapa (también si falla)"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(etapa, time.perf_counter() - inicio)
+
+    def observar(self, etapa, segundos):
+        with self._lock:
+            histograma = self.histogramas.get(etapa)
+            if histograma is None:
+                histograma = self.histogramas[etapa] = Histograma()
+            histograma.observar(segundos)
+
+    def contar(self, nombre, cantidad=1):
+        with self._lock:
+            self.contadores[nombre] = self.contadores.get(nombre, 0) + cantidad
+
+    def fijar(self, nombre, valor):
+        """Guarda un valor puntual (gauge), p.ej. la tasa final del planificador"""
+        with self._lock:
+            self.valores[nombre] = valor
+
+    def informe(self, **extra):
+        """Informe estructurado de la ejecución"""
+        with self._lock:
+            return dict({
+                'fecha': self.fecha,
+                'duracion': round(time.perf_counter() - self.inicio, 3),
+                'etapas': {etapa: h.resumen() for etapa, h in sorted(self.histogramas.items())},
+                'contadores': dict(sorted(self.contadores.items())),
+                'valores': dict(sorted(self.valores.items())),
+            }, **extra)
+
+    def prometheus(self):
+        """Las métricas en formato de texto de Prometheus"""
+        lineas = []
+        with self._lock:
+            if self.histogramas:
+                nombre = f"{PREFIJO}_etapa_segundos"
+                lineas.append(f"# HELP {nombre} Duración de cada etapa de la ejecución.")
+                lineas.append(f"# TYPE {nombre} histogram")
+                for etapa, h in sorted(self.histogramas.items()):
+                    acumulado = 0
+                    for limite, cuenta in zip([repr(limite) for limite in BUCKETS] + ['+Inf'], h.cuentas):
+                        acumulado += cuenta
+                        lineas.append(f'{nombre}_bucket{{etapa="{etapa}",le="{limite}"}} {acumulado}')
+                    lineas.append(f'{nombre}_sum{{etapa="{etapa}"}} {h.suma:.6f}')
+                    lineas.append(f'{nombre}_count{{etapa="{etapa}"}} {h.total}')
+            for contador, valor in sorted(self.contadores.items()):
+                nombre = f"{PREFIJO}_{contador}_total"
+                lineas.append(f"# TYPE {nombre} counter")
+                lineas.append(f"{nombre} {valor}")
+            for gauge, valor in sorted(self.valores.items()):
+                nombre = f"{PREFIJO}_{gauge}"
+                lineas.append(f"# TYPE {nombre} gauge")
+                lineas.append(f"{nombre} {valor}")
+            nombre = f"{PREFIJO}_duracion_segundos"
+            lineas.append(f"# TYPE {nombre} gauge")
+            lineas.append(f"{nombre} {time.perf_counter() - self.inicio:.3f}")
+        return '\n'.join(lineas) + '\n'
+
+    def guardar(self, ruta_json, ruta_prom=None, **extra):
+        """Escribe el informe JSON y, si se indica, el fichero .prom (de forma atómica)"""
+        _escribir_atomico(ruta_json, json.dumps(self.informe(**extra), ensure_ascii=False, indent=2))
+        if ruta_prom:
+            _escribir_atomico(ruta_prom, self.prometheus())
+
+
+def _escribir_atomico(ruta, texto):
+    # El node_exporter puede leer el fichero en cualquier momento
+    carpeta = os.path.dirname(ruta) or '.'
+    os.makedirs(carpeta, exist_ok=True)
+    fd, temporal = tempfile.mkstemp(dir=carpeta, suffix='.part')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(texto)
+    os.replace(temporal, ruta)
@@ -1,35 +1,148 @@
+import hashlib
 import json
 import os
 import datetime
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle, PageBreak
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, LongTable, TableStyle, PageBreak
 from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
+
+from imagenes import DerivadosMiniaturas
+from indice_pdf import EntradaIndice, MapaPaginas, Marca, estimar_paginas, nombre_destino, unir_con_indice
+from ingredientes import formatear_ingrediente
+from marcado import VERSION_MARCADO, aplicar_fuentes, fuentes_libro, lienzo_libro, marcado_de, sanear
+from metricas import Metricas
+
+def _pdf_merger():
+    """Az unir_pdf.unir_pdfs függvény, vagy None, ha nincs pypdf (csak összefűzéskor töltődik be).
+
+    A párhuzamos, inkrementális és folyamatos rendereléshez szükséges a részek összefűzéséhez (pip install pypdf).
+    """
+    try:
+        from unir_pdf import unir_pdfs
+    except ImportError:
+        return None
+    return unir_pdfs
+
+
+class RecipeRecord:
+    """Tömör recept rekord a folyamatos építéshez: a teljes recept (leírással) csak rendereléskor töltődik be a lemezről."""
+    __slots__ = ('title', 'thumbnail', 'url', 'source', 'offset')
+
+    def __init__(self, title, thumbnail, url, source, offset):
+        self.title = title
+        self.thumbnail = thumbnail
+        self.url = url # Az index hivatkozásaihoz
+        self.source = source # JSONL fájl, egy recept soronként
+        self.offset = offset # A recept sorának kezdete a fájlban
+
+    def get(self, key, default=None):
+        """Úgy viselkedik, mint a recept dict: a cím, a kép és az URL a memóriában van, a többi a lemezről jön."""
+        if key == 'titulo':
+            return self.title if self.title is not None else default
+        if key == 'miniatura_local':
+            return self.thumbnail if self.thumbnail is not None else default
+        if key == 'url':
+            return self.url if self.url is not None else default
+        return self.load().get(key, default)
+
+    def load(self):
+        """Beolvassa a teljes receptet a forrásfájlból."""
+        with open(self.source, 'rb') as f:
+            f.seek(self.offset)
+            return json.loads(f.readline())
+
+
+def _iter_json_array(f, block_size=1 << 16):
+    """Egy JSON tömb elemeit egyenként olvassa be, a teljes fájl betöltése nélkül."""
+    decoder = json.JSONDecoder()
+    buffer, pos, started, eof = '', 0, False, False
+    while True:
+        # Szóközök, a nyitó '[' és az elemek közti ',' átugrása
+        while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] == ',' or (buffer[pos] == '[' and not started)):
+            started = started or buffer[pos] == '['
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == ']':
+            return
+        try:
+            if pos == len(buffer):
+                raise ValueError
+            item, end = decoder.raw_decode(buffer, pos)
+        except ValueError:
+            if eof:
+                if buffer[pos:].strip():
+                    raise ValueError("Hiányos JSON tömb")
+                return
+            # Az elem nem fér el a pufferben: további blokk olvasása
+            block = f.read(block_size)
+            eof = not block
+            buffer, pos = buffer[pos:] + block, 0
+            continue
+        if end == len(buffer) and not eof:
+            # Egy szám a puffer végén még folytatódhat
+            block = f.read(block_size)
+            eof = not block
+            buffer, pos = buffer[pos:] + block, 0
+            continue
+        pos = end
+        yield item
 
 # --- Konstansok a Stílushoz ---
 PAGE_WIDTH, PAGE_HEIGHT = A4
 MARGIN = 0.8 * inch
 THUMBNAIL_WIDTH = 3 * inch
 THUMBNAIL_HEIGHT = 1.8 * inch # Igazítás az arányhoz
+INDEX_PAGE_WIDTH = 0.7 * inch # Az index oldalszám oszlopa (fix, hogy a számok ne változtassák a tördelést)
 
 # --- Elérési útvonalak (JAVÍTVA az Ön 'recetas_output' struktúrájához) ---
 DATA_ROOT_DIR = 'recetas_output'
 METADATA_FILE = os.path.join(DATA_ROOT_DIR, 'datos', 'recetas.json')
 THUMBNAIL_DIR = os.path.join(DATA_ROOT_DIR, 'miniaturas')
+PRINT_THUMBNAIL_DIR = os.path.join(THUMBNAIL_DIR, 'impresion') # Nyomtatási méretű képek gyorsítótára
 
 OUTPUT_FILENAME_BASE = 'Libro_Recetas'
 CHANNEL_NAME = '@bebepiskota2913' # A borítólaphoz
 
+# Párhuzamos renderelésnél ennyi recept kerül egy részdokumentumba
+CHUNK_SIZE = 100
+
+# Inkrementális építésnél a receptenként renderelt PDF részek helye
+FRAGMENT_CACHE_DIR = os.path.join(DATA_ROOT_DIR, 'pdf_cache')
+# Növelni kell, ha a _create_recipe_page kimenete megváltozik
+FRAGMENT_FORMAT_VERSION = 4
+
+# Az előző építés oldaltérképe (az index oldalszámainak becsléséhez)
+PAGE_MAP_FILE = os.path.join(DATA_ROOT_DIR, 'datos', 'pdf_paginas.json')
+
+# Az építési fázisok időméréseinek helye (--metrics)
+METRICS_FILE = os.path.join(DATA_ROOT_DIR, 'datos', 'metricas_pdf.json')
+
 class RecipeCookbookGenerator:
     """
     Professzionális PDF szakácskönyvet generál az összegyűjtött recept metaadatokból.
     """
-    def __init__(self, metadata_path=METADATA_FILE, thumbnail_dir=THUMBNAIL_DIR):
+    def __init__(self, metadata_path=METADATA_FILE, thumbnail_dir=THUMBNAIL_DIR, print_thumbnail_dir=PRINT_THUMBNAIL_DIR, recipes=None, fragment_cache_dir=None, metrics=None, streaming=False, page_map_path=PAGE_MAP_FILE):
         self.metadata_path = metadata_path
+        self.page_map_path = page_map_path # None: nincs oldaltérkép, az első becslés egy oldal receptenként
+        self.metrics = metrics or Metricas() # Fázisonkénti időmérés (lásd metricas.py)
+        self.fragment_cache_dir = fragment_cache_dir # Ha meg van adva: csak az új/módosult receptek renderelődnek újra
         self.thumbnail_dir = thumbnail_dir
+        self.print_thumbnail_dir = print_thumbnail_dir # None: az eredeti képek kerülnek a PDF-be
+        self.print_thumbnails = {}
+        self.degraded = {} # URL -> (cím, ok): a nem eredeti formájukban bekerült receptek
         self.styles = getSampleStyleSheet()
-        self.recipes = self._load_recipes()
+        # Folyamatos mód: a receptek helyett csak tömör rekordok vannak a memóriában
+        self.streaming = streaming
+        self._spool_path = None
+        # Ha a recepteket közvetlenül kapjuk (pl. egy renderelő folyamatban), nem olvassuk be újra
+        if recipes is not None:
+            self.recipes = recipes
+        else:
+            self.recipes = self._load_records() if streaming else self._load_recipes()
         
         # --- Egyéni Stílusok ---
         self.styles.add(ParagraphStyle(name='TitleStyle', fontSize=24, spaceAfter=20, alignment=1, textColor=colors.HexColor('#4A90E2'), fontName='Helvetica-Bold'))
@@ -37,10 +150,14 @@ class RecipeCookbookGenerator:
         self.styles.add(ParagraphStyle(name='CoverSubtitle', fontSize=16, spaceAfter=60, alignment=1, textColor=colors.HexColor('#4A4A4A')))
         self.styles.add(ParagraphStyle(name='IndexTitle', fontSize=20, spaceAfter=15, alignment=0, textColor=colors.HexColor('#000000'), fontName='Helvetica-Bold'))
         self.styles.add(ParagraphStyle(name='IndexEntry', fontSize=12, leading=16, spaceAfter=2, textColor=colors.HexColor('#333333')))
+        self.styles.add(ParagraphStyle(name='IndexPage', parent=self.styles['IndexEntry'], alignment=2))
         self.styles.add(ParagraphStyle(name='RecipeTitle', fontSize=18, spaceAfter=10, alignment=0, textColor=colors.HexColor('#8B572A'), fontName='Helvetica-Bold'))
         self.styles.add(ParagraphStyle(name='Description', fontSize=10, leading=14, spaceAfter=15, textColor=colors.HexColor('#333333')))
         self.styles.add(ParagraphStyle(name='Link', fontSize=9, spaceAfter=5, textColor=colors.HexColor('#4A90E2')))
+        self.styles.add(ParagraphStyle(name='Ingredient', fontSize=10, leading=13, textColor=colors.HexColor('#333333')))
         self.styles.add(ParagraphStyle(name='SmallHeader', fontSize=12, spaceAfter=5, textColor=colors.HexColor('#4A4A4A'), fontName='Helvetica-Bold'))
+        # Helvetica helyett DejaVu Sans, ha telepítve van: abban van 'ő' és 'ű' is (lásd marcado.py)
+        aplicar_fuentes(self.styles.byName.values())
 
 
     def _load_recipes(self):
@@ -50,13 +167,65 @@ class RecipeCookbookGenerator:
             return []
         try:
             with open(self.metadata_path, 'r', encoding='utf-8') as f:
-                recipes = json.load(f)
+                if self.metadata_path.endswith('.jsonl'):
+                    recipes = self._read_jsonl(f)
+                else:
+                    recipes = json.load(f)
             # Rendezés cím szerint
             return sorted(recipes, key=lambda r: r.get('titulo', ''))
         except Exception as e:
             print(f"ERROR: Could not load or parse recipes.json. {e}")
             return []
 
+    def _load_records(self):
+        """Cím szerint rendezett RecipeRecord lista, a receptek a lemezen maradnak.
+
+        JSONL forrásnál a rekordok közvetlenül a fájl soraira mutatnak; JSON
+        tömb esetén az elemek egyenként egy ideiglenes JSONL fájlba kerülnek.
+        """
+        if not os.path.exists(self.metadata_path):
+            print(f"ERROR: Metadata file not found at {self.metadata_path}")
+            return []
+        records = {}
+        try:
+            if self.metadata_path.endswith('.jsonl'):
+                with open(self.metadata_path, 'rb') as f:
+                    offset = 0
+                    for line in f:
+                        try:
+                            recipe = json.loads(line)
+                        except ValueError:
+                            recipe = None # Félbeszakadt utolsó sor
+                        if recipe is not None:
+                            records[recipe.get('url')] = RecipeRecord(
+                                recipe.get('titulo'), recipe.get('miniatura_local'), recipe.get('url'),
+                                self.metadata_path, offset)
+                        offset += len(line)
+            else:
+                fd, self._spool_path = tempfile.mkstemp(suffix='.jsonl')
+                with open(self.metadata_path, 'r', encoding='utf-8') as f, os.fdopen(fd, 'wb') as spool:
+                    for i, recipe in enumerate(_iter_json_array(f)):
+                        records[i] = RecipeRecord(
+                            recipe.get('titulo'), recipe.get('miniatura_local'), recipe.get('url'),
+                            self._spool_path, spool.tell())
+                        spool.write(json.dumps(recipe, ensure_ascii=False).encode('utf-8') + b'\n')
+        except Exception as e:
+            print(f"ERROR: Could not load or parse recipes.json. {e}")
+            return []
+        return sorted(records.values(), key=lambda r: r.get('titulo', ''))
+
+    @staticmethod
+    def _read_jsonl(f):
+        """Soronként olvassa a recetas.jsonl ellenőrzőpont fájlt (URL-enként az utolsó változat)."""
+        recipes = {}
+        for line in f:
+            try:
+                recipe = json.loads(line)
+            except ValueError:
+                continue # Félbeszakadt utolsó sor
+            recipes[recipe.get('url')] = recipe
+        return list(recipes.values())
+
     def _get_output_filename(self):
         """Létrehozza a dátummal ellátott kimeneti fájlnevet."""
         date_str = datetime.date.today().strftime("%Y%m%d")
@@ -75,7 +244,7 @@ class RecipeCookbookGenerator:
         ]
         
         table_style = TableStyle([
-            ('FONTNAME', (0,0), (-1,-1), 'Helvetica'),
+            ('FONTNAME', (0,0), (-1,-1), fuentes_libro()['Helvetica']),
             ('FONTSIZE', (0,0), (-1,-1), 14),
             ('ALIGN', (0,0), (0,-1), 'RIGHT'),
             ('ALIGN', (1,0), (1,-1), 'LEFT'),
@@ -90,51 +259,88 @@ class RecipeCookbookGenerator:
         story.append(summary_table)
         story.append(PageBreak())
 
-    def _create_index_page(self, story):
-        """Hozzáadja a tartalomjegyzék oldalt."""
+    def _create_index_page(self, story, pages=None, external=False):
+        """Hozzáadja a tartalomjegyzék oldalt.
+
+        pages: {cél név: oldalszám}; minden bejegyzés hivatkozás a recept
+        első oldalára. external=True, ha a receptek egy másik részdokumentumban vannak.
+        """
         story.append(Paragraph("📋 Recept Index", self.styles['IndexTitle']))
         story.append(Spacer(1, 0.25 * inch))
+        pages = pages or {}
 
         # Két oszlopos index a jobb megjelenés érdekében
         num_recipes = len(self.recipes)
         mid_point = (num_recipes + 1) // 2
 
-        # ITT HASZNÁLJUK A HELYES KULCSOT: 'titulo'
-        col1_titles = [recipe.get('titulo', f"Névtelen Recept {i+1}") for i, recipe in enumerate(self.recipes[:mid_point])]
-        col2_titles = [recipe.get('titulo', f"Névtelen Recept {i+mid_point+1}") for i, recipe in enumerate(self.recipes[mid_point:])]
-        
-        # Oszlopok kiegyenlítése
-        if len(col1_titles) > len(col2_titles):
-            col2_titles.extend([''] * (len(col1_titles) - len(col2_titles)))
-        elif len(col2_titles) > len(col1_titles):
-            col1_titles.extend([''] * (len(col2_titles) - len(col1_titles)))
+        def entry(i, recipe):
+            # ITT HASZNÁLJUK A HELYES KULCSOT: 'titulo'
+            title = sanear(recipe.get('titulo'))[0] or f"Névtelen Recept {i+1}"
+            name = nombre_destino(recipe)
+            page = pages.get(name)
+            return [EntradaIndice(f"• {title}", self.styles['IndexEntry'], name, external),
+                    EntradaIndice(str(page) if page else "", self.styles['IndexPage'], name, external)]
 
-        index_rows = [[
-            Paragraph(f"• {col1_titles[i]}", self.styles['IndexEntry']),
-            Paragraph(f"• {col2_titles[i]}" if col2_titles[i] else "", self.styles['IndexEntry'])
-        ] for i in range(len(col1_titles))]
+        column1 = [entry(i, recipe) for i, recipe in enumerate(self.recipes[:mid_point])]
+        column2 = [entry(i + mid_point, recipe) for i, recipe in enumerate(self.recipes[mid_point:])]
+        # Oszlopok kiegyenlítése
+        column2.extend([['', '']] * (len(column1) - len(column2)))
+        index_rows = [left + right for left, right in zip(column1, column2)]
         
-        index_table = Table(index_rows, colWidths=[PAGE_WIDTH/2 - MARGIN - 0.1*inch, PAGE_WIDTH/2 - MARGIN - 0.1*inch])
+        # A LongTable sok ezer sornál is gyorsan tördelődik oldalakra
+        title_width = PAGE_WIDTH/2 - MARGIN - 0.1*inch - INDEX_PAGE_WIDTH
+        index_table = LongTable(index_rows, colWidths=[title_width, INDEX_PAGE_WIDTH, title_width, INDEX_PAGE_WIDTH])
         index_table.setStyle(TableStyle([
             ('VALIGN', (0,0), (-1,-1), 'TOP'),
-            ('LEFTPADDING', (1,0), (1,-1), 20),
+            ('LEFTPADDING', (2,0), (2,-1), 20),
             ('LINEBELOW', (0,0), (-1,-1), 0, colors.white),
         ]))
         
         story.append(index_table)
         story.append(PageBreak())
 
-    def _create_recipe_page(self, story, recipe):
-        """Hozzáad egy receptet, egy oldalonként."""
+    def _create_recipe_page(self, story, recipe, pages=None):
+        """Hozzáad egy receptet, egy oldalonként.
+
+        Ha pages meg van adva, a recept első oldalának száma bekerül (cél név szerint).
+        A receptet külön ellenőrzi: ha a ReportLab nem fogadja el a tartalmát,
+        egyszerűsített oldal kerül a helyére, és nem vész el az egész könyv.
+        """
+        if isinstance(recipe, RecipeRecord):
+            recipe = recipe.load()
+        if pages is not None:
+            story.append(Marca(nombre_destino(recipe), pages))
+        
+        # A KULCSOK JAVÍTVA A JSON-HOZ IGAZÍTVA (a szöveg a letöltéskor megtisztítva, lásd marcado.py):
+        title, description, lost = marcado_de(recipe)
+        title = title or 'Névtelen Recept'
+        description = description or 'Nincs leírás megadva.'
+        if lost:
+            self._degrade(recipe, f"nem megjeleníthető karakterek: {lost}")
+        
+        try:
+            story.extend(self._recipe_flowables(recipe, title, description))
+        except Exception as e:
+            self._degrade(recipe, f"egyszerűsített oldal ({e})")
+            story.extend(self._fallback_flowables(recipe, title, description))
         
-        # A KULCSOK JAVÍTVA A JSON-HOZ IGAZÍTVA:
-        title = recipe.get('titulo', 'Névtelen Recept')
-        description = recipe.get('descripcion', 'Nincs leírás megadva.')
-        video_url = recipe.get('url', '#')
+        # Oldaltörés minden recept után
+        story.append(PageBreak())
+
+    def _degrade(self, recipe, reason):
+        title, reasons = self.degraded.get(recipe.get('url'), (recipe.get('titulo') or 'Névtelen Recept', ''))
+        if reason not in reasons:
+            reasons = f"{reasons}; {reason}" if reasons else reason
+        self.degraded[recipe.get('url')] = (title, reasons)
+
+    def _recipe_flowables(self, recipe, title, description):
+        """Egy recept oldalának elemei (a cím és a leírás már escape-elt jelölőnyelv)."""
+        flowables = []
+        video_url = sanear(recipe.get('url', '#'))[0]
         thumbnail_name = recipe.get('miniatura_local', None) # <<< JAVÍTVA miniatura_local-ra
         
-        story.append(Paragraph(title, self.styles['RecipeTitle']))
-        story.append(Spacer(1, 0.1 * inch))
+        flowables.append(Paragraph(title, self.styles['RecipeTitle']))
+        flowables.append(Spacer(1, 0.1 * inch))
 
         # --- Kép és Link Szekció ---
         elements_for_table = []
@@ -142,9 +348,18 @@ class RecipeCookbookGenerator:
         # 1. Miniatűr Kép
         # A miniatura_local tartalmazza a teljes elérési utat: recetas_output\miniaturas\receta_001.jpg
         image_path = thumbnail_name
+        img = None
         
         if image_path and os.path.exists(image_path):
-            img = Image(image_path, width=THUMBNAIL_WIDTH, height=THUMBNAIL_HEIGHT)
+            image_path = self.print_thumbnails.get(image_path, image_path)
+            try:
+                # A fejléc most olvasódik be: egy hibás kép különben csak a tördeléskor derülne ki
+                ImageReader(image_path).getSize()
+                img = Image(image_path, width=THUMBNAIL_WIDTH, height=THUMBNAIL_HEIGHT)
+            except Exception as e:
+                # A ReportLab hibaüzenete több soros: egy sorba kerül a jelentésben
+                self._degrade(recipe, f"olvashatatlan miniatűr: {image_path} ({' '.join(str(e).split())})")
+        if img is not None:
             elements_for_table.append([img])
         else:
             # Placeholder, ha a kép hiányzik vagy hibás
@@ -160,30 +375,51 @@ class RecipeCookbookGenerator:
             ('VALIGN', (0,0), (-1,-1), 'TOP'),
             ('BOTTOMPADDING', (0,0), (-1,-1), 12),
         ]))
-        story.append(info_table)
+        flowables.append(info_table)
+
+        # --- Hozzávalók (a letöltéskor kinyert, strukturált összetevők) ---
+        ingredients = recipe.get('ingredientes') or []
+        if ingredients:
+            flowables.append(Paragraph("<b>Hozzávalók:</b>", self.styles['SmallHeader']))
+            ingredient_rows = [[Paragraph(f"• {sanear(formatear_ingrediente(ingredient))[0]}", self.styles['Ingredient'])]
+                               for ingredient in ingredients]
+            ingredient_table = Table(ingredient_rows, colWidths=[PAGE_WIDTH - 2*MARGIN])
+            ingredient_table.setStyle(TableStyle([
+                ('TOPPADDING', (0,0), (-1,-1), 1),
+                ('BOTTOMPADDING', (0,0), (-1,-1), 1),
+            ]))
+            flowables.append(ingredient_table)
+            flowables.append(Spacer(1, 0.15 * inch))
 
         # --- Leírás/Összetevők Szekció ---
-        story.append(Paragraph("<b>Recept részletek/összetevők:</b>", self.styles['SmallHeader']))
+        flowables.append(Paragraph("<b>Recept részletek/összetevők:</b>", self.styles['SmallHeader']))
         
         # Leírás előfeldolgozása a ReportLab számára
         clean_description = description.replace('\n\n', '<br/><br/>').replace('\n', '<br/>')
 
         # ITT HASZNÁLJUK A HELYES KULCSOT: 'descripcion'
-        story.append(Paragraph(clean_description, self.styles['Description']))
-        
-        # Oldaltörés minden recept után
-        story.append(PageBreak())
+        flowables.append(Paragraph(clean_description, self.styles['Description']))
+        return flowables
 
+    def _fallback_flowables(self, recipe, title, description):
+        """Egyszerűsített, biztonságos oldal: csak a megtisztított szöveg, kép és hozzávalók nélkül."""
+        return [
+            Paragraph(title, self.styles['RecipeTitle']),
+            Paragraph(f"Nézze meg a videót: {sanear(recipe.get('url', '#'))[0]}", self.styles['Link']),
+            Paragraph(description.replace('\n', '<br/>'), self.styles['Description']),
+        ]
 
-    def generate(self):
-        """Fő metódus a PDF generálásának koordinálására."""
-        if not self.recipes:
-            print("PDF generation skipped. No valid recipes found.")
+    def _report_degraded(self):
+        """Kiírja, mely receptek kerültek módosítva a PDF-be."""
+        if not self.degraded:
             return
+        self.metrics.contar('pdf_recetas_degradadas', len(self.degraded))
+        print(f"⚠️ {len(self.degraded)} recept módosítva került a PDF-be:")
+        for title, reason in self.degraded.values():
+            print(f"   - {title[:60]}: {reason}")
 
-        output_filename = self._get_output_filename()
-        
-        # PDF dokumentum konfigurálása
+    def _build(self, output_filename, story):
+        """Felépíti a PDF-et a megadott tartalomból; visszaadja az oldalak számát."""
         doc = SimpleDocTemplate(
             output_filename,
             pagesize=A4,
@@ -192,29 +428,285 @@ class RecipeCookbookGenerator:
             topMargin=MARGIN,
             bottomMargin=MARGIN
         )
+        doc.build(story, canvasmaker=lienzo_libro())
+        return doc.page
+
+    def generate(self, workers=1, chunk_size=CHUNK_SIZE):
+        """Fő metódus a PDF generálásának koordinálására.
+
+        workers > 1 esetén a recept oldalakat csomagokban, külön folyamatokban
+        rendereli, majd a részeket egyetlen PDF-be fűzi össze. Folyamatos
+        módban (streaming=True) egyszerre csak egy csomag van a memóriában.
+        """
+        if not self.recipes:
+            print("PDF generation skipped. No valid recipes found.")
+            return
+
+        output_filename = self._get_output_filename()
         
-        story = []
-        
-        print("Borítólap hozzáadása...")
-        self._create_cover_page(story)
-        
-        print("Recept index hozzáadása...")
-        self._create_index_page(story)
+        if self.print_thumbnail_dir:
+            print("Miniatűrök előkészítése nyomtatási méretre...")
+            with self.metrics.medir('pdf_miniaturas'):
+                self.print_thumbnails = DerivadosMiniaturas(self.print_thumbnail_dir).preparar(
+                    [recipe.get('miniatura_local') for recipe in self.recipes], THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT
+                )
         
-        print(f"{len(self.recipes)} recept oldal hozzáadása...")
-        for recipe in self.recipes:
-            self._create_recipe_page(story, recipe)
-            
-        # PDF elkészítése
-        print(f"PDF építése: {output_filename}...")
+        incremental = self.fragment_cache_dir is not None
+        streaming = self.streaming
+        if (workers > 1 or incremental or streaming) and _pdf_merger() is None:
+            print("⚠️ A párhuzamos/inkrementális/folyamatos rendereléshez telepítse a pypdf csomagot. Teljes, egy szálas építés következik.")
+            workers, incremental, streaming = 1, False, False
+
         try:
-            doc.build(story)
+            if incremental:
+                self._generate_incremental(output_filename, workers)
+            elif workers > 1 and len(self.recipes) > chunk_size:
+                self._generate_parallel(output_filename, workers, chunk_size)
+            elif streaming:
+                self._generate_streaming(output_filename, chunk_size)
+            else:
+                self._generate_single(output_filename)
+            self._report_degraded()
             print(f"✅ Kész! A szakácskönyv mentve mint {output_filename}")
         except Exception as e:
+            self.metrics.contar('errores_pdf')
             print(f"❌ HIBA: Nem sikerült elkészíteni a PDF-et. {e}")
+        finally:
+            if self._spool_path:
+                os.remove(self._spool_path)
+                self._spool_path = None
+
+    def _generate_single(self, output_filename):
+        """Egyetlen dokumentumba épít, oldalszámozott indexszel, második teljes tördelés nélkül.
+
+        Az oldalszámok az előző építés oldaltérképéből (PAGE_MAP_FILE) jönnek; ha
+        a tényleges oldalak eltérnek (első építés, megváltozott receptek), még
+        egyszer felépíti a valódi oldalszámokkal.
+        """
+        page_map = MapaPaginas(self.page_map_path)
+        if page_map.delante is None:
+            index_story = []
+            self._create_index_page(index_story)
+            page_map.delante = 1 + estimar_paginas(index_story[:-1], PAGE_WIDTH - 2*MARGIN - 12, PAGE_HEIGHT - 2*MARGIN - 12)
+        estimated = page_map.estimar([nombre_destino(recipe) for recipe in self.recipes], page_map.delante)
+
+        for attempt in range(3):
+            pages = {}
+            with self.metrics.medir('pdf_story'):
+                story = []
+                
+                print("Borítólap hozzáadása...")
+                self._create_cover_page(story)
+                
+                print("Recept index hozzáadása...")
+                self._create_index_page(story, estimated)
+                
+                print(f"{len(self.recipes)} recept oldal hozzáadása...")
+                for recipe in self.recipes:
+                    self._create_recipe_page(story, recipe, pages)
+                
+            # PDF elkészítése
+            print(f"PDF építése: {output_filename}...")
+            with self.metrics.medir('pdf_maquetacion'):
+                total = self._build(output_filename, story)
+            # Az oldalszám oszlop fix szélességű, így a második építés oldalai már nem változnak
+            if pages == estimated or attempt == 2:
+                break
+            print("Az index oldalszámai eltértek a becsléstől, újraépítés a valódi oldalszámokkal...")
+            self.metrics.contar('pdf_reconstrucciones')
+            estimated = pages
+        
+        page_map.actualizar(pages, total)
+        page_map.guardar()
+
+    def _generate_parallel(self, output_filename, workers, chunk_size):
+        """A recept csomagokat párhuzamosan rendereli, majd sorrendben összefűzi."""
+        chunks = [self.recipes[i:i + chunk_size] for i in range(0, len(self.recipes), chunk_size)]
+        
+        with tempfile.TemporaryDirectory() as tmp_dir, ProcessPoolExecutor(max_workers=workers) as pool:
+            print(f"{len(self.recipes)} recept oldal renderelése {len(chunks)} csomagban, {workers} folyamattal...")
+            with self.metrics.medir('pdf_maquetacion'):
+                futures = [
+                    pool.submit(_render_recipe_chunk, chunk, self.print_thumbnails,
+                                os.path.join(tmp_dir, f"chunk_{i:05d}.pdf"))
+                    for i, chunk in enumerate(chunks)
+                ]
+                parts = []
+                for future in futures:
+                    path, pages, degraded = future.result()
+                    parts.append((path, pages))
+                    self.degraded.update(degraded)
             
+            # A borító és az index a csomagok után készül, amikor már ismertek az oldalszámok
+            print(f"PDF összefűzése: {output_filename}...")
+            with self.metrics.medir('pdf_union'):
+                self._merge(output_filename, parts, tmp_dir)
+
+
+    def _build_front_matter(self, output_filename, pages=None):
+        """A borítót és az indexet külön PDF-be rendereli; visszaadja az oldalak számát."""
+        with self.metrics.medir('pdf_portada'):
+            story = []
+            self._create_cover_page(story)
+            self._create_index_page(story, pages, external=True)
+            return self._build(output_filename, story)
+
+    def _merge(self, output_filename, parts, tmp_dir, remove_parts=False):
+        """A részdokumentumokat sorrendben egyetlen PDF-be fűzi, eléjük kerül a borító és az oldalszámozott index.
+
+        parts: (útvonal, {cél név: oldal a részen belül}) párok, akár generátorból is.
+        """
+        front_matter = os.path.join(tmp_dir, "front.pdf")
+
+        def build_front_matter(pages):
+            print("Borítólap és recept index hozzáadása...")
+            return front_matter, self._build_front_matter(front_matter, pages)
+
+        unir_con_indice(parts, output_filename, build_front_matter, MapaPaginas(self.page_map_path),
+                        (lambda path, pages: os.remove(path)) if remove_parts else None)
+
+    def _generate_streaming(self, output_filename, chunk_size):
+        """Csomagonként renderel és fűz össze, így a memóriahasználat nem nő a receptek számával."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            def parts():
+                for start in range(0, len(self.recipes), chunk_size):
+                    path = os.path.join(tmp_dir, f"chunk_{start:06d}.pdf")
+                    pages = {}
+                    with self.metrics.medir('pdf_story'):
+                        story = []
+                        for record in self.recipes[start:start + chunk_size]:
+                            self._create_recipe_page(story, record, pages)
+                    with self.metrics.medir('pdf_maquetacion'):
+                        self._build(path, story)
+                    yield path, pages
+
+            print(f"{len(self.recipes)} recept oldal renderelése {chunk_size} receptes csomagokban: {output_filename}...")
+            # Minden rész törlődik, amint bekerült a kimenetbe
+            self._merge(output_filename, parts(), tmp_dir, remove_parts=True)
+
+    def _style_fingerprint(self):
+        """A recept oldalak megjelenését meghatározó beállítások lenyomata."""
+        config = {
+            'version': FRAGMENT_FORMAT_VERSION,
+            'markup': VERSION_MARCADO,
+            'page': [PAGE_WIDTH, PAGE_HEIGHT, MARGIN, THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT],
+        }
+        for name in ('RecipeTitle', 'Description', 'Link', 'SmallHeader', 'Ingredient'):
+            config[name] = sorted((key, repr(value)) for key, value in vars(self.styles[name]).items() if key != 'parent')
+        return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+    def _fragment_key(self, recipe, style_fingerprint):
+        """Gyorsítótár kulcs: a recept mezői, a beágyazott kép tartalma és a stílus."""
+        if isinstance(recipe, RecipeRecord):
+            recipe = recipe.load()
+        image_hash = ''
+        image_path = recipe.get('miniatura_local')
+        if image_path and os.path.exists(image_path):
+            with open(self.print_thumbnails.get(image_path, image_path), 'rb') as f:
+                image_hash = hashlib.sha256(f.read()).hexdigest()
+        fields = [recipe.get('titulo'), recipe.get('descripcion'), recipe.get('url'), recipe.get('ingredientes')]
+        key = json.dumps([style_fingerprint, fields, image_hash], ensure_ascii=False)
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def _generate_incremental(self, output_filename, workers):
+        """Csak az új vagy módosult recepteket rendereli, a többit a gyorsítótárból veszi."""
+        os.makedirs(self.fragment_cache_dir, exist_ok=True)
+        style_fingerprint = self._style_fingerprint()
+        fragments = [
+            os.path.join(self.fragment_cache_dir, f"{self._fragment_key(recipe, style_fingerprint)}.pdf")
+            for recipe in self.recipes
+        ]
+        missing = list({path: recipe for recipe, path in zip(self.recipes, fragments)
+                        if not os.path.exists(path)}.items())
+        print(f"{len(missing)} új vagy módosult recept renderelése, "
+              f"{len(self.recipes) - len(missing)} a gyorsítótárból...")
+        
+        self.metrics.contar('pdf_fragmentos_renderizados', len(missing))
+        self.metrics.contar('pdf_fragmentos_cache', len(self.recipes) - len(missing))
+        
+        with self.metrics.medir('pdf_maquetacion'):
+            if workers > 1 and len(missing) > 1:
+                batches = [missing[i::workers] for i in range(workers)]
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    list(pool.map(_render_fragments, batches, [self.print_thumbnails] * workers))
+            elif missing:
+                _render_fragments(missing, self.print_thumbnails, self)
+        
+        # A módosítva renderelt receptek oka a rész mellett van (.txt), a gyorsítótárból vettekhez is
+        for recipe, path in zip(self.recipes, fragments):
+            reason_path = path[:-len('.pdf')] + '.txt'
+            if os.path.exists(reason_path):
+                with open(reason_path, encoding='utf-8') as f:
+                    self.degraded[recipe.get('url')] = (recipe.get('titulo') or 'Névtelen Recept', f.read())
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            print(f"PDF összefűzése: {output_filename}...")
+            # Minden rész egyetlen recept, ami az első oldalán kezdődik
+            with self.metrics.medir('pdf_union'):
+                self._merge(output_filename, [(path, {nombre_destino(recipe): 1})
+                                              for recipe, path in zip(self.recipes, fragments)], tmp_dir)
+        
+        # A már nem használt részek törlése, hogy a gyorsítótár ne nőjön korlátlanul
+        used = {os.path.basename(path)[:-len('.pdf')] for path in fragments}
+        for name in os.listdir(self.fragment_cache_dir):
+            key, extension = os.path.splitext(name)
+            if extension in ('.pdf', '.txt') and key not in used:
+                os.remove(os.path.join(self.fragment_cache_dir, name))
+
+
+def _render_fragments(items, print_thumbnails, generator=None):
+    """(recept, útvonal) párokat renderel receptenként külön PDF-be."""
+    if generator is None:
+        generator = RecipeCookbookGenerator(recipes=[recipe for _, recipe in items])
+        generator.print_thumbnails = print_thumbnails
+    for path, recipe in items:
+        story = []
+        generator._create_recipe_page(story, recipe)
+        if recipe.get('url') in generator.degraded:
+            with open(path[:-len('.pdf')] + '.txt', 'w', encoding='utf-8') as f:
+                f.write(generator.degraded[recipe.get('url')][1])
+        # Ideiglenes fájlba, hogy megszakadt futás ne hagyjon hibás részt a gyorsítótárban
+        generator._build(path + '.part', story)
+        os.replace(path + '.part', path)
+
+
+def _render_recipe_chunk(recipes, print_thumbnails, output_filename):
+    """Egy recept csomag oldalait külön PDF-be rendereli (külön folyamatban fut).
+
+    Visszaadja az útvonalat, a receptek kezdőoldalait a csomagon belül és a módosítva bekerült recepteket.
+    """
+    generator = RecipeCookbookGenerator(recipes=recipes)
+    generator.print_thumbnails = print_thumbnails
+    story = []
+    pages = {}
+    for recipe in recipes:
+        generator._create_recipe_page(story, recipe, pages)
+    generator._build(output_filename, story)
+    return output_filename, pages, generator.degraded
+
+
+def add_arguments(parser):
+    """A parancssori kapcsolók (a cli.py `pdf` alparancsa is ezeket használja)."""
+    parser.add_argument('--workers', type=int, default=1, help="Párhuzamos renderelő folyamatok száma (alapértelmezés: 1)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Receptek száma részdokumentumonként")
+    parser.add_argument('--incremental', action='store_true', help=f"Csak az új/módosult receptek renderelése ({FRAGMENT_CACHE_DIR} gyorsítótárral)")
+    parser.add_argument('--metrics', action='store_true', help=f"Fázisonkénti időmérés mentése ({METRICS_FILE} és .prom)")
+    parser.add_argument('--streaming', action='store_true', help="Folyamatos építés állandó memóriával (nagyon sok recepthez)")
+
+
+def run(args, metrics=None):
+    """Legenerálja a szakácskönyvet a parancssori kapcsolók alapján."""
+    generator = RecipeCookbookGenerator(fragment_cache_dir=FRAGMENT_CACHE_DIR if args.incremental else None,
+                                        metrics=metrics, streaming=args.streaming)
+    generator.generate(workers=args.workers, chunk_size=args.chunk_size)
+    if args.metrics:
+        generator.metrics.guardar(METRICS_FILE, os.path.splitext(METRICS_FILE)[0] + '.prom')
+
 
 # --- Futtatási Blokk ---
 if __name__ == '__main__':
-    generator = RecipeCookbookGenerator()
-    generator.generate()
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="PDF szakácskönyv generálása a recetas.json alapján.")
+    add_arguments(parser)
+    run(parser.parse_args())
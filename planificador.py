@@ -0,0 +1,157 @@
+import heapq
+import itertools
+import random
+import re
+import threading
+import time
+
+import requests
+
+_HTTP_ERROR = re.compile(r'HTTP Error (\d{3})')
+
+
+def codigo_http(exc):
+    """Devuelve el código HTTP de un error de requests o yt-dlp, si lo tiene"""
+    respuesta = getattr(exc, 'response', None)
+    if getattr(respuesta, 'status_code', None):
+        return respuesta.status_code
+    coincidencia = _HTTP_ERROR.search(str(exc))
+    return int(coincidencia.group(1)) if coincidencia else None
+
+
+def es_limitacion(exc):
+    """True si el servidor está limitando o sobrecargado (429 o 5xx)"""
+    codigo = codigo_http(exc)
+    return codigo is not None and (codigo == 429 or 500 <= codigo < 600)
+
+
+def es_transitorio(exc):
+    """True si merece la pena reintentar: limitación, timeout o error de conexión"""
+    if es_limitacion(exc):
+        return True
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout, TimeoutError, ConnectionError)):
+        return True
+    mensaje = str(exc).lower()
+    return 'timed out' in mensaje or 'transporterror' in mensaje
+
+
+class Planificador:
+    """Limitador de tasa adaptativo y cola de reintentos compartidos
+
+    Token bucket cuya tasa se reduce a la mitad ante un 429/5xx (como mucho
+    una vez por segundo, para que una ráfaga de errores simultáneos no la
+    hunda) y vuelve a subir poco a poco con cada éxito. Los trabajos fallidos por errores
+    transitorios se reprograman con espera exponencial con jitter.
+    """
+
+    def __init__(self, tasa=8.0, tasa_min=0.2, tasa_max=40.0, rafaga=10, incremento=0.2,
+                 max_reintentos=5, espera_base=2.0, espera_max=120.0):
+        self.tasa = tasa
+        self.tasa_min = tasa_min
+        self.tasa_max = tasa_max
+        self.rafaga = rafaga
+        self.incremento = incremento
+        self.max_reintentos = max_reintentos
+        self.espera_base = espera_base
+        self.espera_max = espera_max
+
+        self._lock = threading.Lock()
+        self._fichas = float(rafaga)
+        self._ultimo = time.monotonic()
+        self._cola = []
+        self._secuencia = itertools.count()
+        self._ultima_reduccion = 0.0
+
+        self.inicio = time.monotonic()
+        self.peticiones = 0
+        self.exitos = 0
+        self.limitadas = 0
+        self.reintentos = 0
+        self.fallidas = []
+
+    def adquirir(self):
+        """Bloquea hasta que haya una ficha disponible"""
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self._fichas = min(self.rafaga, self._fichas + (ahora - self._ultimo) * self.tasa)
+                self._ultimo = ahora
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    self.peticiones += 1
+                    return
+                espera = (1 - self._fichas) / self.tasa
+            time.sleep(espera)
+
+    def llamar(self, funcion, *args, **kwargs):
+        """Ejecuta una petición respetando la tasa y ajustándola según el resultado"""
+        self.adquirir()
+        try:
+            resultado = funcion(*args, **kwargs)
+        except Exception as e:
+            if es_limitacion(e):
+                with self._lock:
+                    self.limitadas += 1
+                    ahora = time.monotonic()
+                    if ahora - self._ultima_reduccion >= 1.0:
+                        self._ultima_reduccion = ahora
+                        self.tasa = max(self.tasa_min, self.tasa / 2)
+                        self._fichas = 0
+            raise
+        with self._lock:
+            self.exitos += 1
+            self.tasa = min(self.tasa_max, self.tasa + self.incremento)
+        return resultado
+
+    def espera(self, intento):
+        """Espera exponencial con jitter antes del reintento número `intento`"""
+        return min(self.espera_max, self.espera_base * 2 ** (intento - 1)) * random.uniform(0.5, 1.5)
+
+    def reintentar(self, descripcion, trabajo, intento):
+        """Programa `trabajo(intento)` o lo da por fallido si se agotaron los reintentos
+
+        Devuelve los segundos de espera, o None si ya no se reintentará.
+        """
+        if intento > self.max_reintentos:
+            self.fallo(descripcion)
+            return None
+        espera = self.espera(intento)
+        with self._lock:
+            heapq.heappush(self._cola, (time.monotonic() + espera, next(self._secuencia),
+                                        descripcion, trabajo, intento))
+        return espera
+
+    def fallo(self, descripcion):
+        """Registra un trabajo que no se completará"""
+        with self._lock:
+            self.fallidas.append(descripcion)
+
+    def ejecutar_reintentos(self):
+        """Ejecuta los trabajos pendientes según van venciendo sus esperas
+
+        Los trabajos pueden volver a programarse; termina cuando la cola está vacía.
+        """
+        while True:
+            with self._lock:
+                if not self._cola:
+                    return
+                listo_en, _, descripcion, trabajo, intento = heapq.heappop(self._cola)
+                self.reintentos += 1
+            espera = listo_en - time.monotonic()
+            if espera > 0:
+                time.sleep(espera)
+            trabajo(intento)
+
+    def informe(self):
+        """Resumen de throughput, reintentos y fallos definitivos"""
+        duracion = time.monotonic() - self.inicio
+        return {
+            'peticiones': self.peticiones,
+            'exitos': self.exitos,
+            'limitadas': self.limitadas,
+            'reintentos': self.reintentos,
+            'fallidas': list(self.fallidas),
+            'tasa_final': round(self.tasa, 2),
+            'duracion': round(duracion, 2),
+            'throughput': round(self.exitos / duracion, 2) if duracion else 0.0,
+        }
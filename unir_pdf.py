@@ -0,0 +1,253 @@
+"""
+Unión de PDFs en streaming, con memoria acotada.
+
+pypdf.PdfWriter guarda en memoria todos los objetos de todos los documentos
+hasta escribir el resultado, así que unir un libro de miles de recetas ocupa
+varias veces su tamaño. Aquí cada parte se lee, se renumera y se escribe
+directamente en el fichero de salida; solo se conservan los offsets para la
+tabla xref y las referencias a las páginas.
+
+Los objetos sin cadenas de texto (flujos, fuentes, recursos) se copian tal
+cual, sin que pypdf los analice, renumerando solo sus referencias; los
+idénticos (la misma fuente incrustada en cada parte) se escriben una sola
+vez, identificados por un hash de su contenido. Las páginas y los objetos
+con cadenas (donde '1 0 R' podría ser texto) pasan por pypdf.
+"""
+import gc
+import hashlib
+import io
+import os
+import re
+
+from pypdf import PdfReader
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject
+
+# Claves que no se copian de las páginas: /Parent se sustituye por el nuevo
+# árbol de páginas y /B (article beads) apunta a objetos del documento original
+_EXCLUIDAS = {'/Parent', '/B'}
+
+# Los objetos de pypdf se referencian en ciclo con su lector: solo el
+# recolector de ciclos los libera. Se le llama tras leer este volumen de
+# partes, no tras cada una (con partes de una receta costaba más que la copia)
+BYTES_ENTRE_RECOLECCIONES = 4 * 1024 * 1024
+
+_CABECERA_OBJETO = re.compile(rb'\s*(\d+)\s+(\d+)\s+obj\b')
+_INICIO_FLUJO = re.compile(rb'>>\s*stream\r?\n')
+_FIN_FLUJO = re.compile(rb'\s*endstream\b')
+_LONGITUD = re.compile(rb'/Length\s+(\d+)\b(?!\s+\d+\s+R)')
+_REFERENCIA = re.compile(rb'\b(\d+)\s+(\d+)\s+R\b')
+_PAGINA = re.compile(rb'/Type\s*/Pages?\b')
+# Una anotación pertenece a una sola página: se copia tal cual pero no se comparte
+_ANOTACION = re.compile(rb'/Type\s*/Annot\b|/Subtype\s*/Link\b')
+
+
+class _Salida:
+    """Escribe objetos numerados y recuerda su posición para la tabla xref"""
+
+    def __init__(self, f):
+        self.f = f
+        self.offsets = [None]  # el objeto 0 es la cabeza de la lista libre
+        self.compartidos = {}  # hash del objeto serializado -> número
+        f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def reservar(self):
+        self.offsets.append(None)
+        return len(self.offsets) - 1
+
+    def escribir(self, numero, objeto):
+        self.offsets[numero] = self.f.tell()
+        self.f.write(f"{numero} 0 obj\n".encode())
+        objeto.write_to_stream(self.f)
+        self.f.write(b"\nendobj\n")
+
+    def escribir_serializado(self, cuerpo):
+        """Escribe un objeto ya serializado; devuelve su número"""
+        numero = self.reservar()
+        self.offsets[numero] = self.f.tell()
+        self.f.write(b"%d 0 obj\n%s\nendobj\n" % (numero, cuerpo))
+        return numero
+
+    def escribir_compartido(self, cuerpo):
+        """Como escribir_serializado, pero si ya hay uno idéntico devuelve su número"""
+        clave = hashlib.sha1(cuerpo).digest()
+        numero = self.compartidos.get(clave)
+        if numero is None:
+            numero = self.compartidos[clave] = self.escribir_serializado(cuerpo)
+        return numero
+
+    def cerrar(self, raiz):
+        xref = self.f.tell()
+        self.f.write(f"xref\n0 {len(self.offsets)}\n".encode())
+        self.f.write(b"0000000000 65535 f \n")
+        for offset in self.offsets[1:]:
+            self.f.write(f"{offset:010d} 00000 n \n".encode())
+        self.f.write(f"trailer\n<< /Size {len(self.offsets)} /Root {raiz} 0 R >>\n"
+                     f"startxref\n{xref}\n%%EOF\n".encode())
+
+
+def _tiene_cadenas(cuerpo):
+    """Si el objeto serializado contiene cadenas (literales o hexadecimales)"""
+    return b'(' in cuerpo or b'<' in cuerpo.replace(b'<<', b'').replace(b'>>', b'')
+
+
+class _Parte:
+    """Un PDF que se copia a la salida, con la correspondencia de números de objeto"""
+
+    def __init__(self, ruta, salida):
+        with open(ruta, 'rb') as f:
+            self.datos = f.read()
+        self.lector = PdfReader(io.BytesIO(self.datos))
+        self.offsets = self.lector.xref.get(0, {})
+        self.salida = salida
+        self.numeros = {}  # número en la parte -> número en la salida
+        self.pendientes = []  # referencias con número reservado, por escribir con pypdf
+        self._en_curso = set()
+
+    def renumerar(self, objeto):
+        """Sustituye (en el propio objeto) las referencias por los números nuevos"""
+        if isinstance(objeto, IndirectObject):
+            return IndirectObject(self.numero(objeto.idnum), 0, None)
+        if isinstance(objeto, DictionaryObject):
+            for clave, valor in list(objeto.items()):
+                objeto[clave] = self.renumerar(valor)
+        elif isinstance(objeto, ArrayObject):
+            for i, valor in enumerate(objeto):
+                objeto[i] = self.renumerar(valor)
+        return objeto
+
+    def numero(self, idnum):
+        """Número en la salida del objeto `idnum` de la parte (lo copia o lo deja pendiente)"""
+        nuevo = self.numeros.get(idnum)
+        if nuevo is None:
+            nuevo = self._copiar_tal_cual(idnum)
+            if nuevo is None:
+                nuevo = self.salida.reservar()
+                self.pendientes.append(IndirectObject(idnum, 0, self.lector))
+            self.numeros[idnum] = nuevo
+        return nuevo
+
+    def _copiar_tal_cual(self, idnum):
+        """Copia sin analizar un objeto sin cadenas; None si hay que copiarlo con pypdf"""
+        troceado = self._trocear(idnum)
+        if troceado is None:
+            return None
+        diccionario, flujo = troceado
+        if _tiene_cadenas(diccionario) or _PAGINA.search(diccionario):
+            return None
+        if any(int(m[1]) in self._en_curso for m in _REFERENCIA.finditer(diccionario)):
+            return None  # ciclo: este objeto se escribe con pypdf
+        self._en_curso.add(idnum)
+        try:
+            diccionario = _REFERENCIA.sub(lambda m: b"%d 0 R" % self.numero(int(m[1])), diccionario)
+        finally:
+            self._en_curso.discard(idnum)
+        if flujo is not None:
+            diccionario += b"\nstream\n" + flujo + b"\nendstream"
+        if _ANOTACION.search(diccionario):
+            return self.salida.escribir_serializado(diccionario)
+        return self.salida.escribir_compartido(diccionario)
+
+    def _trocear(self, idnum):
+        """(diccionario, datos del flujo o None) tal como están en el fichero, o None si no se reconoce"""
+        offset = self.offsets.get(idnum)
+        if offset is None:
+            return None  # dentro de un flujo de objetos
+        cabecera = _CABECERA_OBJETO.match(self.datos, offset)
+        if cabecera is None or int(cabecera[1]) != idnum:
+            return None
+        inicio = cabecera.end()
+        fin = self.datos.find(b'endobj', inicio)
+        flujo = _INICIO_FLUJO.search(self.datos, inicio, fin if fin != -1 else len(self.datos))
+        if flujo is None:
+            return (self.datos[inicio:fin].strip(), None) if fin != -1 else None
+        diccionario = self.datos[inicio:flujo.start() + 2].strip()
+        longitud = _LONGITUD.search(diccionario)
+        if longitud is None:
+            return None
+        final = flujo.end() + int(longitud[1])
+        if not _FIN_FLUJO.match(self.datos, final):
+            return None
+        return diccionario, self.datos[flujo.end():final]
+
+
+def _copiar_parte(ruta, salida, arbol):
+    """Copia las páginas de un PDF a la salida; devuelve sus números de objeto"""
+    parte = _Parte(ruta, salida)
+    paginas = parte.lector.pages
+    # Los números de las páginas se reservan antes, para que los
+    # enlaces internos entre páginas de la parte apunten bien
+    for pagina in paginas:
+        parte.numeros[pagina.indirect_reference.idnum] = salida.reservar()
+    copiadas = []
+    for pagina in paginas:
+        numero = parte.numeros[pagina.indirect_reference.idnum]
+        nueva = DictionaryObject()
+        for clave, valor in pagina.items():
+            if clave not in _EXCLUIDAS:
+                nueva[NameObject(clave)] = parte.renumerar(valor)
+        nueva[NameObject('/Parent')] = IndirectObject(arbol, 0, None)
+        salida.escribir(numero, nueva)
+        copiadas.append(numero)
+
+        # Los objetos que referencia la página se escriben en cuanto aparecen
+        while parte.pendientes:
+            referencia = parte.pendientes.pop()
+            salida.escribir(parte.numeros[referencia.idnum], parte.renumerar(referencia.get_object()))
+    return copiadas
+
+
+def unir_pdfs(partes, destino, al_terminar_parte=None, delante=None, destinos=None):
+    """Une los PDFs `partes` en `destino`, en orden, parte a parte
+
+    Solo copia las páginas (con sus recursos, contenidos y anotaciones), no
+    los marcadores ni los destinos con nombre de las partes. `al_terminar_parte(ruta,
+    paginas)` se llama tras copiar cada parte (p.ej. para borrarla).
+
+    `delante()`, si se indica, se llama al acabar las partes y devuelve la
+    ruta de un PDF cuyas páginas van al principio (p.ej. la portada con un
+    índice que necesita saber en qué página queda cada receta). `destinos`
+    ({nombre: página, desde 1}) se lee al final y se escribe como destinos
+    con nombre del documento, para los enlaces /Dest /nombre de cualquier parte.
+    Devuelve el número total de páginas.
+    """
+    with open(destino, 'wb') as f:
+        salida = _Salida(f)
+        catalogo = salida.reservar()
+        arbol = salida.reservar()
+        paginas = []
+        leidos = 0
+
+        for ruta in partes:
+            leidos += os.path.getsize(ruta)
+            copiadas = _copiar_parte(ruta, salida, arbol)
+            if leidos > BYTES_ENTRE_RECOLECCIONES:
+                gc.collect()
+                leidos = 0
+            paginas.extend(copiadas)
+            if al_terminar_parte:
+                al_terminar_parte(ruta, len(copiadas))
+
+        if delante:
+            ruta = delante()
+            copiadas = _copiar_parte(ruta, salida, arbol)
+            paginas[:0] = copiadas
+            if al_terminar_parte:
+                al_terminar_parte(ruta, len(copiadas))
+
+        salida.escribir(arbol, DictionaryObject({
+            NameObject('/Type'): NameObject('/Pages'),
+            NameObject('/Kids'): ArrayObject(IndirectObject(n, 0, None) for n in paginas),
+            NameObject('/Count'): NumberObject(len(paginas)),
+        }))
+        raiz = DictionaryObject({
+            NameObject('/Type'): NameObject('/Catalog'),
+            NameObject('/Pages'): IndirectObject(arbol, 0, None),
+        })
+        if destinos:
+            raiz[NameObject('/Dests')] = DictionaryObject({
+                NameObject('/' + nombre): ArrayObject([IndirectObject(paginas[pagina - 1], 0, None), NameObject('/Fit')])
+                for nombre, pagina in destinos.items() if 0 < pagina <= len(paginas)
+            })
+        salida.escribir(catalogo, raiz)
+        salida.cerrar(catalogo)
+    return len(paginas)
@@ -0,0 +1,233 @@
+"""
+Modo vigilancia: detecta los videos nuevos del canal sin enumerarlo entero.
+
+Cada `intervalo` segundos se pide el feed Atom del canal
+(https://www.youtube.com/feeds/videos.xml?channel_id=UC..., los ~15 videos
+más recientes) con una petición condicional (ETag/Last-Modified): si no
+cambió, el servidor responde 304 sin cuerpo. Si trae videos que no están en
+recetas.json, solo se procesan esos (YouTubeRecipeExtractor.procesar_nuevos)
+y se actualiza el libro PDF de forma incremental (pdf.py con caché de fragmentos).
+
+Se vuelve a la enumeración completa del canal (sincronización normal):
+- si aún no hay recetas.json o no se conoce el feed (falta el ID del canal),
+- cada `completa_cada` segundos, para recoger videos borrados o editados,
+- si el feed parece incoherente: no se puede leer, es de otro canal, está
+  vacío o ninguno de sus videos está en recetas.json (puede haber más
+  videos nuevos de los que caben en el feed).
+
+Los validadores del feed solo se guardan si todos sus videos nuevos dieron
+receta: si alguno falló (estreno o directo programado, error de red), se
+anota en 'pendientes' y se vuelve a intentar en cada ronda, aunque el feed
+responda 304 o el video ya no esté en él.
+
+El estado (feed, ID del canal, ETag, Last-Modified, última enumeración completa,
+videos pendientes) se guarda en datos/vigilancia.json, así que se puede parar y reanudar.
+
+Uso:
+    python cli.py watch [--canal URL] [--feed URL] [--intervalo 900] [--pdf] [--rondas N]
+"""
+import json
+import os
+import time
+import xml.etree.ElementTree as ET
+
+import requests
+
+from almacen import id_de_receta
+from planificador import es_transitorio
+
+URL_FEED = "https://www.youtube.com/feeds/videos.xml?channel_id={}"
+
+_NS = {'atom': 'http://www.w3.org/2005/Atom', 'yt': 'http://www.youtube.com/xml/schemas/2015'}
+
+
+def leer_feed(contenido):
+    """(ID del canal, [{'id', 'title', 'published'}]) de un feed Atom de YouTube
+
+    Lanza ValueError si no es un feed de videos válido.
+    """
+    try:
+        raiz = ET.fromstring(contenido)
+    except ET.ParseError as e:
+        raise ValueError(f"feed ilegible: {e}") from None
+    if raiz.tag != f"{{{_NS['atom']}}}feed":
+        raise ValueError(f"no es un feed Atom: {raiz.tag}")
+    videos = []
+    for entrada in raiz.iterfind('atom:entry', _NS):
+        video_id = entrada.findtext('yt:videoId', namespaces=_NS)
+        if not video_id:
+            raise ValueError("entrada del feed sin yt:videoId")
+        videos.append({
+            'id': video_id,
+            'title': entrada.findtext('atom:title', '', _NS),
+            'published': entrada.findtext('atom:published', '', _NS),
+        })
+    return raiz.findtext('yt:channelId', namespaces=_NS), videos
+
+
+class VigilanteCanal:
+    """Sondea el feed de un canal y mantiene al día su recetas.json (y su PDF)"""
+
+    def __init__(self, extractor, url_feed=None, intervalo=900, completa_cada=24 * 3600,
+                 pdf=False, timeout=10):
+        self.extractor = extractor
+        self.intervalo = intervalo
+        self.completa_cada = completa_cada
+        self.pdf = pdf
+        self.timeout = timeout
+        self.metricas = extractor.metricas
+        self.ruta_estado = os.path.join(extractor.output_folder, "datos", "vigilancia.json")
+        self.estado = self._cargar_estado()
+        if url_feed and url_feed != self.estado.get('feed'):
+            # Otro feed: los validadores del anterior no sirven
+            self.estado = dict(self.estado, feed=url_feed, etag='', last_modified='')
+        self.session = requests.Session()
+
+    def _cargar_estado(self):
+        try:
+            with open(self.ruta_estado, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _guardar_estado(self):
+        temporal = self.ruta_estado + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(self.estado, f, ensure_ascii=False, indent=2)
+        os.replace(temporal, self.ruta_estado)
+
+    def sondear(self):
+        """Pide el feed y devuelve (videos nuevos, motivo para enumerar el canal entero o None)
+
+        Los validadores de la respuesta quedan en self._validadores; se guardan
+        cuando los videos nuevos ya están procesados.
+        """
+        self._validadores = None
+        if not self.estado.get('feed'):
+            return [], "no se conoce el feed del canal"
+        if time.time() - self.estado.get('ultima_completa', 0) >= self.completa_cada:
+            return [], "enumeración periódica"
+
+        headers = {}
+        if self.estado.get('etag'):
+            headers['If-None-Match'] = self.estado['etag']
+        if self.estado.get('last_modified'):
+            headers['If-Modified-Since'] = self.estado['last_modified']
+
+        self.metricas.contar('feed_peticiones')
+        try:
+            with self.metricas.medir('feed'):
+                respuesta = self.session.get(self.estado['feed'], headers=headers, timeout=self.timeout)
+                if respuesta.status_code == 304:
+                    self.metricas.contar('feed_no_modificado')
+                    return [], None
+                respuesta.raise_for_status()
+        except requests.RequestException as e:
+            if es_transitorio(e):
+                # Sin red o servidor saturado: se vuelve a probar en la siguiente ronda
+                self.metricas.contar('feed_errores')
+                print(f"   ⚠️  Feed no disponible: {e}")
+                return [], None
+            return [], f"error del feed ({e})"
+
+        try:
+            canal, videos = leer_feed(respuesta.content)
+        except ValueError as e:
+            return [], str(e)
+        if self.estado.get('canal') and canal and canal != self.estado['canal']:
+            return [], f"el feed es de otro canal ({canal})"
+
+        conocidos = self._ids_conocidos()
+        if not conocidos:
+            return [], "aún no hay recetas.json"
+        if not videos:
+            return [], "feed vacío"
+        nuevos = [video for video in videos if video['id'] not in conocidos]
+        if len(nuevos) == len(videos):
+            return [], "ningún video del feed está en recetas.json"
+
+        self._validadores = (respuesta.headers.get('ETag', ''), respuesta.headers.get('Last-Modified', ''))
+        return nuevos, None
+
+    def _ids_conocidos(self):
+        """IDs de los videos de recetas.json"""
+        return {id_de_receta(receta) for receta in self.extractor.cargar_json()}
+
+    def ronda(self):
+        """Sondea el feed y actualiza lo necesario; devuelve las recetas nuevas (None si nada cambió)"""
+        nuevos, motivo = self.sondear()
+        if motivo:
+            print(f"🔄 Enumeración completa del canal: {motivo}")
+            self.metricas.contar('enumeraciones_completas')
+            antes = self._ids_conocidos()
+            self.extractor.recipes = []
+            if self.extractor.extraer_videos(sincronizar=True) is None:
+                # Falló la enumeración: se reintenta en la siguiente ronda
+                return None
+            if self.extractor.channel_id:
+                self.estado['canal'] = self.extractor.channel_id
+                self.estado.setdefault('feed', URL_FEED.format(self.extractor.channel_id))
+            # Los validadores del feed se renuevan en el siguiente sondeo; los
+            # pendientes que sigan sin receta volverán a salir en el feed
+            self.estado.update(etag='', last_modified='', ultima_completa=time.time(), pendientes=[])
+            self._guardar_estado()
+            cambios = len(self._ids_conocidos() - antes)
+            self._actualizar_pdf()
+            return cambios
+
+        # Los que fallaron en rondas anteriores se reintentan aunque no estén en el feed
+        ids = {video['id'] for video in nuevos}
+        reintentos = [video for video in self.estado.get('pendientes', ()) if video['id'] not in ids]
+        if reintentos:
+            conocidos = self._ids_conocidos()
+            nuevos += [video for video in reintentos if video['id'] not in conocidos]
+        if nuevos:
+            print(f"🆕 {len(nuevos)} videos nuevos en el feed")
+            self.metricas.contar('feed_videos_nuevos', len(nuevos))
+            cambios = self.extractor.procesar_nuevos(nuevos)
+            if cambios:
+                self._actualizar_pdf()
+            conocidos = self._ids_conocidos()
+            pendientes = [video for video in nuevos if video['id'] not in conocidos]
+        else:
+            cambios, pendientes = None, []
+        if pendientes:
+            print(f"   ⏳ {len(pendientes)} videos sin receta, se reintentan en la siguiente ronda")
+            self.metricas.contar('feed_videos_pendientes', len(pendientes))
+        if pendientes != self.estado.get('pendientes', []):
+            self.estado['pendientes'] = pendientes
+            self._guardar_estado()
+        if self._validadores and not pendientes:
+            # Con algún video sin receta, el siguiente sondeo no debe recibir un 304
+            self.estado['etag'], self.estado['last_modified'] = self._validadores
+            self._guardar_estado()
+        self.extractor.guardar_metricas()
+        return cambios
+
+    def _actualizar_pdf(self):
+        """Libro PDF incremental: solo se maquetan las recetas nuevas o modificadas"""
+        if not self.pdf:
+            return
+        import pdf
+        carpeta = self.extractor.output_folder
+        generador = pdf.RecipeCookbookGenerator(
+            os.path.join(carpeta, "datos", "recetas.json"),
+            thumbnail_dir=os.path.join(carpeta, "miniaturas"),
+            print_thumbnail_dir=os.path.join(carpeta, "miniaturas", "impresion"),
+            fragment_cache_dir=os.path.join(carpeta, "pdf_cache"),
+            metrics=self.metricas,
+            page_map_path=os.path.join(carpeta, "datos", "pdf_paginas.json"),
+        )
+        generador.generate()
+
+    def vigilar(self, rondas=None):
+        """Repite ronda() cada `intervalo` segundos (indefinidamente si rondas es None)"""
+        hechas = 0
+        while rondas is None or hechas < rondas:
+            if hechas:
+                time.sleep(self.intervalo)
+            self.ronda()
+            hechas += 1
+
+    def cerrar(self):
+        self.session.close()